@@ -1,13 +1,15 @@
+from django.conf import settings
+from typing import Optional
+from django.db.models import Manager, OuterRef, QuerySet, Subquery
 from django.urls import reverse
-from requests import Response
-from urllib.parse import urlparse
-from servers.models import Server
+from servers.authors import resolve_author, resolve_authors
 from follow.models import Follow, Request, RemoteFollower, RemoteRequest
 from posts.models import Post, Like, Comment, RemoteComment, RemoteLike
 from posts.models import CommentLike, Post, Like, Comment
 import json
 from django.contrib.auth import get_user_model
 from rest_framework import serializers
+from rest_framework.reverse import reverse as api_reverse
 from rest_framework_nested.serializers import NestedHyperlinkedModelSerializer
 
 
@@ -47,17 +49,31 @@ class CommentSerializer(NestedHyperlinkedModelSerializer):
         return representation
 
 
+def embedded_comments_queryset() -> QuerySet[Comment]:
+    """
+    Returns the comments embedded in posts: the first page of each post's comments endpoint.
+
+    Meant to be prefetched into `embedded_comments` so a page of posts loads the comments of all of them
+    in a single query that reads at most `EMBEDDED_COMMENTS_PAGE_SIZE` comments per post.
+    """
+    first_page = Comment.objects.filter(post=OuterRef('post')) \
+        .order_by('-date_published', '-id') \
+        .values('id')[:settings.EMBEDDED_COMMENTS_PAGE_SIZE]
+    return Comment.objects.filter(id__in=Subquery(first_page)) \
+        .select_related('author') \
+        .order_by('-date_published', '-id')
+
+
 class PostSerializer(NestedHyperlinkedModelSerializer):
     parent_lookup_kwargs = {
         'author_pk': 'author__pk',
     }
     author = AuthorSerializer(many=False, read_only=True)
-    comment_set = CommentSerializer(many=True, read_only=True)
     url_field_name = 'source'
 
     class Meta:
         model = Post
-        fields = ['title', 'description', 'content', 'author', 'visibility', 'unlisted', 'source', 'comment_set']
+        fields = ['title', 'description', 'content', 'author', 'visibility', 'unlisted', 'source']
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
@@ -66,18 +82,32 @@ class PostSerializer(NestedHyperlinkedModelSerializer):
         representation['published'] = instance.date_published
         representation['categories'] = [category.category for category in instance.categories.all()]
         representation['origin'] = representation['source']  # TODO: Update this when we have post sharing
-        representation['count'] = len(instance.comment_set.all())
+        representation['count'] = instance.comment_count if hasattr(instance, 'comment_count') \
+            else instance.comment_set.count()
+        representation['comments'] = api_reverse(
+            'comment-list',
+            kwargs={'author_pk': instance.author_id, 'post_pk': instance.pk},
+            request=self.context.get('request'))
         representation['commentsSrc'] = {
             'type': 'comments',
             'page': 1,
+            'size': settings.EMBEDDED_COMMENTS_PAGE_SIZE,
             'post': representation['source'],
-            'id': representation['source'] + '/comments',
-            'comments': representation['comment_set']
+            'id': representation['comments'],
+            'comments': CommentSerializer(self.get_embedded_comments(instance), many=True, context=self.context).data
         }
-        del representation['comment_set']
+        if instance.img_content:
+            # Resized copies of the uploaded image, the image endpoint serves the original
+            representation['imageVariants'] = {
+                name: instance.get_image_url(name) for name in instance.img_variants}
         representation['id'] = representation['source']
         return representation
 
+    def get_embedded_comments(self, instance: Post) -> list[Comment]:
+        if hasattr(instance, 'embedded_comments'):
+            return instance.embedded_comments
+        return list(embedded_comments_queryset().filter(post=instance))
+
     def to_internal_value(self, data):
         internal_value = super().to_internal_value(data)
         internal_value['author_id'] = data['author_id']
@@ -123,7 +153,33 @@ class RequestSerializer(NestedHyperlinkedModelSerializer):
         return representation
 
 
-class RemoteRequestSerializer(NestedHyperlinkedModelSerializer):
+class RemoteAuthorListSerializer(serializers.ListSerializer):
+    """
+    Loads the remote authors of every item at once, before the items are serialized.
+    """
+
+    def to_representation(self, data):
+        items = list(data.all() if isinstance(data, Manager) else data)
+        self.context['remote_authors'] = resolve_authors(self.child.get_author_url(item) for item in items)
+        return super().to_representation(items)
+
+
+class RemoteAuthorMixin:
+    """
+    For serializers of objects created by authors on other servers. Their profile is read from the authors resolved by
+    `RemoteAuthorListSerializer`, or loaded on its own when a single object is serialized.
+    """
+
+    def get_author_url(self, instance) -> str:
+        return instance.author_url
+
+    def get_remote_author(self, instance) -> Optional[dict]:
+        url = self.get_author_url(instance)
+        authors = self.context.get('remote_authors', {})
+        return authors[url] if url in authors else resolve_author(url)
+
+
+class RemoteRequestSerializer(RemoteAuthorMixin, NestedHyperlinkedModelSerializer):
     parent_lookup_kwargs = {
         'author_pk': 'author__pk'
     }
@@ -132,25 +188,30 @@ class RemoteRequestSerializer(NestedHyperlinkedModelSerializer):
     class Meta:
         model = RemoteRequest
         fields = ['to_user']
+        list_serializer_class = RemoteAuthorListSerializer
+
+    def get_author_url(self, instance: RemoteRequest) -> str:
+        return instance.from_user_url
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        for server in Server.objects.all():
-            parsed_from_user_url = urlparse(instance.from_user_url)
-            parsed_server_service_address = urlparse(server.service_address)
-            if parsed_from_user_url.hostname != parsed_server_service_address.hostname:
-                continue
-            from_user_response: Response = server.get(parsed_server_service_address.path)
-            json_from_user = from_user_response.json()
-
-            from_user_name = json_from_user.get('displayName') or json_from_user.get('display_name') or ''
-            representation['type'] = 'Follow'
-            representation['summary'] = from_user_name + ' wants to follow ' + instance.to_user.get_full_name()
-            representation['actor'] = json_from_user
-            representation['object'] = representation['to_user']
-            del representation['to_user']
+        json_from_user = self.get_remote_author(instance)
+        if json_from_user is None:
             return representation
 
+        from_user_name = json_from_user.get('displayName') or json_from_user.get('display_name') or ''
+        representation['type'] = 'Follow'
+        representation['summary'] = from_user_name + ' wants to follow ' + instance.to_user.get_full_name()
+        representation['actor'] = json_from_user
+        representation['object'] = representation['to_user']
+        del representation['to_user']
+        return representation
+
+
+def get_post_url(author_id: int, post_id: int, request) -> str:
+    """Returns the `id` of a post, as serialized by `PostSerializer`, without loading the post."""
+    return api_reverse('post-detail', kwargs={'author_pk': author_id, 'pk': post_id}, request=request)
+
 
 class LikesSerializer(serializers.ModelSerializer):
     parent_lookup_kwargs = {
@@ -158,18 +219,16 @@ class LikesSerializer(serializers.ModelSerializer):
         'post_pk': 'post__pk',
     }
     author = AuthorSerializer(many=False, read_only=True)
-    post = PostSerializer(many=False, read_only=True)
 
     class Meta:
         model = Like
-        fields = ['author', 'post']
+        fields = ['author']
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
         representation['type'] = 'Like'
         representation['summary'] = instance.author.get_full_name() + ' likes your post'
-        representation['object'] = representation['post']['source']
-        del representation['post']
+        representation['object'] = get_post_url(instance.post.author_id, instance.post_id, self.context.get('request'))
         return representation
 
 
@@ -193,55 +252,45 @@ class CommentLikeSerializer(serializers.ModelSerializer):
         return representation
 
 
-class RemoteLikeSerializer(serializers.ModelSerializer):
+class RemoteLikeSerializer(RemoteAuthorMixin, serializers.ModelSerializer):
     parent_lookup_kwargs = {
         'post_pk': 'post__pk',
     }
-    post = PostSerializer(many=False, read_only=True)
 
     class Meta:
         model = RemoteLike
-        fields = ['post']
+        fields = []
+        list_serializer_class = RemoteAuthorListSerializer
 
     def to_representation(self, instance):
         representation = super().to_representation(instance)
-        for server in Server.objects.all():
-            parsed_author_url = urlparse(instance.author_url)
-            parsed_server_service_address = urlparse(server.service_address)
-            if parsed_author_url.hostname != parsed_server_service_address.hostname:
-                continue
-            author: Response = server.get(parsed_author_url.path)
-            json_author = author.json()
-
-            author_name = json_author.get('displayName') or json_author.get('display_name') or ''
-            representation['type'] = 'Like'
-            representation['summary'] = author_name + ' likes your post'
-            representation['object'] = representation['post']['source']
-            representation['author'] = json_author
-            del representation['post']
+        representation['object'] = get_post_url(instance.post.author_id, instance.post_id, self.context.get('request'))
+        json_author = self.get_remote_author(instance)
+        if json_author is None:
             return representation
+
+        author_name = json_author.get('displayName') or json_author.get('display_name') or ''
+        representation['type'] = 'Like'
+        representation['summary'] = author_name + ' likes your post'
+        representation['author'] = json_author
         return representation
 
 
-class RemoteCommentSerializer(NestedHyperlinkedModelSerializer):
+class RemoteCommentSerializer(RemoteAuthorMixin, NestedHyperlinkedModelSerializer):
     class Meta:
         model = RemoteComment
         fields = ['comment']
+        list_serializer_class = RemoteAuthorListSerializer
 
     def to_representation(self, instance: RemoteComment):
         representation = super().to_representation(instance)
-        for server in Server.objects.all():
-            parsed_author_url = urlparse(instance.author_url)
-            parsed_server_service_address = urlparse(server.service_address)
-            if parsed_author_url.hostname != parsed_server_service_address.hostname:
-                continue
-            author: Response = server.get(parsed_author_url.path)
-            json_author = author.json()
-
-            representation['type'] = 'comment'
-            representation['contentType'] = instance.content_type
-            representation['published'] = instance.date_published
-            representation['author'] = json_author
-            # TODO: Get comment id (absolute url in service)
+        json_author = self.get_remote_author(instance)
+        if json_author is None:
             return representation
+
+        representation['type'] = 'comment'
+        representation['contentType'] = instance.content_type
+        representation['published'] = instance.date_published
+        representation['author'] = json_author
+        # TODO: Get comment id (absolute url in service)
         return representation
@@ -1,15 +1,19 @@
+import base64
+from hashlib import sha256
 from unittest.mock import MagicMock, patch
 
 from django.urls import reverse
+from inmemorystorage import InMemoryStorage
 from servers.models import Server
 from .constants import POST_IMG_DATA, SAMPLE_REMOTE_AUTHOR
 from posts.tests.constants import POST_DATA, COMMENT_DATA
+from posts.tests.test_models import create_image_upload
 from posts.tests.constants import POST_DATA
 from posts.models import Post, ContentType, Like, RemoteLike, CommentLike
 from follow.models import Request, RemoteRequest
 import json
 from rest_framework.exceptions import PermissionDenied
-from django.test import TestCase, Client
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 from django.test import TestCase, Client
 from posts.models import Post, ContentType, Comment, RemoteComment
@@ -110,6 +114,65 @@ class PostTests(TestCase):
             self.assertIn('categories', post)
             self.assertNotIn('original_author', post)
 
+    def test_posts_query_count(self):
+        for i in range(10):
+            post = Post.objects.create(
+                title=POST_DATA['title'],
+                description=POST_DATA['description'],
+                content_type=POST_DATA['content_type'],
+                content=POST_DATA['content'],
+                author_id=self.user.id,
+                unlisted=POST_DATA['unlisted'])
+            post.categories.create(category=f'category {i}')
+            for author in (self.user, self.other_user):
+                Comment.objects.create(
+                    comment=COMMENT_DATA['comment'],
+                    author=author,
+                    post=post,
+                    content_type=COMMENT_DATA['content_type'],
+                )
+
+        self.client.login(username='bob', password='password')
+        # session, user, page count, posts, categories, comments
+        with self.assertNumQueries(6):
+            res = self.client.get(f'/api/v1/authors/{self.user.id}/posts/?size=11')
+        body = json.loads(res.content.decode('utf-8'))
+        self.assertEqual(len(body['items']), 11)
+        self.assertEqual([post['count'] for post in body['items']], [2] * 10 + [0])
+
+        # Detail has no page count
+        with self.assertNumQueries(5):
+            self.client.get(f'/api/v1/authors/{self.user.id}/posts/{post.id}/')
+
+    @override_settings(EMBEDDED_COMMENTS_PAGE_SIZE=2)
+    def test_embedded_comments_are_bounded(self):
+        comments = [Comment.objects.create(
+            comment=f'comment {i}',
+            author_id=self.other_user.id,
+            post_id=self.post.id,
+            content_type=COMMENT_DATA['content_type'],
+        ) for i in range(5)]
+        Comment.objects.create(
+            comment=COMMENT_DATA['comment'],
+            author_id=self.user.id,
+            post_id=self.post_by_other_user.id,
+            content_type=COMMENT_DATA['content_type'],
+        )
+
+        self.client.login(username='bob', password='password')
+        res = self.client.get(f'/api/v1/authors/{self.user.id}/posts/')
+        post = json.loads(res.content.decode('utf-8'))['items'][0]
+
+        self.assertEqual(post['count'], 5)
+        self.assertEqual(post['commentsSrc']['size'], 2)
+        self.assertEqual([comment['comment'] for comment in post['commentsSrc']['comments']],
+                         [comments[4].comment, comments[3].comment])
+
+        self.assertEqual(post['commentsSrc']['id'], post['comments'])
+        res = self.client.get(post['comments'])
+        self.assertEqual(res.status_code, 200)
+        self.assertEqual(len(json.loads(res.content.decode('utf-8'))['comments']), 5)
+
     def test_posts_require_login(self):
         res = self.client.get(f'/api/v1/authors/{self.user.id}/posts/')
         self.assertEqual(res.status_code, 403)
@@ -368,6 +431,36 @@ class CommentsTests(TestCase):
                     return
             self.fail("Could not find remote author's comment")
 
+    def test_remote_authors_are_fetched_once(self):
+        author = json.loads(SAMPLE_REMOTE_AUTHOR)
+        for _ in range(3):
+            RemoteComment.objects.create(
+                author_url=author.get('url'),
+                comment=COMMENT_DATA['comment'],
+                content_type=COMMENT_DATA['content_type'],
+                post_id=self.post.id
+            )
+
+        mock_response = Response()
+        mock_response.json = MagicMock(return_value=author)
+        mock_server = Server(
+            service_address="https://cmput-404-w22-project-group09.herokuapp.com/service",
+            username="hello",
+            password="no",
+        )
+        mock_server.get = MagicMock(return_value=mock_response)
+
+        self.client.login(username='bob', password='password')
+        with patch('servers.models.Server.objects') as MockServerObjects:
+            MockServerObjects.all.return_value = [mock_server]
+            res = self.client.get(f'/api/v1/authors/{self.user.id}/posts/{self.post.id}/comments/')
+
+        remote_comments = [comment for comment in res.json()['comments'] if 'author' in comment
+                           and comment['author'].get('url') == author.get('url')]
+        self.assertEqual(len(remote_comments), 3)
+        self.assertEqual(mock_server.get.call_count, 1)
+        self.assertEqual(MockServerObjects.all.call_count, 1)
+
 
 class ImageTests(TestCase):
     def setUp(self) -> None:
@@ -556,6 +649,29 @@ class LikeTests(TestCase):
             self.assertIn('summary', like)
             self.assertIn('object', like)
 
+    def test_like_object_is_post_id(self):
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        post = self.client.get(f'/api/v1/authors/{self.author.id}/posts/{self.post.id}/').json()
+        res = self.client.get(f'/api/v1/authors/{self.author.id}/liked/')
+        self.assertEqual(res.json()['items'][0]['object'], post['id'])
+
+    def test_likes_query_count(self):
+        for i in range(10):
+            user = get_user_model().objects.create_user(username=f'user {i}', password=TEST_PASSWORD)
+            Like.objects.create(author_id=user.id, post_id=self.post.id)
+            Comment.objects.create(
+                comment=COMMENT_DATA['comment'],
+                author_id=user.id,
+                post_id=self.post.id,
+                content_type=COMMENT_DATA['content_type'],
+            )
+
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        # session, user, page count, likes, remote likes
+        with self.assertNumQueries(5):
+            res = self.client.get(f'/api/v1/authors/{self.author.id}/posts/{self.post.id}/likes/?size=20')
+        self.assertEqual(len(res.json()['items']), 12)
+
     def test_include_remote_likes(self):
         author = json.loads(SAMPLE_REMOTE_AUTHOR)
         author_url = author.get('url')
@@ -762,3 +878,94 @@ class InboxTests(TestCase):
         )
         self.assertEqual(resp.status_code, 204)
         self.assertEqual(len(RemoteRequest.objects.all()), 1)
+
+
+class ImageCacheTests(TestCase):
+    def setUp(self) -> None:
+        self.client = Client()
+        self.author = get_user_model().objects.create_user(username='bob', password='password')
+        self.client.login(username='bob', password='password')
+        # Saving an image post checks that its URL is an image
+        valid_image = patch('posts.models.is_url_valid_image', return_value=True)
+        valid_image.start()
+        self.addCleanup(valid_image.stop)
+        self.post = Post.objects.create(
+            title=POST_IMG_DATA['title'],
+            description=POST_IMG_DATA['description'],
+            content_type=ContentType.PNG,
+            content='http://images.example.com/cat.png',
+            author_id=self.author.id,
+            unlisted=False)
+        self.url = f'/api/v1/authors/{self.author.id}/posts/{self.post.id}/image/'
+        # Longer than a chunk, and not a multiple of 3 bytes
+        self.image = bytes(range(256)) * 1000 + b'end'
+
+    def mock_get(self):
+        response = MagicMock()
+        response.__enter__.return_value = response
+        response.iter_content.side_effect = lambda size: (
+            self.image[i:i + 1000] for i in range(0, len(self.image), 1000))
+        return patch('posts.images.requests.get', return_value=response)
+
+    def test_streams_encoded_image(self):
+        with self.mock_get():
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 200)
+        self.assertTrue(res.streaming)
+        self.assertEqual(b''.join(res.streaming_content), base64.b64encode(self.image))
+        self.assertEqual(res.headers['Content-Type'], ContentType.PNG)
+        self.assertEqual(res.headers['ETag'], f'"{sha256(self.image).hexdigest()}"')
+        self.assertIn('max-age=', res.headers['Cache-Control'])
+
+    def test_encodes_image_once(self):
+        with self.mock_get() as mock_get:
+            first = b''.join(self.client.get(self.url).streaming_content)
+            second = b''.join(self.client.get(self.url).streaming_content)
+        self.assertEqual(first, second)
+        mock_get.assert_called_once()
+
+    def test_not_modified(self):
+        with self.mock_get() as mock_get:
+            etag = self.client.get(self.url).headers['ETag']
+            res = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(res.status_code, 304)
+        self.assertEqual(res.headers['ETag'], etag)
+        mock_get.assert_called_once()
+
+    def test_edited_post_is_read_again(self):
+        with self.mock_get() as mock_get:
+            self.client.get(self.url)
+            self.post.content = 'http://images.example.com/dog.png'
+            self.post.save()
+            self.client.get(self.url)
+        self.assertEqual(mock_get.call_count, 2)
+
+    def test_unreachable_image(self):
+        with patch('posts.images.requests.get', side_effect=ConnectionError()):
+            res = self.client.get(self.url)
+        self.assertEqual(res.status_code, 404)
+
+
+class ImageVariantApiTests(TestCase):
+    def setUp(self) -> None:
+        self.client = Client()
+        self.author = get_user_model().objects.create_user(username='bob', password='password')
+        self.client.login(username='bob', password='password')
+        storage = patch.object(Post._meta.get_field('img_content'), 'storage', InMemoryStorage(base_url='/media/'))
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def test_exposes_variants(self):
+        post = Post.objects.create(
+            title='Image', description='An image', content_type=ContentType.PNG, content='',
+            img_content=create_image_upload(2000, 1000), author=self.author, unlisted=False)
+        res = self.client.get(f'/api/v1/authors/{self.author.id}/posts/{post.id}/')
+        self.assertEqual(res.json()['imageVariants'], {
+            name: f'/media/{variant["name"]}' for (name, variant) in post.img_variants.items()})
+
+    def test_no_variants_for_text_posts(self):
+        post = Post.objects.create(
+            title='Text', description='Text', content_type=ContentType.PLAIN, content='Hi',
+            author=self.author, unlisted=False)
+        res = self.client.get(f'/api/v1/authors/{self.author.id}/posts/{post.id}/')
+        self.assertNotIn('imageVariants', res.json())
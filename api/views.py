@@ -1,11 +1,13 @@
-import base64
 import requests
+from sys import stderr
 from typing import Any
-from django.http import HttpResponse
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, HttpResponseNotModified
 from urllib.parse import urlparse
 from django.http.request import HttpRequest
 from django.http import Http404, HttpResponse
 from django.shortcuts import get_object_or_404
+from django.db.models import Count, Prefetch
 from django.contrib.auth import get_user_model
 from rest_framework.request import Request
 from rest_framework import viewsets, permissions, status
@@ -17,11 +19,13 @@ from rest_framework.exceptions import PermissionDenied
 
 from api.serializers import AuthorSerializer, CommentSerializer, FollowersSerializer, PostSerializer, LikesSerializer, CommentLikeSerializer, RemoteCommentSerializer, RemoteLikeSerializer
 from rest_framework.exceptions import MethodNotAllowed
+from api.serializers import embedded_comments_queryset
 from json import JSONDecodeError, loads as json_loads
 
 from typing import Any
 from follow.models import Follow, Request, RemoteRequest
 from api.util import page_number_pagination_class_factory
+from posts.images import image_cache
 from posts.models import Post, ContentType, Like, Comment, RemoteComment, RemoteLike
 
 
@@ -80,6 +84,12 @@ class AuthorViewSet(viewsets.ModelViewSet):
         raise MethodNotAllowed(request.method)
 
 
+def set_image_cache_headers(response: HttpResponse, digest: str) -> HttpResponse:
+    response['ETag'] = f'"{digest}"'
+    response['Cache-Control'] = f'private, max-age={settings.IMAGE_CACHE_MAX_AGE}'
+    return response
+
+
 class PostViewSet(viewsets.ModelViewSet):
     renderer_classes = [JSONRenderer]
     pagination_class = page_number_pagination_class_factory([('type', 'posts')])
@@ -89,7 +99,12 @@ class PostViewSet(viewsets.ModelViewSet):
     http_method_names = ['get', 'post', 'delete', 'put']
 
     def get_queryset(self):
-        return Post.objects.filter(author=self.kwargs['author_pk']).order_by('-date_published')
+        comments = Prefetch('comment_set', queryset=embedded_comments_queryset(), to_attr='embedded_comments')
+        return Post.objects.filter(author=self.kwargs['author_pk']) \
+            .select_related('author') \
+            .prefetch_related('categories', comments) \
+            .annotate(comment_count=Count('comment')) \
+            .order_by('-date_published')
 
     # detail indicates  whether we can do this on the list (false), or only a single item (true)
     @action(methods=['get'], detail=True, url_path='image', name='image')
@@ -102,10 +117,17 @@ class PostViewSet(viewsets.ModelViewSet):
         if post.content_type != ContentType.PNG and post.content_type != ContentType.JPG:
             return Response(status=404)
 
-        location = post.img_content.url if post.img_content else post.content
-        encoded_img = base64.b64encode(requests.get(location).content)
+        # The image is encoded once, afterwards clients revalidate with the hash of the image
+        digest = image_cache.get_digest(post)
+        if digest is not None and request.headers.get('If-None-Match') == f'"{digest}"':
+            return set_image_cache_headers(HttpResponseNotModified(), digest)
 
-        return HttpResponse(encoded_img, content_type=post.content_type)
+        try:
+            digest, encoded_img = image_cache.get(post)
+        except (requests.RequestException, OSError) as err:
+            print(f'Could not read the image of post {post.id}, err: {err}', file=stderr)
+            raise Http404
+        return set_image_cache_headers(FileResponse(encoded_img, content_type=post.content_type), digest)
 
     def create(self, request: Request, *args, **kwargs):
         if request.user.is_api_user:
@@ -199,12 +221,16 @@ class LikesViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
 
     def get_queryset(self):
-        return Post.objects.get(pk=self.kwargs['post_pk']).like_set.all().order_by('author_id')
+        return Like.objects.filter(post_id=self.kwargs['post_pk']) \
+            .select_related('author', 'post') \
+            .order_by('author_id')
 
     def list(self, request, *args, **kwargs):
         response: Response = super().list(request, *args, **kwargs)
 
-        remote_like_query_set = Post.objects.get(pk=self.kwargs['post_pk']).remotelike_set.all().order_by('author_url')
+        remote_like_query_set = RemoteLike.objects.filter(post_id=self.kwargs['post_pk']) \
+            .select_related('post') \
+            .order_by('author_url')
         serialized_remote_likes = RemoteLikeSerializer(remote_like_query_set, many=True, context={'request': request})
 
         if len(serialized_remote_likes.data) > 0:
@@ -221,7 +247,9 @@ class LikedViewSet(viewsets.ModelViewSet):
     http_method_names = ['get']
 
     def get_queryset(self):
-        return Like.objects.filter(author_id=self.kwargs['author_pk']).order_by('author_id')
+        return Like.objects.filter(author_id=self.kwargs['author_pk']) \
+            .select_related('author', 'post') \
+            .order_by('author_id')
 
 
 class CommentViewSet(viewsets.ModelViewSet):
@@ -0,0 +1,142 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from sys import stderr
+from typing import Optional
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+import requests
+
+from lib.constants import GitHub_EventType
+from lib.url import get_github_user_from_url
+from .models import GitHubActivity
+
+GITHUB_EVENTS_URL = 'https://api.github.com/users/{}/events'
+# GitHub only lists the events of the last 90 days
+ACTIVITY_DAYS = 90
+COUNTED_FIELDS = ('commits', 'pull_requests', 'reviews', 'issues')
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='github-activity')
+_refreshing: set[str] = set()
+_lock = threading.Lock()
+
+
+def get_github_activity(github_url: str) -> Optional[GitHubActivity]:
+    """
+    Returns the stored activity of the GitHub user of `github_url`, without requesting it from GitHub. Activity that
+    is missing or older than `GITHUB_ACTIVITY_REFRESH_INTERVAL` seconds is refreshed in the background.
+    """
+    username = get_github_user_from_url(github_url)
+    if not username:
+        return None
+
+    activity = GitHubActivity.objects.filter(username=username.lower()).first()
+    stale_before = timezone.now() - timedelta(seconds=settings.GITHUB_ACTIVITY_REFRESH_INTERVAL)
+    if activity is None or activity.refreshed is None or activity.refreshed < stale_before:
+        refresh_later(username)
+    # The ETag is only stored once every event was read
+    return activity if activity is not None and activity.etag else None
+
+
+def refresh_later(username: str):
+    if not settings.GITHUB_ACTIVITY_BACKGROUND_REFRESH:
+        return
+    username = username.lower()
+    with _lock:
+        if username in _refreshing:
+            return
+        _refreshing.add(username)
+
+    def run():
+        try:
+            refresh_activity(username)
+        except Exception as err:
+            print(f'Could not refresh the GitHub activity of {username}, err: {err}', file=stderr)
+        finally:
+            with _lock:
+                _refreshing.discard(username)
+            connection.close()
+
+    _executor.submit(run)
+
+
+def refresh_activity(username: str) -> GitHubActivity:
+    """
+    Adds the events of `username` published since the last refresh, and drops the ones older than `ACTIVITY_DAYS`.
+
+    The first page is requested with the ETag of the last refresh, which GitHub answers with a 304 when nothing
+    changed. Otherwise pages are read until the last event seen before.
+    """
+    activity, _ = GitHubActivity.objects.get_or_create(username=username.lower())
+    new_events = get_new_events(activity)
+    if new_events is None:
+        # Keep what was stored, an incomplete refresh would skip the events that are missing
+        activity.refreshed = timezone.now()
+        activity.save(update_fields=['refreshed'])
+        return activity
+
+    counted = [[event['id'], event['created_at'], *counts]
+               for (event, counts) in ((event, count_event(event)) for event in new_events) if any(counts)]
+    since = timezone.now() - timedelta(days=ACTIVITY_DAYS)
+    activity.events = [event for event in counted + activity.events if parse_datetime(event[1]) >= since]
+    for index, field in enumerate(COUNTED_FIELDS):
+        setattr(activity, field, sum(event[2 + index] for event in activity.events))
+    if new_events:
+        activity.last_event_id = str(new_events[0]['id'])
+    activity.refreshed = timezone.now()
+    activity.save()
+    return activity
+
+
+def get_new_events(activity: GitHubActivity) -> Optional[list[dict]]:
+    """
+    Returns the events published since the last refresh, newest first, and updates the ETag of `activity`. Returns
+    `None` when GitHub could not be read.
+    """
+    last_event_id = int(activity.last_event_id) if activity.last_event_id.isdigit() else None
+    events = []
+    page = 1
+    while True:
+        headers = {'Accept': 'application/vnd.github.v3+json'}
+        if page == 1 and activity.etag:
+            # Only the first page is conditional
+            headers['If-None-Match'] = activity.etag
+        response = requests.get(
+            GITHUB_EVENTS_URL.format(activity.username),
+            params={'per_page': 100, 'page': page},
+            headers=headers,
+            timeout=settings.GITHUB_REQUEST_TIMEOUT)
+        if response.status_code == 304:
+            return []
+        if response.status_code != 200:
+            print(f'GitHub activity request failed with code {response.status_code}', file=stderr)
+            return None
+        if page == 1:
+            etag = response.headers.get('ETag', '')
+
+        for event in response.json():
+            if last_event_id is not None and int(event['id']) <= last_event_id:
+                activity.etag = etag
+                return events
+            events.append(event)
+
+        if 'rel="next"' not in response.headers.get('Link', ''):
+            activity.etag = etag
+            return events
+        page += 1
+
+
+def count_event(event: dict) -> list[int]:
+    """Returns how many commits, pull requests, reviews and issues `event` adds, in the order of `COUNTED_FIELDS`."""
+    counts = [0, 0, 0, 0]
+    if event['type'] == GitHub_EventType.PushEvent:
+        counts[0] += event['payload']['distinct_size']
+    if event['type'] == GitHub_EventType.PullRequestEvent and event['payload']['action'] == 'opened':
+        counts[1] += 1
+    if event['type'] == GitHub_EventType.PullRequestReviewEvent:
+        counts[2] += 1
+    if event['type'] == GitHub_EventType.IssuesEvent:
+        counts[3] += 1
+    return counts
@@ -0,0 +1,28 @@
+from sys import stderr
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+
+from auth_provider.github import refresh_activity
+from auth_provider.models import GitHubActivity
+from lib.url import get_github_user_from_url
+
+
+class Command(BaseCommand):
+    help = 'Refreshes the stored GitHub activity of every local user, and of the remote users shown before'
+
+    def handle(self, *args, **options):
+        usernames = set(GitHubActivity.objects.values_list('username', flat=True))
+        for github_url in get_user_model().objects.exclude(github_url='').values_list('github_url', flat=True):
+            username = get_github_user_from_url(github_url)
+            if username:
+                usernames.add(username.lower())
+
+        for username in sorted(usernames):
+            # One user failing to refresh (e.g. GitHub timing out) doesn't stop the others
+            try:
+                activity = refresh_activity(username)
+            except Exception as err:
+                print(f'Could not refresh the GitHub activity of {username}, err: {err}', file=stderr)
+                continue
+            self.stdout.write(f'{username}: {activity.commits} commit(s), {activity.pull_requests} pull request(s), '
+                              f'{activity.reviews} review(s), {activity.issues} issue(s)')
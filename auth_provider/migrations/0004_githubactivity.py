@@ -0,0 +1,31 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:14
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth_provider', '0003_alter_user_is_api_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='GitHubActivity',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('username', models.CharField(max_length=255, unique=True)),
+                ('commits', models.PositiveIntegerField(default=0)),
+                ('pull_requests', models.PositiveIntegerField(default=0)),
+                ('reviews', models.PositiveIntegerField(default=0)),
+                ('issues', models.PositiveIntegerField(default=0)),
+                ('events', models.JSONField(blank=True, default=list)),
+                ('etag', models.CharField(blank=True, max_length=255)),
+                ('last_event_id', models.CharField(blank=True, max_length=255)),
+                ('refreshed', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name_plural': 'GitHub activities',
+            },
+        ),
+    ]
@@ -20,3 +20,26 @@ class User(AbstractUser):
     def clean(self):
         if self.profile_image_url is None or self.profile_image_url == '':
             self.profile_image_url = static('default.jpg')
+
+
+class GitHubActivity(models.Model):
+    """
+    Activity of a GitHub user over the last 90 days, refreshed in the background by `auth_provider.github`.
+    """
+    username = models.CharField(max_length=CHAR_FIELD_MAX_LENGTH, unique=True)
+    commits = models.PositiveIntegerField(default=0)
+    pull_requests = models.PositiveIntegerField(default=0)
+    reviews = models.PositiveIntegerField(default=0)
+    issues = models.PositiveIntegerField(default=0)
+    # Events that counted towards the activity as [id, created_at, commits, pull_requests, reviews, issues]
+    events = models.JSONField(default=list, blank=True)
+    # Of the last complete refresh, to only ask GitHub for what changed since
+    etag = models.CharField(max_length=CHAR_FIELD_MAX_LENGTH, blank=True)
+    last_event_id = models.CharField(max_length=CHAR_FIELD_MAX_LENGTH, blank=True)
+    refreshed = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        verbose_name_plural = 'GitHub activities'
+
+    def __str__(self):
+        return self.username
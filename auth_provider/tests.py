@@ -1,3 +1,5 @@
+from io import StringIO
+from django.core.management import call_command
 from django.urls import reverse
 from django.http import HttpResponse
 from django.test import TestCase, Client
@@ -7,6 +9,10 @@ import json
 from requests import Response
 from api.tests.constants import SAMPLE_REMOTE_AUTHOR
 from unittest.mock import MagicMock, patch
+from datetime import timedelta
+from django.utils import timezone
+from auth_provider.github import refresh_activity
+from auth_provider.models import GitHubActivity
 from servers.models import Server
 from api.tests.test_api import TEST_PASSWORD, TEST_USERNAME
 
@@ -121,3 +127,101 @@ class ProfileTests(TestCase):
         res = self.client.get(reverse_lazy('auth_provider:my_profile'))
         self.assertEqual(res.status_code, 200)
         self.assertTemplateUsed(res, 'profile/my_profile.html')
+
+
+def create_github_response(status_code: int, events: list = None, etag: str = '', link: str = '') -> Response:
+    response = Response()
+    response.status_code = status_code
+    response.headers['ETag'] = etag
+    if link:
+        response.headers['Link'] = link
+    response.json = MagicMock(return_value=events or [])
+    return response
+
+
+def create_github_event(id: int, type: str, days_ago: int = 0, **payload) -> dict:
+    created_at = timezone.now() - timedelta(days=days_ago)
+    return {'id': str(id), 'type': type, 'created_at': created_at.strftime('%Y-%m-%dT%H:%M:%SZ'), 'payload': payload}
+
+
+class GitHubActivityTests(TestCase):
+    def setUp(self) -> None:
+        self.user = get_user_model().objects.create_user(username=TEST_USERNAME, password=TEST_PASSWORD)
+        self.user.github_url = 'https://github.com/Octocat'
+        self.user.save()
+
+    def test_profile_reads_stored_activity(self):
+        GitHubActivity.objects.create(username='octocat', commits=7, etag='"a"', refreshed=timezone.now())
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        with patch('auth_provider.github.requests.get') as get, \
+                patch('auth_provider.github.refresh_later') as refresh_later:
+            res = self.client.get(reverse_lazy('auth_provider:my_profile'))
+        self.assertContains(res, 'Commits: 7')
+        get.assert_not_called()
+        refresh_later.assert_not_called()
+
+    def test_profile_refreshes_stale_activity_later(self):
+        GitHubActivity.objects.create(username='octocat', etag='"a"', refreshed=timezone.now() - timedelta(days=1))
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        with patch('auth_provider.github.refresh_later') as refresh_later:
+            res = self.client.get(reverse_lazy('auth_provider:my_profile'))
+        self.assertContains(res, 'GitHub Activity')
+        refresh_later.assert_called_once_with('Octocat')
+
+    def test_refresh_counts_events(self):
+        events = [
+            create_github_event(4, 'PushEvent', distinct_size=3),
+            create_github_event(3, 'PullRequestEvent', action='opened'),
+            create_github_event(2, 'PullRequestEvent', action='closed'),
+            create_github_event(1, 'IssuesEvent', days_ago=100),
+        ]
+        with patch('auth_provider.github.requests.get', return_value=create_github_response(200, events, '"a"')):
+            activity = refresh_activity('Octocat')
+        self.assertEqual((activity.commits, activity.pull_requests, activity.issues), (3, 1, 0))
+        self.assertEqual((activity.etag, activity.last_event_id), ('"a"', '4'))
+
+    def test_refresh_only_reads_new_events(self):
+        GitHubActivity.objects.create(
+            username='octocat', commits=2, etag='"a"', last_event_id='4',
+            events=[['4', create_github_event(4, 'PushEvent')['created_at'], 2, 0, 0, 0]])
+        events = [create_github_event(5, 'IssuesEvent'), create_github_event(4, 'PushEvent', distinct_size=2)]
+        response = create_github_response(200, events, '"b"', link='<https://api.github.com>; rel="next"')
+        with patch('auth_provider.github.requests.get', return_value=response) as get:
+            activity = refresh_activity('octocat')
+        get.assert_called_once()
+        self.assertEqual(get.call_args.kwargs['headers']['If-None-Match'], '"a"')
+        self.assertEqual((activity.commits, activity.issues), (2, 1))
+        self.assertEqual((activity.etag, activity.last_event_id), ('"b"', '5'))
+
+    def test_unchanged_activity(self):
+        GitHubActivity.objects.create(
+            username='octocat', commits=2, etag='"a"', last_event_id='4',
+            events=[['4', create_github_event(4, 'PushEvent')['created_at'], 2, 0, 0, 0],
+                    ['3', create_github_event(3, 'PushEvent', days_ago=91)['created_at'], 5, 0, 0, 0]])
+        with patch('auth_provider.github.requests.get', return_value=create_github_response(304)):
+            activity = refresh_activity('octocat')
+        # Events older than 90 days no longer count
+        self.assertEqual(activity.commits, 2)
+        self.assertEqual(activity.etag, '"a"')
+
+    def test_command_continues_after_failed_user(self):
+        GitHubActivity.objects.create(username='hubot')
+        responses = [ConnectionError('GitHub is down'), create_github_response(200, [], '"a"')]
+        out = StringIO()
+        with patch('auth_provider.github.requests.get', side_effect=responses), \
+                patch('auth_provider.management.commands.refresh_github_activity.stderr', StringIO()) as err:
+            call_command('refresh_github_activity', stdout=out)
+        self.assertIn('hubot', err.getvalue())
+        self.assertIn('octocat: 0 commit(s)', out.getvalue())
+        self.assertEqual(GitHubActivity.objects.get(username='octocat').etag, '"a"')
+
+    def test_failed_refresh_keeps_activity(self):
+        GitHubActivity.objects.create(username='octocat', commits=2, etag='"a"', last_event_id='4')
+        responses = [create_github_response(200, [create_github_event(6, 'IssuesEvent')], '"b"',
+                                            link='<https://api.github.com>; rel="next"'),
+                     create_github_response(403)]
+        with patch('auth_provider.github.requests.get', side_effect=responses):
+            activity = refresh_activity('octocat')
+        activity.refresh_from_db()
+        self.assertEqual((activity.commits, activity.issues, activity.etag), (2, 0, '"a"'))
+        self.assertIsNotNone(activity.refreshed)
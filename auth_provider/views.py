@@ -1,4 +1,3 @@
-import requests
 import json
 from typing import Any, Dict, Optional
 from django.shortcuts import redirect
@@ -10,8 +9,8 @@ from requests import Response
 
 from servers.views.generic.detailed_view import ServerDetailView
 
-from lib.constants import GitHub_EventType
 from lib.url import get_github_user_from_url
+from .github import get_github_activity
 from .user_resources import user_resources
 from .forms import SignUpForm, EditProfileForm
 from .user_action_generators import UserActionGenerator, user_action_generators
@@ -116,50 +115,3 @@ class EditProfileView(UpdateView):
 def logout_view(request):
     logout(request)
     return redirect('/')
-
-
-def get_github_activity(github_url: str):
-    github_username = get_github_user_from_url(github_url)
-    if not github_username:
-        return None
-
-    def send_get_github_activity(user: str, page: int = 1):
-        return requests.get(
-            f'https://api.github.com/users/{user}/events?accept=application/vnd.github.v3+json&per_page=100&page={page}')
-
-    page = 1
-    activity = {
-        'username': github_username,
-        'commits': 0,
-        'pull_requests': 0,
-        'reviews': 0,
-        'issues': 0,
-    }
-    success = False
-    while True:
-        github_activity_request = send_get_github_activity(github_username, page)
-        if github_activity_request.status_code == 200:
-            parse_github_activity(activity, github_activity_request.json())
-            success |= True
-        else:
-            print('GitHub activity request failed with code ' + github_activity_request.status_code)
-            break
-
-        if 'Link' in github_activity_request.headers and 'rel="next"' in github_activity_request.headers['Link']:
-            page += 1
-        else:
-            break
-
-    return activity if success else None
-
-
-def parse_github_activity(activity: dict, json: dict):
-    for event in json:
-        if event['type'] == GitHub_EventType.PushEvent:
-            activity['commits'] += event['payload']['distinct_size']
-        if event['type'] == GitHub_EventType.PullRequestEvent and event['payload']['action'] == 'opened':
-            activity['pull_requests'] += 1
-        if event['type'] == GitHub_EventType.PullRequestReviewEvent:
-            activity['reviews'] += 1
-        if event['type'] == GitHub_EventType.IssuesEvent:
-            activity['issues'] += 1
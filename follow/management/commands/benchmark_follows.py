@@ -0,0 +1,40 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test import RequestFactory
+
+from follow.models import Follow
+from follow.views import MyFriendsView
+from lib.benchmark import measure, rolled_back
+
+
+class Command(BaseCommand):
+    help = 'Times the follower and friend lookups of a user with many followers, on data rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--followers', type=int, default=10000, help='Followers of the measured user')
+        parser.add_argument('--friends', type=int, default=1000, help='Followers the measured user follows back')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def measure(self, name: str, run, repeat: int):
+        elapsed, queries = measure(run, repeat)
+        self.stdout.write(f'{name}: {elapsed:.1f} ms, {queries} queries per call')
+
+    def handle(self, *args, **options):
+        with rolled_back():
+            self.run(options['followers'], options['friends'], options['repeat'])
+
+    def run(self, followers: int, friends: int, repeat: int):
+        User = get_user_model()
+        user = User.objects.create(username='benchmark_follows')
+        users = User.objects.bulk_create(User(username=f'benchmark_follows_{i}') for i in range(followers))
+        Follow.objects.bulk_create(Follow(follower=follower, followee=user) for follower in users)
+        Follow.objects.bulk_create(Follow(follower=user, followee=friend) for friend in users[:friends])
+
+        self.measure('followers', lambda: list(Follow.objects.followers(user)), repeat)
+        self.measure('followings', lambda: list(Follow.objects.followings(user)), repeat)
+        self.measure('true_friend', lambda: list(Follow.objects.true_friend(user)), repeat)
+
+        request = RequestFactory().get('/follow/friends/')
+        request.user = user
+        view = MyFriendsView.as_view()
+        self.measure('friends page', lambda: view(request).render(), repeat)
@@ -0,0 +1,21 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('follow', '0005_remoterequest_remotefollower'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['follower', 'followee'], name='follow_follower_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='follow',
+            index=models.Index(fields=['followee', '-created'], name='follow_followee_created_idx'),
+        ),
+    ]
@@ -1,4 +1,5 @@
 from django.db import models
+from django.db.models import Exists, OuterRef, Q
 from django.contrib.auth import get_user_model
 from django.db import IntegrityError
 from django.core.exceptions import ValidationError
@@ -18,24 +19,16 @@ class AlreadyExistsError(IntegrityError):
 
 
 class FollowManager(models.Manager):
+    # The followings, followers and friends of a user are querysets of users, filtered in SQL through the follows
     def followings(self, user):
-        qs = Follow.objects.filter(follower=user).all()
-        followings = [_.followee for _ in qs]
-        return followings
+        return USER_MODEL.objects.filter(followee__follower=user)
 
     def followers(self, user):
-        qs = Follow.objects.filter(followee=user).all()
-        followers = [_.follower for _ in qs]
-        return followers
+        return USER_MODEL.objects.filter(follower__followee=user)
 
     def true_friend(self, user):
-        followers = self.followers(user)
-        followings = set(self.followings(user))
-        friends = []
-        for follower in followers:
-            if follower in followings:
-                friends.append(follower)
-        return friends
+        follows_back = Follow.objects.filter(follower=user, followee=OuterRef('pk'))
+        return self.followers(user).filter(Exists(follows_back))
 
     def request(self, user):
         qs = (Request.objects.select_related("from_user", "to_user").filter(to_user=user).all())
@@ -87,14 +80,8 @@ class FollowManager(models.Manager):
             return False
 
     def check_true_friend(self, follower, followee):
-        if Follow.objects.filter(
-            follower=follower,
-            followee=followee).exists() and Follow.objects.filter(
-                follower=followee,
-                followee=follower).exists():
-            return True
-        else:
-            return False
+        return Follow.objects.filter(
+            Q(follower=follower, followee=followee) | Q(follower=followee, followee=follower)).count() == 2
 
 
 class Follow(models.Model):
@@ -105,6 +92,12 @@ class Follow(models.Model):
 
     class Meta:
         unique_together = ("followee", "follower")
+        indexes = [
+            # Users followed by a user, the unique constraint covers the followers of a user
+            models.Index(fields=["follower", "followee"], name="follow_follower_idx"),
+            # Followers of a user, newest first
+            models.Index(fields=["followee", "-created"], name="follow_followee_created_idx"),
+        ]
 
     def __str__(self):
         return f"{self.followee} is followed by {self.follower}"
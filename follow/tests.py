@@ -72,6 +72,23 @@ class FollowModelTests(TestCase):
         self.assertEqual(len(Follow.objects.true_friend(self.bob)), 0)
         self.assertEqual(len(Follow.objects.true_friend(self.alice)), 0)
 
+    def test_friends_are_computed_in_one_query(self):
+        carol = get_user_model().objects.create_user(username='carol', password='password')
+        dave = get_user_model().objects.create_user(username='dave', password='password')
+        for user in (self.alice, carol):
+            Follow.objects.create(follower=user, followee=self.bob)
+        for user in (self.alice, dave):
+            Follow.objects.create(follower=self.bob, followee=user)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(set(Follow.objects.followers(self.bob)), {self.alice, carol})
+        with self.assertNumQueries(1):
+            self.assertEqual(set(Follow.objects.followings(self.bob)), {self.alice, dave})
+        with self.assertNumQueries(1):
+            self.assertEqual(list(Follow.objects.true_friend(self.bob)), [self.alice])
+        self.assertTrue(Follow.objects.check_true_friend(self.bob, self.alice))
+        self.assertFalse(Follow.objects.check_true_friend(self.bob, carol))
+
 
 class RemoteFollowerModelTests(TestCase):
     def setUp(self) -> None:
@@ -153,3 +170,21 @@ class UsersViewTests(TestCase):
 
             for author in mock_json_response['items']:
                 self.assertContains(res, author['displayName'])
+
+    def test_marks_unavailable_servers(self):
+        mock_server = Server(
+            service_address="http://localhost:5555/api/v2",
+            username="hello",
+            password="no",
+        )
+        mock_server.get = MagicMock(side_effect=ConnectionError())
+
+        with patch('servers.models.Server.objects') as MockServerObjects:
+            MockServerObjects.all.return_value = [mock_server]
+
+            self.client.login(username=self.bob.username, password='password')
+            res = self.client.get(reverse('follow:users'))
+            self.assertEqual(res.status_code, 200)
+            self.assertEqual(res.context['unavailable_servers'], [mock_server])
+            self.assertContains(res, 'Some servers are unavailable')
+            self.assertContains(res, self.alice.username)
@@ -162,4 +162,4 @@ class MyFriendsView(LoginRequiredMixin, ListView):
     template_name = 'follow/friend_list.html'
 
     def get_queryset(self):
-        return Follow.objects.true_friend(self.request.user)
+        return Follow.objects.true_friend(self.request.user).order_by('username')
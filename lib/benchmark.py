@@ -0,0 +1,39 @@
+from contextlib import contextmanager
+from time import perf_counter
+from typing import Any, Callable
+from django.db import connection, transaction
+
+
+class Rollback(Exception):
+    pass
+
+
+@contextmanager
+def rolled_back():
+    """Rolls back everything written to the database inside the block."""
+    try:
+        with transaction.atomic():
+            yield
+            raise Rollback()
+    except Rollback:
+        pass
+
+
+def measure(run: Callable[[], Any], repeat: int) -> tuple[float, int]:
+    """
+    Calls `run` once to warm up, then `repeat` times. Returns the milliseconds and the queries of each of these calls.
+    """
+    run()
+    queries = 0
+
+    def count_queries(execute, *args):
+        nonlocal queries
+        queries += 1
+        return execute(*args)
+
+    with connection.execute_wrapper(count_queries):
+        start = perf_counter()
+        for _ in range(repeat):
+            run()
+        elapsed = perf_counter() - start
+    return elapsed / repeat * 1000, queries // repeat
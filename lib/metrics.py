@@ -0,0 +1,16 @@
+from typing import Callable
+
+# Holds the name of a group of metrics, and a function returning their current values
+metrics: list[tuple[str, Callable[[], dict]]] = []
+
+
+def register(name: str, get_values: Callable[[], dict]):
+    metrics.append((name, get_values))
+
+
+def get_metrics() -> dict[str, dict]:
+    return {name: get_values() for (name, get_values) in metrics}
+
+
+def hit_rate(hits: int, misses: int) -> float:
+    return hits / (hits + misses) if hits + misses else 0.0
@@ -1,3 +1,7 @@
+from hashlib import sha256
+from typing import Optional
+from django.conf import settings
+from django.core.cache import cache
 from django.core.validators import URLValidator
 from django.core.exceptions import ValidationError
 
@@ -24,20 +28,46 @@ def is_url_image(url: str) -> bool:
     return (mimetype and mimetype[0] and mimetype[0].startswith('image'))
 
 
-def is_url_valid_image(url: str) -> bool:
-    # check the returned returned content type
-    head = requests.head(url)
-    if head.headers.get('content-type').startswith('image'):
-        return True
+def check_url_is_image(url: str) -> bool:
+    timeout = settings.IMAGE_URL_VALIDATION_TIMEOUT
+    try:
+        # check the returned returned content type
+        head = requests.head(url, timeout=timeout)
+        if head.headers.get('content-type', '').startswith('image'):
+            return True
 
-    if head.status_code == 403:
-        # if HEAD isn't allowed, try a GET
-        get = requests.get(url)
-        return get.headers.get('content-type').startswith('image')
+        if head.status_code == 403:
+            # if HEAD isn't allowed, try a GET, without downloading the image
+            with requests.get(url, stream=True, timeout=timeout) as get:
+                return get.headers.get('content-type', '').startswith('image')
+    except requests.RequestException:
+        return False
 
     return False
 
 
+def get_image_validation_key(url: str) -> str:
+    return f'image-url:{sha256(url.encode()).hexdigest()}'
+
+
+def get_cached_image_validation(url: str) -> Optional[bool]:
+    """Returns whether `url` was found to be an image, or `None` if it wasn't checked recently."""
+    return cache.get(get_image_validation_key(url))
+
+
+def is_url_valid_image(url: str) -> bool:
+    """
+    Returns whether `url` is an image. Results are cached for `IMAGE_URL_CACHE_TTL` seconds, or
+    `IMAGE_URL_NEGATIVE_TTL` seconds for URLs that are not images or could not be reached.
+    """
+    valid = get_cached_image_validation(url)
+    if valid is None:
+        valid = check_url_is_image(url)
+        ttl = settings.IMAGE_URL_CACHE_TTL if valid else settings.IMAGE_URL_NEGATIVE_TTL
+        cache.set(get_image_validation_key(url), valid, ttl)
+    return valid
+
+
 def get_github_user_from_url(url: str):
     parsed_url = parse.urlparse(url)
     if parsed_url.scheme == 'http' or parsed_url.scheme == 'https':
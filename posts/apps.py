@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class PostsConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'posts'
+
+    def ready(self):
+        # Register the fragment cache metrics
+        from posts import fragments  # noqa
+        # Connect the receiver checking linked images in the background
+        from posts import signals  # noqa
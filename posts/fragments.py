@@ -0,0 +1,56 @@
+import threading
+from collections import defaultdict
+from hashlib import sha256
+from typing import Any, Callable, Iterable, Optional
+from django.conf import settings
+from django.core.cache import caches
+
+from lib import metrics
+
+_lock = threading.Lock()
+# Hits and misses of each fragment name
+_stats: dict[str, list[int]] = defaultdict(lambda: [0, 0])
+
+
+def get_fragment_key(fragment_name: str, obj: Any, vary_on: Iterable[Any] = ()) -> Optional[str]:
+    """
+    Returns the cache key of the fragment rendered for `obj`, or `None` if `obj` can't be cached. The key changes
+    every time `obj` is saved, or one of the `vary_on` values changes (e.g. fields of related objects).
+    """
+    meta = getattr(obj, '_meta', None)
+    updated = getattr(obj, 'updated', None)
+    if meta is None or obj.pk is None or updated is None:
+        return None
+    values = sha256('\n'.join(str(value) for value in vary_on).encode()).hexdigest()
+    return f'fragment:{fragment_name}:{meta.label_lower}:{obj.pk}:{updated.timestamp()}:{values}'
+
+
+def get_or_render(fragment_name: str, obj: Any, render: Callable[[], str], vary_on: Iterable[Any] = ()) -> str:
+    key = get_fragment_key(fragment_name, obj, vary_on) if settings.FRAGMENT_CACHE_ENABLED else None
+    if key is None:
+        return render()
+
+    cache = caches[settings.FRAGMENT_CACHE_ALIAS]
+    fragment = cache.get(key)
+    with _lock:
+        _stats[fragment_name][0 if fragment is not None else 1] += 1
+    if fragment is None:
+        fragment = render()
+        cache.set(key, fragment, settings.FRAGMENT_CACHE_TTL)
+    return fragment
+
+
+def stats() -> dict:
+    with _lock:
+        return {
+            name: {'hits': hits, 'misses': misses, 'hit_rate': metrics.hit_rate(hits, misses)}
+            for name, (hits, misses) in _stats.items()
+        }
+
+
+def reset_stats():
+    with _lock:
+        _stats.clear()
+
+
+metrics.register('fragment_cache', stats)
@@ -0,0 +1,113 @@
+import base64
+import threading
+from hashlib import sha256
+from tempfile import SpooledTemporaryFile
+from typing import IO, Iterator, Optional
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files import File
+from django.core.files.storage import Storage, get_storage_class
+import requests
+
+from lib import metrics
+from posts.models import Post
+from servers.deadline import get_timeout
+
+# Bytes read from the image at once, a multiple of 3 so every chunk encodes to base64 without padding
+CHUNK_SIZE = 3 * 64 * 1024
+# Encoded images larger than this are spooled to a temporary file while they are written
+SPOOL_MAX_SIZE = 1024 * 1024
+
+
+class EncodedImageCache:
+    """
+    Base64 encoded images of posts, stored in `IMAGE_CACHE_STORAGE` under the SHA-256 of the image.
+
+    The hash of the image of a post is kept in the default cache until the post is saved again, so images are only
+    downloaded and encoded once, and identical images are stored once.
+    """
+
+    def __init__(self):
+        self._storage: Optional[Storage] = None
+        self._storage_config = None
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def storage(self) -> Storage:
+        config = settings.IMAGE_CACHE_STORAGE
+        with self._lock:
+            if self._storage is None or self._storage_config != config:
+                self._storage = get_storage_class(config['BACKEND'])(**config.get('OPTIONS', {}))
+                self._storage_config = config
+            return self._storage
+
+    def get_digest(self, post: Post) -> Optional[str]:
+        """Returns the hash of the image of `post` if it was encoded before, without reading the image."""
+        return cache.get(self._get_key(post))
+
+    def get(self, post: Post) -> tuple[str, IO[bytes]]:
+        """Returns the hash of the image of `post` and its encoded file, downloading and encoding it if needed."""
+        storage = self.storage
+        digest = self.get_digest(post)
+        if digest is not None and storage.exists(self._get_name(digest)):
+            self.hits += 1
+            return digest, storage.open(self._get_name(digest), 'rb')
+
+        self.misses += 1
+        with SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as encoded:
+            image_hash = sha256()
+            for chunk in read_image(post):
+                image_hash.update(chunk)
+                encoded.write(base64.b64encode(chunk))
+            digest = image_hash.hexdigest()
+            name = self._get_name(digest)
+            if not storage.exists(name):
+                encoded.seek(0)
+                storage.save(name, File(encoded))
+        cache.set(self._get_key(post), digest, None)
+        return digest, storage.open(name, 'rb')
+
+    def stats(self) -> dict:
+        return {
+            'storage': settings.IMAGE_CACHE_STORAGE['BACKEND'],
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': metrics.hit_rate(self.hits, self.misses),
+        }
+
+    @staticmethod
+    def _get_key(post: Post) -> str:
+        return f'image:{post.pk}:{post.updated.timestamp()}'
+
+    @staticmethod
+    def _get_name(digest: str) -> str:
+        return f'{digest}.b64'
+
+
+def read_image(post: Post) -> Iterator[bytes]:
+    """Yields the image of `post` in chunks of `CHUNK_SIZE` bytes, the last one may be shorter."""
+    if post.img_content:
+        with post.img_content.open('rb') as file:
+            yield from rechunk(file.chunks())
+        return
+
+    with requests.get(post.content, stream=True, timeout=get_timeout(settings.SERVER_REQUEST_TIMEOUT)) as response:
+        response.raise_for_status()
+        yield from rechunk(response.iter_content(CHUNK_SIZE))
+
+
+def rechunk(chunks: Iterator[bytes]) -> Iterator[bytes]:
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        while len(buffer) >= CHUNK_SIZE:
+            yield bytes(buffer[:CHUNK_SIZE])
+            del buffer[:CHUNK_SIZE]
+    if buffer:
+        yield bytes(buffer)
+
+
+image_cache = EncodedImageCache()
+metrics.register('image_cache', image_cache.stats)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.test.utils import override_settings
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from api.views import LikedViewSet, LikesViewSet
+from lib.benchmark import measure, rolled_back
+from posts.models import Comment, ContentType, Like, Post
+
+
+class Command(BaseCommand):
+    help = 'Times the likes and liked endpoints on generated data, which is rolled back afterwards'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--likes', type=int, default=100, help='Likes on the post, one per generated author')
+        parser.add_argument('--comments', type=int, default=100, help='Comments on the liked post')
+        parser.add_argument('--repeat', type=int, default=10)
+
+    def measure(self, name: str, view, request, repeat: int, **kwargs):
+        elapsed, queries = measure(lambda: view(request, **kwargs).render(), repeat)
+        self.stdout.write(f'{name}: {elapsed:.1f} ms, {queries} queries per request')
+
+    def handle(self, *args, **options):
+        # The request factory uses the host name "testserver"
+        with override_settings(ALLOWED_HOSTS=['testserver']), rolled_back():
+            self.run(options['likes'], options['comments'], options['repeat'])
+
+    def run(self, likes: int, comments: int, repeat: int):
+        User = get_user_model()
+        users = User.objects.bulk_create(User(username=f'benchmark_likes_{i}') for i in range(max(likes, 1)))
+        author = users[0]
+        post = Post.objects.create(title='Benchmark', description='', content='', author=author,
+                                   content_type=ContentType.PLAIN, unlisted=False)
+        Like.objects.bulk_create(Like(author=user, post=post) for user in users[:likes])
+        Comment.objects.bulk_create(
+            Comment(author=users[i % len(users)], post=post, comment='Benchmark') for i in range(comments))
+
+        factory = APIRequestFactory()
+        request = factory.get(f'/api/v1/authors/{author.id}/posts/{post.id}/likes/', {'size': likes})
+        force_authenticate(request, user=author)
+        self.measure('likes', LikesViewSet.as_view({'get': 'list'}), request, repeat,
+                     author_pk=author.id, post_pk=post.id)
+
+        request = factory.get(f'/api/v1/authors/{author.id}/liked/')
+        force_authenticate(request, user=author)
+        self.measure('liked', LikedViewSet.as_view({'get': 'list'}), request, repeat, author_pk=author.id)
@@ -0,0 +1,46 @@
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import connection
+
+from follow.models import Follow
+from posts.models import Comment, Like, Post
+from stream.models import TimelineEntry
+
+
+def get_hot_queries(user_id: int, post_id: int) -> dict:
+    """Returns the querysets of the stream, post, like and follow pages by name, for the given user and post."""
+    return {
+        'public posts': Post.objects.filter(visibility=Post.Visibility.PUBLIC, unlisted=False)
+        .order_by('-date_published'),
+        'posts visible to user': Post.objects.visible_to(user_id).order_by('-date_published'),
+        'posts of author': Post.objects.filter(author_id=user_id).order_by('-date_published'),
+        'shared timeline': TimelineEntry.objects.shared(),
+        'timeline': TimelineEntry.objects.of_user(user_id),
+        'comments of post': Comment.objects.filter(post_id=post_id).order_by('-date_published', '-id'),
+        'likes of post': Like.objects.filter(post_id=post_id).order_by('author_id'),
+        'like of user': Like.objects.filter(post_id=post_id, author_id=user_id),
+        'followings': Follow.objects.filter(follower_id=user_id).values('followee_id'),
+        'followers': Follow.objects.filter(followee_id=user_id).order_by('-created'),
+        'friends': Follow.objects.true_friend(user_id),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Prints the query plan of each hot query, to check which indexes the database uses'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Username the queries are run for, the first user by default')
+        parser.add_argument('--post', type=int, help='Id of the post the queries are run for, the latest by default')
+
+    def handle(self, *args, **options):
+        User = get_user_model()
+        if options['user']:
+            user_id = User.objects.get(username=options['user']).pk
+        else:
+            user_id = User.objects.order_by('pk').values_list('pk', flat=True).first() or 0
+        post_id = options['post'] or Post.objects.order_by('-pk').values_list('pk', flat=True).first() or 0
+
+        self.stdout.write(f'Query plans on {connection.vendor} for user {user_id} and post {post_id}')
+        for name, queryset in get_hot_queries(user_id, post_id).items():
+            self.stdout.write(f'\n{name}:')
+            self.stdout.write(queryset.explain())
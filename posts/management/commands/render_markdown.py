@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Comment, ContentType, Post
+
+
+class Command(BaseCommand):
+    help = 'Stores the rendered HTML of existing markdown posts and comments'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def render(self, queryset, fields: list[str], batch_size: int) -> int:
+        # Saving through bulk_update skips the side effects of `save` (image validation, timeline fan-out)
+        batch = []
+        rendered = 0
+        for obj in queryset.filter(content_type=ContentType.MARKDOWN).order_by('pk').iterator(chunk_size=batch_size):
+            obj.render_content()
+            batch.append(obj)
+            if len(batch) >= batch_size:
+                queryset.model.objects.bulk_update(batch, fields)
+                rendered += len(batch)
+                batch = []
+        if batch:
+            queryset.model.objects.bulk_update(batch, fields)
+            rendered += len(batch)
+        return rendered
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        posts = self.render(Post.objects.all(), ['content_html', 'content_html_no_links'], batch_size)
+        comments = self.render(Comment.objects.all(), ['comment_html'], batch_size)
+        self.stdout.write(self.style.SUCCESS(f'Rendered {posts} post(s) and {comments} comment(s)'))
@@ -0,0 +1,15 @@
+import re
+from markdown_it import MarkdownIt
+
+# Parsers are built once, rendering does not modify them
+_markdown = MarkdownIt('commonmark')
+_markdown_no_links = MarkdownIt('commonmark').disable('link')
+
+
+def render_markdown(value: str) -> str:
+    return _markdown.render(value)
+
+
+# https://stackoverflow.com/questions/53980097/removing-markup-links-in-text
+def render_markdown_no_links(value: str) -> str:
+    return re.sub(r"\[(.+)\]\(.+\)", r"\1", _markdown_no_links.render(value))
@@ -0,0 +1,28 @@
+# Generated by Django 4.0.2 on 2026-10-18 16:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0013_post_original_author'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='comment_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='post',
+            name='content_html_no_links',
+            field=models.TextField(blank=True, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 16:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0015_updated'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['post', '-date_published'], name='comment_post_published_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_comment_post_published_idx'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='img_variants',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
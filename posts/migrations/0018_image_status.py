@@ -0,0 +1,18 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:13
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0017_img_variants'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='image_status',
+            field=models.CharField(choices=[('VALID', 'Valid'), ('PENDING', 'Pending validation'), ('INVALID', 'Invalid')], default='VALID', editable=False, max_length=7),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0018_image_status'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', 'visibility', '-date_published'], name='post_author_visibility_idx'),
+        ),
+    ]
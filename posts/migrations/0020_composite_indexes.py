@@ -0,0 +1,25 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:19
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0019_post_author_visibility_idx'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='like',
+            index=models.Index(fields=['post', 'author'], name='like_post_author_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(condition=models.Q(('unlisted', False)), fields=['visibility', '-date_published'], name='post_listed_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='post',
+            index=models.Index(fields=['author', '-date_published'], name='post_author_published_idx'),
+        ),
+    ]
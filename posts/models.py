@@ -1,12 +1,18 @@
 import uuid
-from django.db import models
+from functools import partial
+from typing import Optional
+from django.conf import settings
+from django.db import models, transaction
 from django.forms import ValidationError
 from django.urls import reverse
 from django.contrib.auth import get_user_model
 from django.utils.translation import gettext_lazy as _
 
 from socialdistribution.storage import ImageStorage
-from lib.url import is_url_valid_image
+from follow.models import Follow
+from lib.url import get_cached_image_validation, is_url_valid_image
+from posts.markdown import render_markdown, render_markdown_no_links
+from posts.variants import create_variants, delete_variants, get_srcset, get_variant_url
 
 STR_MAX_LENGTH = 512
 
@@ -29,22 +35,50 @@ def img_content_filename(instance, filename):
     return filename
 
 
+class PostQuerySet(models.QuerySet):
+    def visible_to(self, user) -> 'PostQuerySet':
+        """
+        Returns the listed posts `user` can see: public posts, and the friends-only posts of the users following
+        `user`, as one query whatever the number of followers.
+        """
+        followers = Follow.objects.filter(followee=user).values('follower_id')
+        return self.filter(unlisted=False).filter(
+            models.Q(visibility=Post.Visibility.PUBLIC)
+            | models.Q(visibility=Post.Visibility.FRIENDS, author_id__in=followers))
+
+
 class Post(models.Model):
     class Visibility(models.TextChoices):
         PUBLIC = "PUBLIC"
         FRIENDS = "FRIENDS"
 
+    class ImageStatus(models.TextChoices):
+        VALID = 'VALID', _('Valid')
+        PENDING = 'PENDING', _('Pending validation')
+        INVALID = 'INVALID', _('Invalid')
+
     title = models.CharField(max_length=STR_MAX_LENGTH)
     description = models.CharField(max_length=STR_MAX_LENGTH)
     content_type = models.CharField(max_length=18, default=ContentType.PLAIN, choices=ContentType.choices)
     visibility = models.CharField(max_length=7, default=Visibility.PUBLIC, choices=Visibility.choices)
     content = models.TextField()
+    # Rendered `content` of markdown posts, kept up to date by `save`
+    content_html = models.TextField(blank=True, editable=False)
+    content_html_no_links = models.TextField(blank=True, editable=False)
     img_content = models.ImageField(
         null=True,
         blank=True,
         storage=ImageStorage(),
         upload_to=img_content_filename,
         verbose_name='Image')
+    # Resized copies of `img_content` by variant name, created by `save` when an image is uploaded
+    img_variants = models.JSONField(default=dict, blank=True, editable=False)
+    # Whether the image linked in `content` was found to be an image, see `clean`
+    image_status = models.CharField(
+        max_length=7,
+        default=ImageStatus.VALID,
+        choices=ImageStatus.choices,
+        editable=False)
     author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     original_author = models.ForeignKey(
         get_user_model(),
@@ -53,36 +87,150 @@ class Post(models.Model):
         blank=True,
         related_name='+', editable=False)
     date_published = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     unlisted = models.BooleanField()
     categories = models.ManyToManyField(Category, blank=True)
+    objects = PostQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            # Listed posts by visibility, newest first. Filtering on `unlisted=False` is written `NOT unlisted`, which
+            # SQLite can only match as the condition of a partial index, not as a column of the index
+            models.Index(
+                fields=['visibility', '-date_published'],
+                condition=models.Q(unlisted=False),
+                name='post_listed_published_idx'),
+            # Posts of an author, newest first
+            models.Index(fields=['author', '-date_published'], name='post_author_published_idx'),
+            # Friends-only posts of the followers of a user, newest first
+            models.Index(fields=['author', 'visibility', '-date_published'], name='post_author_visibility_idx'),
+        ]
+
+    # The linked image as last saved, which doesn't need to be checked again
+    _saved_linked_image: Optional[str] = None
+    # The name of the uploaded image as last saved, whose variants are deleted when it is replaced
+    _saved_image: Optional[str] = None
+    # Set by `clean` when the linked image is to be checked in the background once saved, see `posts.signals`
+    needs_image_validation = False
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        post = super().from_db(db, field_names, values)
+        post._saved_linked_image = post.get_linked_image()
+        post._saved_image = post.get_image_name()
+        return post
+
+    def get_linked_image(self) -> Optional[str]:
+        """Returns the URL in `content` of image posts without an uploaded image."""
+        # Read the loaded values, deferred fields are not linked images
+        values = self.__dict__
+        if values.get('content_type') in (ContentType.PNG, ContentType.JPG) and not values.get('img_content'):
+            return values.get('content')
+        return None
+
+    def get_image_name(self) -> Optional[str]:
+        # Read the loaded value, which is the stored name until the field is first accessed
+        image = self.__dict__.get('img_content')
+        return getattr(image, 'name', image) or None
 
     def clean(self):
         # Ensure that either the content is a link to image, or they uploaded one
-        if self.content_type == ContentType.PNG or self.content_type == ContentType.JPG:
-            if (not self.img_content and not is_url_valid_image(self.content)):
-                raise ValidationError(
-                    _('You must upload an image or link to a valid image url in the \'Content\' field.'))
+        linked_image = self.get_linked_image()
+        if linked_image is None:
+            self.image_status = self.ImageStatus.VALID
+            return
+        unchanged = linked_image == self._saved_linked_image
+        if unchanged and self.image_status != self.ImageStatus.PENDING:
+            return
+
+        # Images already being checked in the background are not requested again
+        if settings.IMAGE_URL_VALIDATION_ASYNC or unchanged:
+            valid = get_cached_image_validation(linked_image)
+        else:
+            valid = is_url_valid_image(linked_image)
+        if valid is None:
+            self.image_status = self.ImageStatus.PENDING
+            self.needs_image_validation = not unchanged
+        elif valid:
+            self.image_status = self.ImageStatus.VALID
+        elif unchanged:
+            self.image_status = self.ImageStatus.INVALID
+        else:
+            raise ValidationError(
+                _('You must upload an image or link to a valid image url in the \'Content\' field.'))
 
     def get_absolute_url(self):
         return reverse('posts:detail', kwargs={'pk': self.id})
 
+    def render_content(self):
+        if self.content_type == ContentType.MARKDOWN:
+            self.content_html = render_markdown(self.content)
+            self.content_html_no_links = render_markdown_no_links(self.content)
+        else:
+            self.content_html = ''
+            self.content_html_no_links = ''
+
+    def get_image_url(self, variant: str) -> str:
+        if self.img_content:
+            return get_variant_url(self.img_content, self.img_variants, variant)
+        return self.content
+
+    def get_image_srcset(self) -> str:
+        return get_srcset(self.img_content, self.img_variants) if self.img_content else ''
+
     def save(self, *args, **kwargs):
         self.clean()
-        return super(Post, self).save(*args, **kwargs)
+        self.render_content()
+        uploaded = bool(self.img_content) and not self.img_content._committed
+        # Variants of an image that is replaced or removed, deleted once the post is saved
+        stale_variants = self.img_variants if uploaded or not self.img_content else {}
+        if not self.img_content:
+            self.img_variants = {}
+        super(Post, self).save(*args, **kwargs)
+        self._saved_linked_image = self.get_linked_image()
+        if stale_variants:
+            transaction.on_commit(
+                partial(delete_variants, self.img_content.storage, stale_variants, self._saved_image))
+        self._saved_image = self.get_image_name()
+        if uploaded:
+            # The variants are named after the stored image, so they are created once it is saved
+            self.img_variants = create_variants(self.img_content)
+            Post.objects.filter(pk=self.pk).update(img_variants=self.img_variants)
 
 
 class Comment(models.Model):
     author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     comment = models.TextField()
+    # Rendered `comment` of markdown comments, kept up to date by `save`
+    comment_html = models.TextField(blank=True, editable=False)
     content_type = models.CharField(max_length=18, default=ContentType.PLAIN, choices=ContentType.choices)
     date_published = models.DateTimeField(auto_now_add=True)
+    updated = models.DateTimeField(auto_now=True)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['post', '-date_published'], name='comment_post_published_idx'),
+        ]
+
+    def render_content(self):
+        self.comment_html = render_markdown(self.comment) if self.content_type == ContentType.MARKDOWN else ''
+
+    def save(self, *args, **kwargs):
+        self.render_content()
+        return super(Comment, self).save(*args, **kwargs)
+
 
 class Like(models.Model):
     author = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)
     post = models.ForeignKey(Post, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            # Likes of a post by author, and whether an author liked a post
+            models.Index(fields=['post', 'author'], name='like_post_author_idx'),
+        ]
+
 
 class RemoteLike(models.Model):
     author_url = models.CharField(max_length=STR_MAX_LENGTH)
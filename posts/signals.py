@@ -0,0 +1,23 @@
+from functools import partial
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from posts.models import Post
+from posts.validation import validate_image_later
+from posts.variants import delete_variants
+
+
+@receiver(post_save, sender=Post)
+def on_post_save(sender, instance: Post, **kwargs):
+    if instance.image_status == Post.ImageStatus.PENDING and instance.needs_image_validation:
+        instance.needs_image_validation = False
+        # The check reads the post from another connection, which only sees it once committed
+        transaction.on_commit(partial(validate_image_later, instance.pk, instance.content))
+
+
+@receiver(post_delete, sender=Post)
+def on_post_delete(sender, instance: Post, **kwargs):
+    if instance.img_variants:
+        transaction.on_commit(partial(
+            delete_variants, instance.img_content.storage, instance.img_variants, instance.img_content.name))
@@ -1,23 +1,71 @@
-import re
-from markdown_it import MarkdownIt
-
 from django import template
 from django.template.defaultfilters import stringfilter
 
+from posts.fragments import get_or_render
+from posts.markdown import render_markdown, render_markdown_no_links
+
 register = template.Library()
 
 
+# Local posts and comments store their rendered markdown, these are for remote ones
 @register.filter
 @stringfilter
 def convert_markdown(value):
-    md = MarkdownIt('commonmark')
-    return md.render(value)
+    return render_markdown(value)
 
 
-# https://stackoverflow.com/questions/53980097/removing-markup-links-in-text
 @register.filter
 @stringfilter
 def convert_markdown_no_links(value):
-    md = MarkdownIt('commonmark')
-    md.disable('link')
-    return re.sub(r"\[(.+)\]\(.+\)", r"\1", md.render(value))
+    return render_markdown_no_links(value)
+
+
+# Resized copies of uploaded images, remote posts and linked images only have the original
+@register.filter
+def image_url(post, variant: str) -> str:
+    return post.get_image_url(variant) if hasattr(post, 'get_image_url') else post.content
+
+
+@register.filter
+def image_srcset(post) -> str:
+    return post.get_image_srcset() if hasattr(post, 'get_image_srcset') else ''
+
+
+class CachedFragmentNode(template.Node):
+    def __init__(self, fragment_name: str, obj: template.base.FilterExpression,
+                 vary_on: list[template.base.FilterExpression], nodelist: template.NodeList):
+        self.fragment_name = fragment_name
+        self.obj = obj
+        self.vary_on = vary_on
+        self.nodelist = nodelist
+
+    def render(self, context):
+        vary_on = [value.resolve(context) for value in self.vary_on]
+        return get_or_render(
+            self.fragment_name, self.obj.resolve(context), lambda: self.nodelist.render(context), vary_on)
+
+
+@register.tag
+def cachedfragment(parser, token):
+    """
+    Caches the enclosed template for a saved model instance, until that instance is saved again or one of the
+    optional values after it changes, e.g.
+
+    ```
+    {% cachedfragment 'stream_post' post post.author.get_full_name %}...{% endcachedfragment %}
+    ```
+
+    The enclosed template must only depend on the instance and these values, never on the viewer (e.g.
+    `csrf_token`). Fields of related objects it renders, such as the author's name, have to be among the values.
+    """
+    bits = token.split_contents()
+    if len(bits) < 3:
+        raise template.TemplateSyntaxError('cachedfragment takes a fragment name and an object')
+    fragment_name = bits[1]
+    if fragment_name[0] not in ('"', "'") or fragment_name[-1] != fragment_name[0]:
+        raise template.TemplateSyntaxError('cachedfragment fragment name must be quoted')
+
+    nodelist = parser.parse(('endcachedfragment',))
+    parser.delete_first_token()
+    return CachedFragmentNode(
+        fragment_name[1:-1], parser.compile_filter(bits[2]), [parser.compile_filter(bit) for bit in bits[3:]], nodelist)
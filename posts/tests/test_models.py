@@ -1,12 +1,23 @@
 import json
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
+from uuid import uuid4
+from PIL import Image
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
 from django.forms import ValidationError
-from django.test import TestCase
+from django.test import TestCase, override_settings
 from django.contrib.auth import get_user_model
+from inmemorystorage import InMemoryStorage
 
 from api.tests.constants import SAMPLE_REMOTE_AUTHOR
+from lib.url import is_url_valid_image
+from posts.validation import validate_image
 
-from .constants import COMMENT_DATA, POST_DATA
-from ..models import CommentLike, Post, Comment, RemoteComment, RemoteLike
+from .constants import COMMENT_DATA, COMMONMARK_POST_DATA, POST_DATA
+from ..models import CommentLike, ContentType, Post, Comment, RemoteComment, RemoteLike
 
 CURRENT_USER = 'bob'
 
@@ -158,3 +169,231 @@ class RemoteCommentTests(TestCase):
         remote_comment.save()
 
         self.assertEqual(len(self.post.remotecomment_set.all()), 1)
+
+
+class RenderedMarkdownTests(TestCase):
+    def setUp(self):
+        self.user = get_user_model().objects.create_user(username=CURRENT_USER, password='password')
+
+    def create_post(self, data: dict) -> Post:
+        return Post.objects.create(
+            title=data['title'],
+            description=data['description'],
+            content_type=data['content_type'],
+            content=data['content'],
+            author_id=self.user.id,
+            unlisted=data['unlisted'])
+
+    def test_markdown_post_is_rendered(self):
+        post = self.create_post(COMMONMARK_POST_DATA)
+        self.assertIn('<h1>Heading 8-)</h1>', post.content_html)
+        self.assertIn('<strong>This is bold text!</strong>', post.content_html_no_links)
+
+    def test_links_are_removed(self):
+        data = COMMONMARK_POST_DATA.copy()
+        data['content'] = '[a link](https://example.com)'
+        post = self.create_post(data)
+        self.assertIn('<a href="https://example.com">a link</a>', post.content_html)
+        self.assertNotIn('<a', post.content_html_no_links)
+
+    def test_plain_post_is_not_rendered(self):
+        post = self.create_post(POST_DATA)
+        self.assertEqual(post.content_html, '')
+        self.assertEqual(post.content_html_no_links, '')
+
+    def test_edit_rerenders(self):
+        post = self.create_post(COMMONMARK_POST_DATA)
+        post.content = '*edited*'
+        post.save()
+        self.assertEqual(post.content_html, '<p><em>edited</em></p>\n')
+
+    def test_markdown_comment_is_rendered(self):
+        comment = Comment.objects.create(
+            comment='**bold**',
+            author_id=self.user.id,
+            post_id=self.create_post(POST_DATA).id,
+            content_type=ContentType.MARKDOWN,
+        )
+        self.assertEqual(comment.comment_html, '<p><strong>bold</strong></p>\n')
+
+    def test_render_markdown_command(self):
+        post = self.create_post(COMMONMARK_POST_DATA)
+        Post.objects.update(content_html='', content_html_no_links='')
+
+        call_command('render_markdown', batch_size=1, stdout=StringIO())
+        post.refresh_from_db()
+        self.assertIn('<h1>Heading 8-)</h1>', post.content_html)
+
+
+def create_image_upload(width: int, height: int, image_format: str = 'PNG') -> SimpleUploadedFile:
+    content = BytesIO()
+    Image.new('RGB', (width, height), 'teal').save(content, format=image_format)
+    return SimpleUploadedFile(f'image.{image_format.lower()}', content.getvalue())
+
+
+class ImageVariantTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(username=CURRENT_USER, password='password')
+        # Uploaded images go to S3 otherwise
+        self.storage = InMemoryStorage(base_url='/media/')
+        storage = patch.object(Post._meta.get_field('img_content'), 'storage', self.storage)
+        storage.start()
+        self.addCleanup(storage.stop)
+
+    def create_post(self, upload: SimpleUploadedFile) -> Post:
+        return Post.objects.create(
+            title='Image', description='An image', content_type=ContentType.PNG, content='',
+            img_content=upload, author=self.author, unlisted=False)
+
+    def test_creates_variants_on_upload(self):
+        post = self.create_post(create_image_upload(2000, 1000))
+        self.assertEqual({name: variant['width'] for (name, variant) in post.img_variants.items()},
+                         {'thumb': 160, 'card': 640, 'full': 1600})
+        self.assertEqual(Post.objects.get(id=post.id).img_variants, post.img_variants)
+        for variant in post.img_variants.values():
+            with self.storage.open(variant['name']) as file, Image.open(file) as image:
+                self.assertEqual(image.width, variant['width'])
+                self.assertEqual(image.format, 'PNG')
+        self.assertLess(self.storage.size(post.img_variants['thumb']['name']), self.storage.size(post.img_content.name))
+
+    def test_small_images_are_not_enlarged(self):
+        post = self.create_post(create_image_upload(400, 300, 'JPEG'))
+        self.assertEqual(post.img_variants['thumb']['width'], 160)
+        self.assertEqual(post.img_variants['card'], {'name': post.img_content.name, 'width': 400})
+        self.assertEqual(post.img_variants['full'], post.img_variants['card'])
+        self.assertEqual(post.get_image_url('full'), post.img_content.url)
+        # The original is only listed once
+        self.assertEqual(post.get_image_srcset().count(post.img_content.url), 1)
+
+    def test_variants_are_kept_when_saved_again(self):
+        post = self.create_post(create_image_upload(2000, 1000))
+        variants = post.img_variants
+        post.title = 'Renamed'
+        post.save()
+        self.assertEqual(Post.objects.get(id=post.id).img_variants, variants)
+
+    def test_unreadable_image_has_no_variants(self):
+        post = self.create_post(SimpleUploadedFile('image.png', b'not an image'))
+        self.assertEqual(post.img_variants, {})
+        self.assertEqual(post.get_image_url('card'), post.img_content.url)
+
+    def test_decompression_bomb_has_no_variants(self):
+        with patch('PIL.Image.MAX_IMAGE_PIXELS', 1000):
+            post = self.create_post(create_image_upload(100, 100))
+        self.assertEqual(post.img_variants, {})
+
+    def test_replaced_image_variants_are_deleted(self):
+        # The full variant of a 1000 pixel wide image is the image itself
+        post = self.create_post(create_image_upload(1000, 500))
+        original = post.img_content.name
+        old_variants = {variant['name'] for variant in post.img_variants.values()} - {original}
+        post = Post.objects.get(id=post.id)
+        post.img_content = create_image_upload(2000, 1000)
+        with self.captureOnCommitCallbacks(execute=True):
+            post.save()
+
+        for name in old_variants:
+            self.assertFalse(self.storage.exists(name))
+        self.assertTrue(self.storage.exists(original))
+        for variant in post.img_variants.values():
+            self.assertTrue(self.storage.exists(variant['name']))
+
+    def test_variants_are_deleted_with_post(self):
+        post = self.create_post(create_image_upload(2000, 1000))
+        variants = [variant['name'] for variant in post.img_variants.values()]
+        with self.captureOnCommitCallbacks(execute=True):
+            Post.objects.get(id=post.id).delete()
+        for name in variants:
+            self.assertFalse(self.storage.exists(name))
+
+    def test_linked_image_uses_content(self):
+        with patch('posts.models.is_url_valid_image', return_value=True):
+            post = Post.objects.create(
+                title='Image', description='An image', content_type=ContentType.PNG,
+                content='http://images.example.com/cat.png', author=self.author, unlisted=False)
+        self.assertEqual(post.get_image_url('card'), 'http://images.example.com/cat.png')
+        self.assertEqual(post.get_image_srcset(), '')
+
+
+class ImageValidationTests(TestCase):
+    def setUp(self):
+        self.author = get_user_model().objects.create_user(username=CURRENT_USER, password='password')
+        self.url = f'http://images.example.com/{uuid4()}.png'
+
+    def create_post(self) -> Post:
+        return Post.objects.create(
+            title='Image', description='An image', content_type=ContentType.PNG, content=self.url,
+            author=self.author, unlisted=False)
+
+    def test_unchanged_image_is_not_checked_again(self):
+        with patch('posts.models.is_url_valid_image', return_value=True) as is_valid:
+            post = Post.objects.get(id=self.create_post().id)
+            post.title = 'Renamed'
+            post.save()
+            self.assertEqual(is_valid.call_count, 1)
+
+            post.content = f'http://images.example.com/{uuid4()}.png'
+            post.save()
+            self.assertEqual(is_valid.call_count, 2)
+
+    def test_invalid_image(self):
+        with patch('posts.models.is_url_valid_image', return_value=False):
+            with self.assertRaises(ValidationError):
+                self.create_post()
+
+    @override_settings(IMAGE_URL_CACHE_TTL=60)
+    def test_results_are_cached(self):
+        with patch('lib.url.check_url_is_image', return_value=True) as check:
+            self.assertTrue(is_url_valid_image(self.url))
+            self.assertTrue(is_url_valid_image(self.url))
+        check.assert_called_once_with(self.url)
+
+    @override_settings(IMAGE_URL_VALIDATION_ASYNC=True)
+    def test_validates_in_background(self):
+        with patch('lib.url.check_url_is_image') as check, \
+                patch('posts.signals.validate_image_later') as validate_later, \
+                self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+        check.assert_not_called()
+        self.assertEqual(post.image_status, Post.ImageStatus.PENDING)
+        validate_later.assert_called_once_with(post.id, self.url)
+
+        with patch('lib.url.check_url_is_image', return_value=False):
+            validate_image(post.id, self.url)
+        self.assertEqual(Post.objects.get(id=post.id).image_status, Post.ImageStatus.INVALID)
+
+    @override_settings(IMAGE_URL_VALIDATION_ASYNC=True, IMAGE_URL_CACHE_TTL=60)
+    def test_cached_result_is_used_when_validating_in_background(self):
+        with patch('lib.url.check_url_is_image', return_value=True):
+            is_url_valid_image(self.url)
+        with patch('posts.signals.validate_image_later') as validate_later, \
+                self.captureOnCommitCallbacks(execute=True):
+            post = self.create_post()
+        self.assertEqual(post.image_status, Post.ImageStatus.VALID)
+        validate_later.assert_not_called()
+
+    @override_settings(IMAGE_URL_VALIDATION_ASYNC=True)
+    def test_changed_post_is_not_marked(self):
+        with patch('posts.signals.validate_image_later'):
+            post = self.create_post()
+        Post.objects.filter(id=post.id).update(content='http://images.example.com/other.png')
+        with patch('lib.url.check_url_is_image', return_value=True):
+            validate_image(post.id, self.url)
+        self.assertEqual(Post.objects.get(id=post.id).image_status, Post.ImageStatus.PENDING)
+
+
+@skipUnless(connection.vendor == 'sqlite', 'Query plans depend on the database')
+class QueryPlanTests(TestCase):
+    def test_hot_queries_use_indexes(self):
+        out = StringIO()
+        call_command('explain_queries', stdout=out)
+        plans = dict(plan.split(':\n', 1) for plan in out.getvalue().split('\n\n')[1:])
+        self.assertIn('post_listed_published_idx', plans['public posts'])
+        self.assertIn('post_author_published_idx', plans['posts of author'])
+        for name in ('shared timeline', 'timeline'):
+            self.assertIn('timeline_user_published_idx', plans[name])
+            self.assertNotIn('TEMP B-TREE', plans[name])
+        self.assertIn('comment_post_published_idx', plans['comments of post'])
+        self.assertIn('like_post_author_idx', plans['like of user'])
+        self.assertIn('follow_follower_idx', plans['followings'])
+        self.assertIn('follow_followee_created_idx', plans['followers'])
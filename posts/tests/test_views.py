@@ -1,4 +1,5 @@
 from .constants import COMMENT_DATA, COMMONMARK_POST_DATA, POST_DATA
+from posts import fragments
 from api.tests.test_api import TEST_PASSWORD, TEST_USERNAME
 from api.tests.constants import SAMPLE_REMOTE_AUTHOR, SAMPLE_REMOTE_POST
 from servers.models import Server
@@ -7,7 +8,9 @@ from django.urls import reverse
 from posts.models import CommentLike, Post, Category, ContentType, Comment, Like, RemoteComment
 import json
 from unittest.mock import MagicMock, patch
-from django.test import TestCase, Client
+from django.conf import settings
+from django.core.cache import caches
+from django.test import TestCase, Client, override_settings
 from django.contrib.auth import get_user_model
 
 
@@ -457,3 +460,78 @@ class MyPostsViewTests(TestCase):
     def test_new_comment_require_login(self):
         res = self.client.get(reverse('posts:my-posts'))
         self.assertEqual(res.status_code, 302)
+
+
+@override_settings(FRAGMENT_CACHE_ENABLED=True)
+class FragmentCacheTests(TestCase):
+    def setUp(self) -> None:
+        caches[settings.FRAGMENT_CACHE_ALIAS].clear()
+        fragments.reset_stats()
+        self.user = get_user_model().objects.create_user(username=TEST_USERNAME, password=TEST_PASSWORD)
+        self.post = Post.objects.create(
+            title=POST_DATA['title'],
+            description=POST_DATA['description'],
+            content_type=POST_DATA['content_type'],
+            content=POST_DATA['content'],
+            author_id=self.user.id,
+            unlisted=POST_DATA['unlisted'])
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+
+    def test_stream_post_is_cached(self):
+        self.client.get(reverse('stream'))
+        res = self.client.get(reverse('stream'))
+        self.assertContains(res, POST_DATA['title'])
+        self.assertEqual(fragments.stats()['stream_post'], {'hits': 1, 'misses': 1, 'hit_rate': 0.5})
+
+    def test_edit_renders_again(self):
+        self.client.get(reverse('stream'))
+        self.post.title = 'An edited title'
+        self.post.save()
+
+        res = self.client.get(reverse('stream'))
+        self.assertContains(res, 'An edited title')
+        self.assertEqual(fragments.stats()['stream_post']['misses'], 2)
+
+    def test_comment_is_cached(self):
+        Comment.objects.create(
+            comment=COMMENT_DATA['comment'],
+            author=self.user,
+            content_type=COMMENT_DATA['content_type'],
+            post=self.post,
+        )
+        first = self.client.get(reverse('posts:detail', kwargs={'pk': self.post.id}))
+        res = self.client.get(reverse('posts:detail', kwargs={'pk': self.post.id}))
+        self.assertContains(res, COMMENT_DATA['comment'])
+        # The like form sits outside the fragment, so every response gets a fresh token
+        tokens = first.content.decode().count('csrfmiddlewaretoken')
+        self.assertContains(res, 'csrfmiddlewaretoken', count=tokens)
+        self.assertEqual(fragments.stats()['comment']['hits'], 1)
+
+    def test_author_name_change_renders_again(self):
+        self.client.get(reverse('stream'))
+        self.user.first_name = 'Renamed'
+        self.user.save()
+
+        res = self.client.get(reverse('stream'))
+        self.assertContains(res, 'Renamed')
+        self.assertEqual(fragments.stats()['stream_post']['misses'], 2)
+
+    def test_comment_author_name_change_renders_again(self):
+        Comment.objects.create(
+            comment=COMMENT_DATA['comment'],
+            author=self.user,
+            content_type=COMMENT_DATA['content_type'],
+            post=self.post,
+        )
+        self.client.get(reverse('posts:detail', kwargs={'pk': self.post.id}))
+        self.user.first_name = 'Renamed'
+        self.user.save()
+
+        res = self.client.get(reverse('posts:detail', kwargs={'pk': self.post.id}))
+        self.assertContains(res, 'Renamed')
+        self.assertEqual(fragments.stats()['comment']['misses'], 2)
+
+    @override_settings(FRAGMENT_CACHE_ENABLED=False)
+    def test_disabled(self):
+        self.client.get(reverse('stream'))
+        self.assertEqual(fragments.stats(), {})
@@ -0,0 +1,30 @@
+from concurrent.futures import ThreadPoolExecutor
+from sys import stderr
+from django.db import connection
+from django.utils import timezone
+
+from lib.url import is_url_valid_image
+from posts.models import Post
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='image-validation')
+
+
+def validate_image(post_id: int, url: str):
+    """Marks the post as valid or invalid once its linked image at `url` is checked, unless it changed meanwhile."""
+    try:
+        status = Post.ImageStatus.VALID if is_url_valid_image(url) else Post.ImageStatus.INVALID
+        # Bump `updated` as well, so the cached fragments of the post are rendered again
+        Post.objects.filter(pk=post_id, content=url, image_status=Post.ImageStatus.PENDING) \
+            .update(image_status=status, updated=timezone.now())
+    except Exception as err:
+        print(f'Could not validate the image of post {post_id}, err: {err}', file=stderr)
+
+
+def validate_image_later(post_id: int, url: str):
+    def run():
+        try:
+            validate_image(post_id, url)
+        finally:
+            connection.close()
+
+    _executor.submit(run)
@@ -0,0 +1,75 @@
+from io import BytesIO
+from sys import stderr
+from typing import Optional
+from django.core.files.base import ContentFile
+from django.core.files.storage import Storage
+from django.db.models.fields.files import FieldFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+# Name and largest width or height of the resized copies of uploaded images, smallest first
+VARIANTS = (
+    ('thumb', 160),
+    ('card', 640),
+    ('full', 1600),
+)
+
+# Options passed to Pillow when saving a variant, by format
+SAVE_OPTIONS = {
+    'JPEG': {'quality': 85, 'optimize': True, 'progressive': True},
+    'PNG': {'optimize': True},
+}
+
+
+def create_variants(image: FieldFile) -> dict[str, dict]:
+    """
+    Stores a resized copy of `image` for every entry of `VARIANTS` next to it in its storage, and returns the name and
+    width of each. Variants at least as large as the image are the image itself. Returns no variants for files Pillow
+    can't read.
+    """
+    try:
+        with image.open('rb'), Image.open(image) as original:
+            image_format = original.format
+            original = ImageOps.exif_transpose(original)
+            stem, _, extension = image.name.rpartition('.')
+            variants = {}
+            for name, size in VARIANTS:
+                if original.width <= size and original.height <= size:
+                    variants[name] = {'name': image.name, 'width': original.width}
+                    continue
+                resized = original.copy()
+                resized.thumbnail((size, size), Image.LANCZOS)
+                if image_format == 'JPEG' and resized.mode != 'RGB':
+                    resized = resized.convert('RGB')
+                content = BytesIO()
+                resized.save(content, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+                stored = image.storage.save(f'{stem}_{name}.{extension}', ContentFile(content.getvalue()))
+                variants[name] = {'name': stored, 'width': resized.width}
+            return variants
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as err:
+        print(f'Could not create the variants of {image.name}, err: {err}', file=stderr)
+        return {}
+
+
+def delete_variants(storage: Storage, variants: dict[str, dict], image_name: Optional[str]):
+    """Deletes the files of `variants` from `storage`, except the image they were created from (`image_name`)."""
+    for name in {variant['name'] for variant in variants.values()} - {image_name}:
+        try:
+            storage.delete(name)
+        except Exception as err:
+            print(f'Could not delete the variant {name}, err: {err}', file=stderr)
+
+
+def get_variant_url(image: FieldFile, variants: dict[str, dict], name: str) -> str:
+    """Returns the URL of variant `name` of `image`, or of `image` when the variant doesn't exist."""
+    variant = variants.get(name)
+    return image.storage.url(variant['name']) if variant else image.url
+
+
+def get_srcset(image: FieldFile, variants: dict[str, dict]) -> str:
+    """Returns the `srcset` attribute listing every distinct variant of `image` with its width."""
+    widths = {}
+    for name, _ in VARIANTS:
+        variant = variants.get(name)
+        if variant is not None:
+            widths.setdefault(variant['name'], variant['width'])
+    return ', '.join(f'{image.storage.url(name)} {width}w' for name, width in widths.items())
@@ -13,9 +13,9 @@ from django.urls import reverse_lazy
 from requests import Response
 from lib.http_helper import is_b64_image_content
 from django.core.exceptions import PermissionDenied
-from urllib.parse import urlparse
 from .models import CommentLike, Post, Category, Comment, Like, RemoteComment, RemoteLike
-from servers.models import Server
+from servers.authors import resolve_authors
+from servers.registry import server_registry
 from servers.views.generic.detailed_view import ServerDetailView
 
 
@@ -90,22 +90,13 @@ class PostDetailView(LoginRequiredMixin, DetailView):
             remote_comments_queryset = RemoteComment.objects.filter(post=self.get_object())
         except RemoteComment.DoesNotExist:
             pass
+        authors = resolve_authors(remote_comment.author_url for remote_comment in remote_comments_queryset)
         for remote_comment in remote_comments_queryset:
-            parsed_author_url = urlparse(remote_comment.author_url)
-            author_host = parsed_author_url.hostname
-            target_server = None
-            for server in Server.objects.all():
-                parsed_server_url = urlparse(server.service_address)
-                if parsed_server_url.hostname == author_host:
-                    target_server = server
-                    break
-
-            if target_server is None:
-                break
-
-            author_path = remote_comment.author_url[len(target_server.service_address):]
-            author_response: Response = target_server.get(author_path)
-            author_fullname = author_response.json().get('displayName') or author_response.json().get('display_name')
+            author = authors[remote_comment.author_url]
+            if author is None:
+                continue
+
+            author_fullname = author.get('displayName') or author.get('display_name')
             remote_comments.append({
                 'author': {
                     'get_full_name': author_fullname
@@ -140,7 +131,7 @@ class RemotePostDetailView(LoginRequiredMixin, ServerDetailView):
                 origin = json_response.get('origin')
                 service_address = origin[0:origin.index('/authors')]
                 service_request = origin[origin.index('/authors'):]
-                server = Server.objects.get(service_address=service_address)
+                server = server_registry.get_index().by_address(service_address)
                 img_content = server.get(service_request + '/image').content.decode('utf-8')
             except Exception as e:
                 print('warning: ' + e)
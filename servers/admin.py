@@ -2,4 +2,10 @@ from django.contrib import admin
 from servers.models import Server
 
 
-admin.site.register(Server)
+class ServerAdmin(admin.ModelAdmin):
+    model = Server
+    list_display = ('service_address', 'last_sync_status', 'last_sync_finished')
+    readonly_fields = ('last_sync_status', 'last_sync_started', 'last_sync_finished', 'last_sync_error')
+
+
+admin.site.register(Server, ServerAdmin)
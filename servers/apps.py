@@ -4,3 +4,7 @@ from django.apps import AppConfig
 class ServersConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'servers'
+
+    def ready(self):
+        # Connect the receivers keeping the server registry up to date
+        from servers import signals  # noqa
@@ -0,0 +1,143 @@
+import time
+import threading
+from collections import OrderedDict
+from sys import stderr
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+from django.conf import settings
+
+from lib import metrics
+from servers.fanout import fetch_all
+from servers.models import Server
+from servers.registry import server_registry
+
+# Returned by `RemoteAuthorCache.get` for URLs that are not cached, as `None` is cached for authors that failed to load
+MISSING = object()
+
+
+class RemoteAuthorCache:
+    """
+    Process-local LRU cache of the profiles of authors on other servers, keyed by author URL.
+
+    Profiles stay valid for `REMOTE_AUTHOR_CACHE_TTL` seconds. Authors that could not be loaded are cached as `None`
+    for `REMOTE_AUTHOR_NEGATIVE_TTL` seconds, so a server that is down is not asked again for every item on a page.
+    """
+
+    def __init__(self):
+        self._entries: OrderedDict[str, tuple[float, Optional[dict]]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.negative_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def max_entries(self) -> int:
+        return settings.REMOTE_AUTHOR_CACHE_MAX_ENTRIES
+
+    def get(self, url: str):
+        with self._lock:
+            entry = self._entries.get(url)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[url]
+                self.misses += 1
+                return MISSING
+            self._entries.move_to_end(url)
+            if entry[1] is None:
+                self.negative_hits += 1
+            else:
+                self.hits += 1
+            return entry[1]
+
+    def set(self, url: str, author: Optional[dict]):
+        if self.max_entries <= 0:
+            return
+        ttl = settings.REMOTE_AUTHOR_CACHE_TTL if author is not None else settings.REMOTE_AUTHOR_NEGATIVE_TTL
+        with self._lock:
+            self._entries[url] = (time.monotonic() + ttl, author)
+            self._entries.move_to_end(url)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'negative_hits': self.negative_hits,
+            'misses': self.misses,
+            'hit_rate': metrics.hit_rate(self.hits + self.negative_hits, self.misses),
+            'evictions': self.evictions,
+        }
+
+
+remote_author_cache = RemoteAuthorCache()
+metrics.register('remote_author_cache', remote_author_cache.stats)
+
+
+def get_endpoint(server: Server, url: str) -> str:
+    """Returns the endpoint of `url` relative to the service address of `server`, as expected by `Server.get`."""
+    if url.startswith(server.service_address):
+        return url[len(server.service_address):]
+    path = urlparse(url).path
+    service_path = urlparse(server.service_address).path.rstrip('/')
+    return path[len(service_path):] if path.startswith(service_path) else path
+
+
+def parse_author(response) -> Optional[dict]:
+    if response.status_code is not None and response.status_code >= 400:
+        return None
+    try:
+        author = response.json()
+    except ValueError:
+        return None
+    return author if isinstance(author, dict) else None
+
+
+def resolve_authors(urls: Iterable[str]) -> dict[str, Optional[dict]]:
+    """
+    Returns the profile of every author in `urls`, or `None` for authors that could not be loaded.
+
+    Authors that are not cached are fetched concurrently with `fetch_all`.
+    """
+    authors: dict[str, Optional[dict]] = {}
+    unknown = []
+    for url in dict.fromkeys(urls):
+        author = remote_author_cache.get(url)
+        if author is MISSING:
+            unknown.append(url)
+        else:
+            authors[url] = author
+    if not unknown:
+        return authors
+
+    servers = server_registry.get_index()
+    jobs = []
+    urls_by_job: dict[tuple[int, str], str] = {}
+    for url in unknown:
+        # Until an answer arrives, the author counts as failed
+        authors[url] = None
+        server = servers.by_url(url)
+        if server is None:
+            print(f'No server found for author {url}', file=stderr)
+            continue
+        endpoint = get_endpoint(server, url)
+        jobs.append((server, endpoint))
+        urls_by_job[(id(server), endpoint)] = url
+
+    for server, endpoint, response in fetch_all(jobs):
+        authors[urls_by_job[(id(server), endpoint)]] = parse_author(response)
+
+    for url in unknown:
+        remote_author_cache.set(url, authors[url])
+    return authors
+
+
+def resolve_author(url: str) -> Optional[dict]:
+    return resolve_authors([url])[url]
@@ -0,0 +1,133 @@
+import time
+import threading
+from collections import deque
+from typing import Callable
+from django.conf import settings
+from requests import RequestException, Response
+
+from lib import metrics
+
+
+class ServerUnavailable(RequestException):
+    """Raised instead of sending a request to a server whose circuit breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `SERVER_BREAKER_WINDOW` requests to a server.
+
+    A request fails when it raises, gets a 5xx answer or takes `SERVER_BREAKER_SLOW_CALL` seconds or more. Once at
+    least `SERVER_BREAKER_MIN_CALLS` requests were made and `SERVER_BREAKER_FAILURE_RATE` of them failed, the breaker
+    opens and requests are refused for `SERVER_BREAKER_OPEN_SECONDS`. It then lets a single trial request through
+    (half-open), which closes the breaker if it succeeds and opens it again otherwise.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half-open'
+
+    def __init__(self):
+        self.state = self.CLOSED
+        self._outcomes: deque[bool] = deque(maxlen=settings.SERVER_BREAKER_WINDOW)
+        self._opened = 0.0
+        self._trial_running = False
+        self._lock = threading.Lock()
+        self.rejected = 0
+        self.opened = 0
+
+    def is_open(self) -> bool:
+        """Whether requests are refused right now, without claiming the trial request of a half-open breaker."""
+        with self._lock:
+            if self.state == self.OPEN:
+                return time.monotonic() - self._opened < settings.SERVER_BREAKER_OPEN_SECONDS
+            return self.state == self.HALF_OPEN and self._trial_running
+
+    def call(self, send: Callable[[], Response]) -> Response:
+        self._before_call()
+        start = time.monotonic()
+        try:
+            response = send()
+        except Exception:
+            self._record(False)
+            raise
+        elapsed = time.monotonic() - start
+        self._record(response.status_code < 500 and elapsed < settings.SERVER_BREAKER_SLOW_CALL)
+        return response
+
+    def _before_call(self):
+        with self._lock:
+            if self.state == self.OPEN:
+                if time.monotonic() - self._opened < settings.SERVER_BREAKER_OPEN_SECONDS:
+                    self.rejected += 1
+                    raise ServerUnavailable('Circuit breaker is open')
+                self.state = self.HALF_OPEN
+            if self.state == self.HALF_OPEN:
+                if self._trial_running:
+                    self.rejected += 1
+                    raise ServerUnavailable('Circuit breaker is waiting for a trial request')
+                self._trial_running = True
+
+    def _record(self, success: bool):
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._trial_running = False
+                if success:
+                    self.state = self.CLOSED
+                    self._outcomes.clear()
+                else:
+                    self._open()
+                return
+
+            self._outcomes.append(success)
+            failures = self._outcomes.count(False)
+            if (self.state == self.CLOSED and len(self._outcomes) >= settings.SERVER_BREAKER_MIN_CALLS
+                    and failures / len(self._outcomes) >= settings.SERVER_BREAKER_FAILURE_RATE):
+                self._open()
+
+    def _open(self):
+        self.state = self.OPEN
+        self._opened = time.monotonic()
+        self._outcomes.clear()
+        self.opened += 1
+
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'failure_rate': self._outcomes.count(False) / len(self._outcomes) if self._outcomes else 0.0,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+
+class BreakerRegistry:
+    """
+    Process-local `CircuitBreaker` of every server, keyed by service address.
+    """
+
+    def __init__(self):
+        self._breakers: dict[str, CircuitBreaker] = {}
+        self._lock = threading.Lock()
+
+    def get(self, service_address: str) -> CircuitBreaker:
+        with self._lock:
+            breaker = self._breakers.get(service_address)
+            if breaker is None:
+                breaker = self._breakers[service_address] = CircuitBreaker()
+            return breaker
+
+    def is_open(self, service_address: str) -> bool:
+        breaker = self._breakers.get(service_address)
+        return breaker is not None and breaker.is_open()
+
+    def clear(self):
+        with self._lock:
+            self._breakers.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            breakers = dict(self._breakers)
+        return {service_address: breaker.stats() for service_address, breaker in breakers.items()}
+
+
+breakers = BreakerRegistry()
+metrics.register('server_breakers', breakers.stats)
@@ -0,0 +1,50 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+from requests import RequestException
+
+from lib import metrics
+
+# `time.monotonic()` by which the current request has to be answered, if it has a deadline
+_deadline: ContextVar[Optional[float]] = ContextVar('server_request_deadline', default=None)
+exceeded = 0
+
+
+class DeadlineExceeded(RequestException):
+    """Raised instead of sending a request to another server once the deadline of the current request has passed."""
+
+
+@contextmanager
+def deadline(seconds: Optional[float]):
+    """Requests to other servers made inside the block have to finish within `seconds`, or an earlier deadline."""
+    current = _deadline.get()
+    if seconds is not None:
+        end = time.monotonic() + seconds
+        current = end if current is None else min(current, end)
+    token = _deadline.set(current)
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def remaining() -> Optional[float]:
+    """Returns the seconds left until the deadline of the current request, or `None` when it has no deadline."""
+    end = _deadline.get()
+    return None if end is None else end - time.monotonic()
+
+
+def get_timeout(timeout: float) -> float:
+    """Returns `timeout` cut down to the time left, raising `DeadlineExceeded` when there is none."""
+    global exceeded
+    left = remaining()
+    if left is None:
+        return timeout
+    if left <= 0:
+        exceeded += 1
+        raise DeadlineExceeded('Request deadline exceeded')
+    return min(timeout, left)
+
+
+metrics.register('request_deadline', lambda: {'exceeded': exceeded})
@@ -0,0 +1,120 @@
+import time
+import threading
+from sys import stderr
+from typing import Iterable, Optional
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from contextvars import copy_context
+from django.conf import settings
+from requests import Response
+
+from servers import deadline
+from servers.breaker import breakers
+from servers.models import Server
+from servers.registry import server_registry
+
+
+class FetchResults(list):
+    """
+    The `(server, endpoint, response)` results of `fetch_all`. `unavailable` holds the servers that were skipped
+    because their circuit breaker is open, or that did not answer every request in time.
+    """
+
+    def __init__(self, results: Iterable[tuple[Server, str, Response]], unavailable: Iterable[Server]):
+        super().__init__(results)
+        # Unsaved servers can't be hashed, so they are told apart by address
+        self.unavailable = list({server.service_address: server for server in unavailable}.values())
+
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def get_executor() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.SERVER_FETCH_WORKERS,
+                thread_name_prefix='server-fetch')
+        return _executor
+
+
+def fetch_all(jobs: Iterable[tuple[Server, str]],
+              page_budget: Optional[float] = None,
+              server_timeout: Optional[float] = None) -> FetchResults:
+    """
+    Runs `server.get(endpoint)` for every `(server, endpoint)` job on a bounded thread pool.
+
+    All jobs share `page_budget` seconds, or what is left of the request deadline, and each server has to answer
+    within `server_timeout` seconds of its job starting, however long the job waited for a worker. Results that took
+    longer, as well as failed requests, are logged and dropped, and so are the jobs of servers whose circuit breaker
+    is open. The responses that made it are returned in the order of `jobs`.
+    """
+    page_budget = settings.SERVER_FETCH_PAGE_BUDGET if page_budget is None else page_budget
+    left = deadline.remaining()
+    if left is not None:
+        page_budget = max(min(page_budget, left), 0)
+    server_timeout = settings.SERVER_FETCH_TIMEOUT if server_timeout is None else server_timeout
+    jobs = list(jobs)
+    unavailable = [server for (server, _) in jobs if breakers.is_open(server.service_address)]
+    if unavailable:
+        skipped = {server.service_address for server in unavailable}
+        print(f'Skipping unavailable servers {", ".join(sorted(skipped))}', file=stderr)
+        jobs = [(server, endpoint) for (server, endpoint) in jobs if server.service_address not in skipped]
+    page_deadline = time.monotonic() + page_budget
+    # When each job started running, as jobs may wait for a free worker first
+    started: dict[int, float] = {}
+
+    def run(index: int, server: Server, endpoint: str) -> tuple[float, Response]:
+        started[index] = time.monotonic()
+        response = server.get(endpoint, timeout=server_timeout)
+        return time.monotonic() - started[index], response
+
+    executor = get_executor()
+    # Each job runs in a copy of the current context, so the request deadline applies on the pool threads as well
+    futures: dict[Future, int] = {
+        executor.submit(copy_context().run, run, index, server, endpoint): index
+        for index, (server, endpoint) in enumerate(jobs)
+    }
+    responses: dict[int, Response] = {}
+    pending = set(futures)
+    while pending:
+        remaining = page_deadline - time.monotonic()
+        if remaining <= 0:
+            break
+        done, pending = wait(pending, timeout=remaining, return_when=FIRST_COMPLETED)
+        for future in done:
+            index = futures[future]
+            server, endpoint = jobs[index]
+            if future.exception() is not None:
+                print(f'Request to {server.service_address}{endpoint} failed, err: {future.exception()}', file=stderr)
+                unavailable.append(server)
+                continue
+            elapsed, response = future.result()
+            if elapsed > server_timeout:
+                print(f'Dropping late response from {server.service_address}{endpoint}', file=stderr)
+                unavailable.append(server)
+            else:
+                responses[index] = response
+
+    for future in pending:
+        index = futures[future]
+        server, endpoint = jobs[index]
+        future.cancel()
+        if index in started:
+            print(f'Request to {server.service_address}{endpoint} did not finish within the page budget', file=stderr)
+            unavailable.append(server)
+        else:
+            # The server wasn't given a chance, so it isn't reported as unavailable
+            print(f'Request to {server.service_address}{endpoint} did not start within the page budget', file=stderr)
+
+    return FetchResults([(*jobs[index], responses[index]) for index in sorted(responses)], unavailable)
+
+
+def get_unavailable_servers() -> list[Server]:
+    """
+    Returns the servers whose last sync failed, or whose circuit breaker is open in this process. The servers are read
+    from the registry, so the outcome of a sync shows up within `SERVER_REGISTRY_TTL` seconds.
+    """
+    return [server for server in server_registry.get_index().servers
+            if server.last_sync_status == Server.SyncStatus.FAILED or breakers.is_open(server.service_address)]
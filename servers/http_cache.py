@@ -0,0 +1,157 @@
+import re
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from hashlib import sha256
+from sys import stderr
+from typing import Callable, Optional
+from django.conf import settings
+from requests import Request, Response
+from requests_cache.backends import init_backend
+from requests_cache.models import CachedResponse
+
+from lib import metrics
+
+# Status codes of responses that are cached
+CACHEABLE_STATUS_CODES = (200,)
+
+
+def get_ttl(url: str) -> float:
+    """Returns the seconds a response from `url` is fresh for, from the first matching `FEDERATION_CACHE_TTLS` entry."""
+    for pattern, ttl in settings.FEDERATION_CACHE_TTLS:
+        if re.search(pattern, url):
+            return ttl
+    return settings.FEDERATION_CACHE_DEFAULT_TTL
+
+
+class FederationCache:
+    """
+    Cache of the GET responses of other servers, used by `servers.sessions.ServerSession` only.
+
+    Responses are stored in the `FEDERATION_CACHE_BACKEND` of requests-cache ('memory', 'sqlite' or 'filesystem') and
+    are fresh for the TTL returned by `get_ttl`. For `FEDERATION_CACHE_STALE_WHILE_REVALIDATE` seconds after that the
+    stale response is still returned, while it is fetched again in the background. Each process evicts the least
+    recently used responses beyond `FEDERATION_CACHE_MAX_ENTRIES`.
+    """
+
+    def __init__(self):
+        self._storage = None
+        self._storage_config = None
+        # Keys of the stored responses, least recently used first
+        self._keys: OrderedDict[str, None] = OrderedDict()
+        self._revalidating: set[str] = set()
+        self._lock = threading.RLock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='federation-revalidate')
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.revalidations = 0
+        self.evictions = 0
+
+    @property
+    def storage(self):
+        config = (settings.FEDERATION_CACHE_BACKEND, str(settings.FEDERATION_CACHE_NAME))
+        with self._lock:
+            if self._storage is None or self._storage_config != config:
+                self._storage = init_backend(config[1], config[0]).responses
+                self._storage_config = config
+                # Responses persisted by an earlier process count as the least recently used
+                self._keys = OrderedDict.fromkeys(self._storage.keys())
+            return self._storage
+
+    def get(self, username: str, url: str, params, fetch: Callable[[], Response]) -> Response:
+        """Returns the cached response to `url` with `params`, or the one returned by `fetch`."""
+        url = Request('GET', url, params=params).prepare().url
+        ttl = get_ttl(url)
+        if ttl <= 0:
+            return fetch()
+
+        key = sha256(f'{username}\n{url}'.encode()).hexdigest()
+        cached = self._get(key)
+        if cached is not None:
+            age = (datetime.utcnow() - cached.created_at).total_seconds()
+            if age < ttl:
+                self.hits += 1
+                return cached
+            if age < ttl + settings.FEDERATION_CACHE_STALE_WHILE_REVALIDATE:
+                self.stale_hits += 1
+                self._revalidate(key, fetch)
+                return cached
+
+        self.misses += 1
+        response = fetch()
+        self._set(key, response)
+        return response
+
+    def clear(self):
+        with self._lock:
+            self.storage.clear()
+            self._keys.clear()
+
+    def stats(self) -> dict:
+        return {
+            'backend': settings.FEDERATION_CACHE_BACKEND,
+            'entries': len(self._keys),
+            'max_entries': settings.FEDERATION_CACHE_MAX_ENTRIES,
+            'hits': self.hits,
+            'stale_hits': self.stale_hits,
+            'misses': self.misses,
+            'hit_rate': metrics.hit_rate(self.hits + self.stale_hits, self.misses),
+            'revalidations': self.revalidations,
+            'evictions': self.evictions,
+        }
+
+    def _get(self, key: str) -> Optional[CachedResponse]:
+        with self._lock:
+            storage = self.storage
+            try:
+                cached = storage[key]
+            except KeyError:
+                # May have been evicted by another process sharing the storage
+                self._keys.pop(key, None)
+                return None
+            # May have been stored by another process sharing the storage
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            self._evict(storage)
+            return cached
+
+    def _set(self, key: str, response: Response):
+        if response.status_code not in CACHEABLE_STATUS_CODES:
+            return
+        cached = CachedResponse.from_response(response)
+        with self._lock:
+            storage = self.storage
+            storage[key] = cached
+            self._keys[key] = None
+            self._keys.move_to_end(key)
+            self._evict(storage)
+
+    def _evict(self, storage):
+        while len(self._keys) > settings.FEDERATION_CACHE_MAX_ENTRIES:
+            evicted, _ = self._keys.popitem(last=False)
+            storage.pop(evicted, None)
+            self.evictions += 1
+
+    def _revalidate(self, key: str, fetch: Callable[[], Response]):
+        with self._lock:
+            if key in self._revalidating:
+                return
+            self._revalidating.add(key)
+
+        def run():
+            try:
+                self._set(key, fetch())
+                self.revalidations += 1
+            except Exception as err:
+                print(f'Could not revalidate cached response, err: {err}', file=stderr)
+            finally:
+                with self._lock:
+                    self._revalidating.discard(key)
+
+        self._executor.submit(run)
+
+
+federation_cache = FederationCache()
+metrics.register('federation_cache', federation_cache.stats)
@@ -0,0 +1,28 @@
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from servers.models import Server
+from servers.sync import sync_server
+
+
+class Command(BaseCommand):
+    help = 'Copies the public posts of the other servers into the local database'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--server', type=int, action='append', default=[], help='Only sync the server with this id')
+        parser.add_argument('--loop', action='store_true', help='Keep syncing every --interval seconds')
+        parser.add_argument('--interval', type=float, default=settings.REMOTE_SYNC_INTERVAL)
+
+    def handle(self, *args, **options):
+        while True:
+            servers = Server.objects.all()
+            if options['server']:
+                servers = servers.filter(pk__in=options['server'])
+            for server in servers:
+                synced = sync_server(server)
+                self.stdout.write(f'{server}: {server.last_sync_status}, {synced} post(s) synced')
+
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
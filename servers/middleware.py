@@ -0,0 +1,17 @@
+from django.conf import settings
+
+from servers.deadline import deadline
+
+
+class RequestDeadlineMiddleware:
+    """
+    Gives every request `REQUEST_DEADLINE` seconds to be answered. Requests to other servers made while handling it
+    time out when the deadline passes, and are not sent at all after it.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        with deadline(settings.REQUEST_DEADLINE):
+            return self.get_response(request)
@@ -0,0 +1,58 @@
+# Generated by Django 4.0.2 on 2026-10-18 16:43
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='server',
+            name='last_sync_error',
+            field=models.TextField(blank=True, editable=False),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='last_sync_finished',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='last_sync_started',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='server',
+            name='last_sync_status',
+            field=models.CharField(choices=[('NEVER', 'Never synced'), ('RUNNING', 'Running'), ('OK', 'OK'), ('PARTIAL', 'Partially synced'), ('FAILED', 'Failed')], default='NEVER', editable=False, max_length=7),
+        ),
+        migrations.CreateModel(
+            name='RemotePost',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('url', models.CharField(max_length=512, unique=True)),
+                ('author_url', models.CharField(max_length=512)),
+                ('author_name', models.CharField(blank=True, max_length=512)),
+                ('title', models.CharField(blank=True, max_length=512)),
+                ('description', models.TextField(blank=True)),
+                ('content_type', models.CharField(blank=True, max_length=512)),
+                ('content', models.TextField(blank=True)),
+                ('date_published', models.DateTimeField()),
+                ('synced', models.DateTimeField(auto_now=True)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='servers.server')),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='remotepost',
+            index=models.Index(fields=['-date_published'], name='remotepost_published_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='remotepost',
+            index=models.Index(fields=['author_url', '-date_published'], name='remotepost_author_idx'),
+        ),
+    ]
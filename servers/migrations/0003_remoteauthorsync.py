@@ -0,0 +1,27 @@
+# Generated by Django 4.0.2 on 2026-10-18 16:44
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0002_remotepost_server_sync_status'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RemoteAuthorSync',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('posts_endpoint', models.CharField(max_length=512)),
+                ('latest_published', models.DateTimeField(blank=True, null=True)),
+                ('last_synced', models.DateTimeField(auto_now=True)),
+                ('server', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='servers.server')),
+            ],
+            options={
+                'unique_together': {('server', 'posts_endpoint')},
+            },
+        ),
+    ]
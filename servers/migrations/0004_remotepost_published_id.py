@@ -0,0 +1,21 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:44
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0003_remoteauthorsync'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='remotepost',
+            name='remotepost_published_idx',
+        ),
+        migrations.AddIndex(
+            model_name='remotepost',
+            index=models.Index(fields=['-date_published', '-id'], name='remotepost_published_idx'),
+        ),
+    ]
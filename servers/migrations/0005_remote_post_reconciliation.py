@@ -0,0 +1,24 @@
+# Generated by Django 4.0.2 on 2026-10-18 17:45
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('servers', '0004_remotepost_published_id'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='remoteauthorsync',
+            name='last_full_sync',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='remotepost',
+            name='author_sync',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, to='servers.remoteauthorsync'),
+        ),
+    ]
@@ -1,19 +1,95 @@
-from typing import Dict
+from typing import Dict, Optional
 from django.db import models
-from requests.auth import HTTPBasicAuth
+from django.urls import reverse
+from django.utils.translation import gettext_lazy as _
 import requests
-import requests_cache
 
-STR_MAX_LENGTH = 512
+from servers.sessions import session_pool
 
-requests_cache.install_cache(expire_after=180)  # Cache GET and HEAD results for 180 seconds
+STR_MAX_LENGTH = 512
 
 
 class Server(models.Model):
+    class SyncStatus(models.TextChoices):
+        NEVER = 'NEVER', _('Never synced')
+        RUNNING = 'RUNNING', _('Running')
+        OK = 'OK', _('OK')
+        PARTIAL = 'PARTIAL', _('Partially synced')
+        FAILED = 'FAILED', _('Failed')
+
     service_address = models.CharField(max_length=STR_MAX_LENGTH)
     username = models.CharField(max_length=STR_MAX_LENGTH)
     password = models.CharField(max_length=STR_MAX_LENGTH)
+    last_sync_status = models.CharField(
+        max_length=7,
+        default=SyncStatus.NEVER,
+        choices=SyncStatus.choices,
+        editable=False)
+    last_sync_started = models.DateTimeField(null=True, blank=True, editable=False)
+    last_sync_finished = models.DateTimeField(null=True, blank=True, editable=False)
+    last_sync_error = models.TextField(blank=True, editable=False)
+
+    def __str__(self):
+        return self.service_address
 
-    def get(self, endpoint: str, params: Dict[str, str] = []) -> requests.Response:
+    def get(self, endpoint: str, params: Dict[str, str] = [], timeout: Optional[float] = None) -> requests.Response:
         full_endpoint = self.service_address + endpoint
-        return requests.get(full_endpoint, params, auth=HTTPBasicAuth(self.username, self.password))
+        return session_pool.get(self).get(full_endpoint, params, timeout=timeout)
+
+
+class RemoteAuthorSync(models.Model):
+    """
+    How far the posts of an author on another server have been synced
+    """
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    posts_endpoint = models.CharField(max_length=STR_MAX_LENGTH)
+    # Posts published before this have already been stored
+    latest_published = models.DateTimeField(null=True, blank=True)
+    # Last sync that read every post of the author, which also updates and removes the posts changed upstream
+    last_full_sync = models.DateTimeField(null=True, blank=True)
+    last_synced = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('server', 'posts_endpoint')
+
+    def __str__(self):
+        return f'{self.server}{self.posts_endpoint}'
+
+
+class RemotePost(models.Model):
+    """
+    A public post of an author on another server, copied locally by the `sync_remote_posts` command
+    """
+    server = models.ForeignKey(Server, on_delete=models.CASCADE)
+    # The author whose posts included this one when it was last synced
+    author_sync = models.ForeignKey(RemoteAuthorSync, on_delete=models.CASCADE, null=True, blank=True)
+    url = models.CharField(max_length=STR_MAX_LENGTH, unique=True)
+    author_url = models.CharField(max_length=STR_MAX_LENGTH)
+    author_name = models.CharField(max_length=STR_MAX_LENGTH, blank=True)
+    title = models.CharField(max_length=STR_MAX_LENGTH, blank=True)
+    description = models.TextField(blank=True)
+    content_type = models.CharField(max_length=STR_MAX_LENGTH, blank=True)
+    content = models.TextField(blank=True)
+    date_published = models.DateTimeField()
+    synced = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-date_published', '-id'], name='remotepost_published_idx'),
+            models.Index(fields=['author_url', '-date_published'], name='remotepost_author_idx'),
+        ]
+
+    def __str__(self):
+        return self.url
+
+    # Mirror the attributes of Post used by the post templates
+    @property
+    def author(self):
+        return {'get_full_name': self.author_name}
+
+    @property
+    def updated(self):
+        return self.synced
+
+    def get_absolute_url(self):
+        return reverse('posts:remote-detail', kwargs={'url': self.url})
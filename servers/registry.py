@@ -0,0 +1,96 @@
+import time
+import threading
+from typing import Iterable, Optional
+from urllib.parse import urlparse
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import cache
+
+from lib import metrics
+from servers.models import Server
+
+VERSION_CACHE_KEY = 'servers:registry:version'
+
+
+class ServerIndex:
+    """
+    Lookup tables over a snapshot of the servers, to find the server of a URL without querying the database.
+    """
+
+    def __init__(self, servers: Iterable[Server]):
+        self.servers = list(servers)
+        self._by_address: dict[str, Server] = {}
+        self._by_hostname: dict[str, Server] = {}
+        for server in self.servers:
+            self._by_address.setdefault(server.service_address.rstrip('/'), server)
+            self._by_hostname.setdefault(urlparse(server.service_address).hostname, server)
+
+    def by_address(self, service_address: str) -> Optional[Server]:
+        return self._by_address.get(service_address.rstrip('/'))
+
+    def by_prefix(self, url: str) -> Optional[Server]:
+        """Returns the server with the longest service address that `url` starts with."""
+        # Service addresses end at a path segment, so only the prefixes of `url` ending before a '/' can match
+        prefix = url.rstrip('/')
+        while prefix:
+            server = self._by_address.get(prefix)
+            if server is not None:
+                return server
+            end = prefix.rfind('/')
+            if end < 0 or prefix[:end].endswith('/'):
+                # Don't go past the host, 'https:/' is not an address
+                return None
+            prefix = prefix[:end]
+        return None
+
+    def by_hostname(self, url: str) -> Optional[Server]:
+        return self._by_hostname.get(urlparse(url).hostname)
+
+    def by_url(self, url: str) -> Optional[Server]:
+        """Returns the server hosting `url`, matched by service address and otherwise by host name."""
+        return self.by_prefix(url) or self.by_hostname(url)
+
+
+class ServerRegistry:
+    """
+    Process-local `ServerIndex` over every `Server` row.
+
+    Saving or deleting a server bumps a version stamp in the default cache (see `servers.signals`), which every process
+    compares against the stamp of its index. With a cache shared between processes all of them reload on the next
+    lookup; otherwise other processes reload after `SERVER_REGISTRY_TTL` seconds.
+    """
+
+    def __init__(self):
+        self._index: Optional[ServerIndex] = None
+        self._version: Optional[str] = None
+        self._loaded = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    def get_index(self) -> ServerIndex:
+        version = cache.get(VERSION_CACHE_KEY)
+        with self._lock:
+            now = time.monotonic()
+            if self._index is None or version != self._version or now - self._loaded >= settings.SERVER_REGISTRY_TTL:
+                self._index = ServerIndex(Server.objects.all())
+                self._version = version
+                self._loaded = now
+                self.reloads += 1
+            return self._index
+
+    def invalidate(self):
+        cache.set(VERSION_CACHE_KEY, uuid4().hex, None)
+        with self._lock:
+            self._index = None
+
+    def stats(self) -> dict:
+        index = self._index
+        return {
+            'servers': len(index.servers) if index is not None else None,
+            'reloads': self.reloads,
+            'age': time.monotonic() - self._loaded if index is not None else None,
+        }
+
+
+server_registry = ServerRegistry()
+metrics.register('server_registry', server_registry.stats)
@@ -0,0 +1,187 @@
+import socket
+import time
+import threading
+from typing import Hashable
+from django.conf import settings
+import requests
+from requests.adapters import HTTPAdapter
+from requests.auth import HTTPBasicAuth
+
+from lib import metrics
+from servers import deadline
+from servers.breaker import breakers
+from servers.http_cache import federation_cache
+
+# Status codes of responses that are retried
+RETRY_STATUS_CODES = (502, 503, 504)
+
+
+class ServerSession:
+    """
+    Keep-alive session to a single server, with a bounded connection pool and retries of failed GET requests.
+    """
+
+    def __init__(self, service_address: str, username: str, password: str):
+        self.credentials = (service_address, username, password)
+        # Retries are made by `get`, so they can be bounded by the request deadline
+        self.adapter = HTTPAdapter(
+            pool_connections=1,
+            pool_maxsize=settings.SERVER_SESSION_POOL_SIZE,
+            max_retries=0)
+        self.session = requests.Session()
+        self.session.auth = HTTPBasicAuth(username, password)
+        self.session.mount('http://', self.adapter)
+        self.session.mount('https://', self.adapter)
+
+    def get(self, url: str, params=None, timeout=None):
+        """
+        Sends a GET request, answered from the federation cache when possible.
+
+        Every attempt has to finish within `timeout` seconds, including reading the body, and all of them within the
+        request deadline if there is one. Attempts that could not connect, timed out or got a 502, 503 or 504 are
+        retried up to `SERVER_SESSION_RETRIES` times, as long as the deadline leaves time for them.
+        """
+        timeout = timeout or settings.SERVER_REQUEST_TIMEOUT
+        breaker = breakers.get(self.credentials[0])
+
+        # Only requests that miss the cache count towards the circuit breaker, and are bound by the request deadline
+        def send():
+            first_timeout = deadline.get_timeout(timeout)
+            return breaker.call(lambda: self._send(url, params, timeout, first_timeout))
+        return federation_cache.get(self.credentials[1], url, params, send)
+
+    def _send(self, url: str, params, timeout: float, first_timeout: float) -> requests.Response:
+        attempt_timeout = first_timeout
+        for attempt in range(settings.SERVER_SESSION_RETRIES + 1):
+            if attempt:
+                attempt_timeout = deadline.get_timeout(timeout)
+            try:
+                response = self._send_once(url, params, attempt_timeout)
+            except (requests.ConnectionError, requests.Timeout):
+                if not self._wait_for_retry(attempt):
+                    raise
+            else:
+                if response.status_code not in RETRY_STATUS_CODES or not self._wait_for_retry(attempt):
+                    return response
+
+    def _send_once(self, url: str, params, timeout: float) -> requests.Response:
+        """Sends the request once, raising `ReadTimeout` if it isn't answered in full within `timeout` seconds."""
+        end = time.monotonic() + timeout
+        response = self.session.get(url, params=params, timeout=timeout, stream=True)
+        sock = getattr(response.raw.connection, 'sock', None)
+        if sock is None:
+            return response
+
+        # The socket timeout applies to each read, so a body sent slowly is cut off by shutting the socket down
+        expired = threading.Event()
+
+        def expire():
+            expired.set()
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+        timer = threading.Timer(max(end - time.monotonic(), 0), expire)
+        timer.daemon = True
+        timer.start()
+        try:
+            response.content
+        except requests.RequestException:
+            if not expired.is_set():
+                raise
+        finally:
+            timer.cancel()
+        # The body may also have been cut short without an error, as urllib3 doesn't enforce the Content-Length
+        if expired.is_set():
+            response.close()
+            raise requests.ReadTimeout(f'Reading {url} took longer than {timeout:.2f} seconds')
+        return response
+
+    @staticmethod
+    def _wait_for_retry(attempt: int) -> bool:
+        """Waits before retrying after `attempt`, or returns `False` when there are no retries or no time left."""
+        if attempt >= settings.SERVER_SESSION_RETRIES:
+            return False
+        delay = settings.SERVER_SESSION_RETRY_BACKOFF * 2 ** attempt
+        left = deadline.remaining()
+        if left is not None and left <= delay:
+            return False
+        time.sleep(delay)
+        return True
+
+    def close(self):
+        self.session.close()
+
+    def stats(self) -> dict:
+        # Every host (or scheme) gets its own connection pool in the adapter
+        sent = connections = 0
+        pools = self.adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools.get(key)
+            if pool is not None:
+                sent += pool.num_requests
+                connections += pool.num_connections
+        return {
+            'requests': sent,
+            'connections': connections,
+            'reused': max(sent - connections, 0),
+        }
+
+
+class SessionPool:
+    """
+    Process-local `ServerSession` of every server, rebuilt when the address or credentials of a server change.
+    """
+
+    def __init__(self):
+        self._sessions: dict[Hashable, ServerSession] = {}
+        self._lock = threading.Lock()
+        self.rebuilds = 0
+        # Stats of the sessions that were closed, so the totals don't go backwards
+        self._closed = {'requests': 0, 'connections': 0, 'reused': 0}
+
+    def get(self, server) -> ServerSession:
+        key = server.pk or server.service_address
+        credentials = (server.service_address, server.username, server.password)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is not None and session.credentials == credentials:
+                return session
+            if session is not None:
+                self._close(session)
+                self.rebuilds += 1
+            session = self._sessions[key] = ServerSession(*credentials)
+            return session
+
+    def clear(self):
+        with self._lock:
+            for session in self._sessions.values():
+                self._close(session)
+            self._sessions.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            sessions = list(self._sessions.values())
+        totals = dict(self._closed)
+        servers = {}
+        for session in sessions:
+            stats = servers[session.credentials[0]] = session.stats()
+            for name, value in stats.items():
+                totals[name] += value
+        return {
+            **totals,
+            'reuse_rate': totals['reused'] / totals['requests'] if totals['requests'] else 0.0,
+            'sessions': len(sessions),
+            'rebuilds': self.rebuilds,
+            'servers': servers,
+        }
+
+    def _close(self, session: ServerSession):
+        for name, value in session.stats().items():
+            self._closed[name] += value
+        session.close()
+
+
+session_pool = SessionPool()
+metrics.register('server_sessions', session_pool.stats)
@@ -0,0 +1,20 @@
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from servers.models import Server
+from servers.registry import server_registry
+
+# Written by every sync, none of them change how URLs are routed to servers
+SYNC_FIELDS = {'last_sync_status', 'last_sync_started', 'last_sync_finished', 'last_sync_error'}
+
+
+@receiver(post_save, sender=Server)
+def on_server_save(sender, instance: Server, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= SYNC_FIELDS:
+        return
+    server_registry.invalidate()
+
+
+@receiver(post_delete, sender=Server)
+def on_server_delete(sender, instance: Server, **kwargs):
+    server_registry.invalidate()
@@ -0,0 +1,249 @@
+import urllib.parse
+from datetime import datetime, timedelta
+from sys import stderr
+from typing import Any, Optional
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from dateutil import parser
+from requests import Response
+
+from servers.models import RemoteAuthorSync, RemotePost, Server
+from servers import deadline
+from servers.fanout import fetch_all
+
+
+class SyncError(Exception):
+    pass
+
+
+def get_author_posts_endpoints(server: Server) -> list[str]:
+    resp = server.get('/authors', timeout=settings.SERVER_FETCH_TIMEOUT)
+    if resp.status_code != 200:
+        raise SyncError(f'Request to {server.service_address}/authors failed with status code {resp.status_code}')
+    try:
+        authors = resp.json()['items']
+    except Exception as e:
+        raise SyncError(f'Could not read authors of {server.service_address}, err: {e}')
+
+    authors_endpoint = server.service_address + '/authors/'
+    endpoints = []
+    for author in authors:
+        # TODO: Update this to author_url once our groupmates are ready (have the URL field)
+        author_id = author['id']
+        if isinstance(author_id, str) and author_id.startswith(authors_endpoint):
+            author_id = author_id[len(authors_endpoint):]
+        endpoints.append(f'/authors/{author_id}/posts')
+    return endpoints
+
+
+def parse_published(representation: dict[str, Any]) -> Optional[datetime]:
+    try:
+        date_published = parser.parse(representation['published'])
+    except (KeyError, TypeError, ValueError, OverflowError):
+        return None
+    if timezone.is_naive(date_published):
+        date_published = timezone.make_aware(date_published, timezone.utc)
+    return date_published
+
+
+def get_post_url(response: Response, representation: dict[str, Any]) -> str:
+    # Drop the paging parameters
+    request_url = response.url.split('?')[0]
+    if not request_url.endswith('/'):
+        request_url += '/'
+    # TODO: Update this to source or origin
+    return urllib.parse.urljoin(request_url, str(representation['id']))
+
+
+def to_remote_post_fields(response: Response, representation: dict[str, Any],
+                          date_published: datetime) -> Optional[dict[str, Any]]:
+    """
+    Maps a post of another server to the fields of a `RemotePost`, or `None` if it should not be stored
+    """
+    if representation.get('visibility', 'PUBLIC') != 'PUBLIC' or representation.get('unlisted', False):
+        return None
+    post_url = get_post_url(response, representation)
+
+    author = representation.get('author')
+    if isinstance(author, dict):
+        author_url = author.get('url') or author.get('id') or ''
+        author_name = author.get('displayName') or author.get('display_name') or ''
+    else:
+        author_url = author or ''
+        author_name = ''
+
+    return {
+        'url': post_url,
+        'author_url': author_url,
+        'author_name': author_name,
+        'title': representation.get('title') or '',
+        'description': representation.get('description') or '',
+        'content_type': representation.get('contentType') or representation.get('content_type') or '',
+        'content': representation.get('content') or '',
+        'date_published': date_published,
+    }
+
+
+def get_posts_representations(response: Response) -> list[dict[str, Any]]:
+    json_response = response.json()
+    # TODO: Remove this if group 13 implements placing posts under items
+    if isinstance(json_response, list):
+        return json_response
+    return json_response['items']
+
+
+def store_posts_page(state: RemoteAuthorSync, response: Response, representations: list[dict[str, Any]],
+                     high_water_mark: Optional[datetime]) -> tuple[int, Optional[datetime], bool]:
+    """
+    Stores the posts of one page of the author of `state` that were published after `high_water_mark`, and removes
+    the ones that are no longer public or listed.
+    Returns the number of posts stored, the newest publish date seen, and whether every post of the page was published
+    at or before `high_water_mark`, whatever order the server returned them in.
+    """
+    # Posts without a publish date can't be compared with the high-water mark, so they are skipped
+    posts = [(parse_published(representation), representation) for representation in representations]
+    posts = sorted(((date, representation) for (date, representation) in posts if date is not None),
+                   key=lambda post: post[0], reverse=True)
+    stored = 0
+    newest = posts[0][0] if posts else None
+    with transaction.atomic():
+        for date_published, representation in posts:
+            if high_water_mark is not None and date_published <= high_water_mark:
+                break
+            fields = to_remote_post_fields(response, representation, date_published)
+            if fields is None:
+                RemotePost.objects.filter(url=get_post_url(response, representation)).delete()
+                continue
+            RemotePost.objects.update_or_create(
+                url=fields.pop('url'), defaults={'server': state.server, 'author_sync': state, **fields})
+            stored += 1
+    all_known = newest is not None and high_water_mark is not None and newest <= high_water_mark
+    return stored, newest, all_known
+
+
+def is_oldest_first(representations: list[dict[str, Any]]) -> bool:
+    """Whether the server returned the page oldest first, in which case the next pages hold newer posts."""
+    dates = [date for date in map(parse_published, representations) if date is not None]
+    return len(dates) > 1 and dates[0] < dates[-1]
+
+
+def get_page_signature(representations: list[dict[str, Any]]) -> tuple:
+    """Returns the ids of the posts of a page, to tell when a server returns the same page again."""
+    return tuple(str(representation.get('id')) if isinstance(representation, dict) else str(representation)
+                 for representation in representations)
+
+
+def sync_authors(server: Server, errors: list[str]) -> int:
+    """
+    Syncs the posts of every author on `server`, see `sync_server`. Appends the errors that don't stop the sync to
+    `errors`, and returns the number of posts stored.
+    """
+    synced = 0
+    endpoints = get_author_posts_endpoints(server)
+    states = {state.posts_endpoint: state for state in RemoteAuthorSync.objects.filter(server=server)}
+    pending = {
+        endpoint: states.get(endpoint) or RemoteAuthorSync(server=server, posts_endpoint=endpoint)
+        for endpoint in endpoints
+    }
+    # Authors whose posts are all read by this sync, ignoring their high-water mark
+    full_sync_before = server.last_sync_started - timedelta(seconds=settings.REMOTE_SYNC_FULL_INTERVAL)
+    full = {
+        endpoint for (endpoint, state) in pending.items()
+        if state.last_full_sync is None or state.last_full_sync <= full_sync_before
+    }
+    # Newest post seen by this sync for each author
+    newest_seen: dict[str, datetime] = {}
+    # Posts of the page last read for each author
+    previous_pages: dict[str, tuple] = {}
+    page_size = settings.REMOTE_SYNC_PAGE_SIZE
+
+    for page in range(1, settings.REMOTE_SYNC_MAX_PAGES + 1):
+        if not pending:
+            break
+        if deadline.remaining() <= 0:
+            errors.append(f'Ran out of the sync budget on page {page}, with {len(pending)} author(s) left')
+            break
+        jobs = [(server, f'{endpoint}?page={page}&size={page_size}') for endpoint in pending]
+        results = fetch_all(jobs, page_budget=settings.REMOTE_SYNC_BUDGET)
+        if len(results) < len(jobs):
+            missing = len(jobs) - len(results)
+            errors.append(f'{missing} of {len(jobs)} author(s) could not be fetched on page {page}')
+
+        next_pending = {}
+        for (_, job_endpoint, resp) in results:
+            endpoint = job_endpoint.split('?')[0]
+            state = pending[endpoint]
+            try:
+                representations = get_posts_representations(resp)
+            except Exception as e:
+                errors.append(f'Could not read {job_endpoint}, err: {e}')
+                continue
+
+            signature = get_page_signature(representations)
+            if previous_pages.get(endpoint) == signature:
+                # The server ignores paging, and the page was stored already
+                done = True
+            else:
+                if state.pk is None:
+                    state.save()
+                high_water_mark = None if endpoint in full else state.latest_published
+                stored, newest, all_known = store_posts_page(state, resp, representations, high_water_mark)
+                synced += stored
+                if newest is not None:
+                    newest_seen[endpoint] = max(newest, newest_seen.get(endpoint, newest))
+                done = (all_known and not is_oldest_first(representations)) or len(representations) < page_size
+            previous_pages[endpoint] = signature
+
+            if done or page == settings.REMOTE_SYNC_MAX_PAGES:
+                # Only move the high-water mark once every newer post has been stored. When the page limit cuts
+                # the sync short, the next sync reads the posts after the mark from the top again
+                if done and endpoint in newest_seen:
+                    state.latest_published = max(
+                        newest_seen[endpoint], state.latest_published or newest_seen[endpoint])
+                if endpoint in full:
+                    if done:
+                        # Every post still on the server was stored again by this sync
+                        RemotePost.objects.filter(author_sync=state, synced__lt=server.last_sync_started).delete()
+                    state.last_full_sync = server.last_sync_started
+                state.save()
+            else:
+                next_pending[endpoint] = state
+        pending = next_pending
+    return synced
+
+
+def sync_server(server: Server) -> int:
+    """
+    Copies the new public posts of every author on `server` to `RemotePost`, and records the outcome on `server`.
+    Returns the number of posts stored.
+
+    The posts of each author are paged until a page only holds posts that were already stored by a previous sync, a
+    page is short or the same as the previous one (servers that ignore paging), or `REMOTE_SYNC_MAX_PAGES` is reached.
+    Servers that return their posts oldest first are paged until the end, as their new posts are on the last pages.
+
+    Every `REMOTE_SYNC_FULL_INTERVAL` seconds, every post of an author is read and stored again instead, and the posts
+    of the author that were not returned are removed.
+    """
+    server.last_sync_status = Server.SyncStatus.RUNNING
+    server.last_sync_started = timezone.now()
+    server.save(update_fields=['last_sync_status', 'last_sync_started'])
+
+    errors = []
+    synced = 0
+    try:
+        # The budget covers the whole sync, every page takes what is left of it
+        with deadline.deadline(settings.REMOTE_SYNC_BUDGET):
+            synced = sync_authors(server, errors)
+    except Exception as e:
+        server.last_sync_status = Server.SyncStatus.FAILED
+        server.last_sync_error = str(e)
+    else:
+        server.last_sync_status = Server.SyncStatus.PARTIAL if errors else Server.SyncStatus.OK
+        server.last_sync_error = '\n'.join(errors)
+
+    for error in server.last_sync_error.splitlines():
+        print(f'Sync of {server.service_address}: {error}', file=stderr)
+    server.last_sync_finished = timezone.now()
+    server.save(update_fields=['last_sync_status', 'last_sync_finished', 'last_sync_error'])
+    return synced
@@ -1,3 +1,760 @@
-from django.test import TestCase
+import json
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from io import StringIO
+from unittest.mock import MagicMock, patch
+from uuid import uuid4
+from requests import ReadTimeout, Response
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import RequestFactory, TestCase, override_settings
 
-# Create your tests here.
+from api.tests.constants import SAMPLE_REMOTE_AUTHORS, SAMPLE_REMOTE_POSTS
+from servers.authors import get_endpoint, remote_author_cache, resolve_author, resolve_authors
+from servers.breaker import CircuitBreaker, ServerUnavailable, breakers
+from servers.deadline import DeadlineExceeded, deadline, get_timeout, remaining
+from servers.middleware import RequestDeadlineMiddleware
+from servers.models import RemoteAuthorSync, RemotePost, Server
+from servers.registry import VERSION_CACHE_KEY, ServerIndex, ServerRegistry
+from servers.http_cache import federation_cache, get_ttl
+from servers.sessions import session_pool
+from servers.fanout import fetch_all, get_unavailable_servers
+from servers.sync import parse_published, store_posts_page, sync_server
+
+
+def create_mock_server(service_address: str, delay: float = 0, error: Exception = None) -> Server:
+    server = Server(service_address=service_address, username='hello', password='no')
+
+    def get(endpoint, *args, **kwargs):
+        time.sleep(delay)
+        if error is not None:
+            raise error
+        response = Response()
+        response.url = service_address + endpoint
+        return response
+
+    server.get = MagicMock(side_effect=get)
+    return server
+
+
+@override_settings(SERVER_FETCH_PAGE_BUDGET=1, SERVER_FETCH_TIMEOUT=0.2)
+class FetchAllTests(TestCase):
+    def test_returns_responses_in_job_order(self):
+        slow = create_mock_server('http://slow', delay=0.05)
+        fast = create_mock_server('http://fast')
+        results = fetch_all([(slow, '/authors'), (fast, '/authors'), (fast, '/authors/1/posts')])
+        self.assertEqual([resp.url for (_, _, resp) in results],
+                         ['http://slow/authors', 'http://fast/authors', 'http://fast/authors/1/posts'])
+
+    def test_runs_concurrently(self):
+        servers = [create_mock_server(f'http://{i}', delay=0.1) for i in range(8)]
+        start = time.monotonic()
+        results = fetch_all([(server, '/authors') for server in servers])
+        self.assertEqual(len(results), len(servers))
+        self.assertLess(time.monotonic() - start, 0.1 * len(servers))
+
+    def test_drops_late_responses(self):
+        late = create_mock_server('http://late', delay=0.4)
+        fast = create_mock_server('http://fast')
+        start = time.monotonic()
+        results = fetch_all([(late, '/authors'), (fast, '/authors')], page_budget=0.3)
+        self.assertLess(time.monotonic() - start, 0.4)
+        self.assertEqual([server for (server, _, _) in results], [fast])
+
+    def test_drops_failed_requests(self):
+        broken = create_mock_server('http://broken', error=ConnectionError())
+        fast = create_mock_server('http://fast')
+        results = fetch_all([(broken, '/authors'), (fast, '/authors')])
+        self.assertEqual([server for (server, _, _) in results], [fast])
+        self.assertEqual(results.unavailable, [broken])
+
+    def test_request_deadline_applies_to_jobs(self):
+        seen = []
+        server = create_mock_server('http://server')
+        server.get.side_effect = lambda *args, **kwargs: seen.append(remaining()) or Response()
+        with deadline(10):
+            fetch_all([(server, '/authors')])
+        self.assertEqual(len(seen), 1)
+        self.assertLessEqual(seen[0], 10)
+
+    def test_request_deadline_cuts_page_budget(self):
+        slow = create_mock_server('http://slow', delay=0.4)
+        start = time.monotonic()
+        with deadline(0.1):
+            results = fetch_all([(slow, '/authors')], page_budget=1, server_timeout=1)
+        self.assertLess(time.monotonic() - start, 0.3)
+        self.assertEqual(list(results), [])
+        self.assertEqual(results.unavailable, [slow])
+
+    def test_server_timeout_starts_with_job(self):
+        # On a single worker the last job starts after the others took longer than its timeout
+        servers = [create_mock_server(f'http://{i}', delay=0.1) for i in range(3)]
+        with patch('servers.fanout._executor', ThreadPoolExecutor(max_workers=1)):
+            results = fetch_all([(server, '/authors') for server in servers], page_budget=1, server_timeout=0.15)
+        self.assertEqual([server for (server, _, _) in results], servers)
+        self.assertEqual(results.unavailable, [])
+
+    def test_jobs_not_started_are_not_unavailable(self):
+        slow = create_mock_server('http://slow', delay=0.3)
+        fast = create_mock_server('http://fast')
+        with patch('servers.fanout._executor', ThreadPoolExecutor(max_workers=1)):
+            results = fetch_all([(slow, '/authors'), (fast, '/authors')], page_budget=0.1, server_timeout=1)
+        self.assertEqual(list(results), [])
+        self.assertEqual(results.unavailable, [slow])
+
+    @override_settings(SERVER_BREAKER_OPEN_SECONDS=60)
+    def test_skips_servers_with_open_breaker(self):
+        down = create_mock_server('http://down')
+        fast = create_mock_server('http://fast')
+        breakers.get('http://down')._open()
+        try:
+            results = fetch_all([(down, '/authors'), (fast, '/authors'), (down, '/authors/1')])
+        finally:
+            breakers.clear()
+        down.get.assert_not_called()
+        self.assertEqual([server for (server, _, _) in results], [fast])
+        self.assertEqual(results.unavailable, [down])
+
+
+class DeadlineTests(TestCase):
+    def test_no_deadline(self):
+        self.assertIsNone(remaining())
+        self.assertEqual(get_timeout(5), 5)
+
+    def test_timeout_is_cut_to_remaining_time(self):
+        with deadline(1):
+            self.assertLessEqual(get_timeout(5), 1)
+            self.assertEqual(get_timeout(0.5), 0.5)
+        self.assertIsNone(remaining())
+
+    def test_inner_deadline_cannot_extend_outer(self):
+        with deadline(1):
+            with deadline(10):
+                self.assertLessEqual(remaining(), 1)
+            with deadline(0.5):
+                self.assertLessEqual(remaining(), 0.5)
+
+    def test_raises_once_spent(self):
+        with deadline(0):
+            with self.assertRaises(DeadlineExceeded):
+                get_timeout(5)
+
+    @override_settings(REQUEST_DEADLINE=3)
+    def test_middleware_sets_deadline(self):
+        seen = []
+        middleware = RequestDeadlineMiddleware(lambda request: seen.append(remaining()))
+        middleware(RequestFactory().get('/'))
+        self.assertLessEqual(seen[0], 3)
+        self.assertIsNone(remaining())
+
+
+def create_response(status_code: int = 200) -> Response:
+    response = Response()
+    response.status_code = status_code
+    return response
+
+
+@override_settings(SERVER_BREAKER_WINDOW=4, SERVER_BREAKER_MIN_CALLS=2, SERVER_BREAKER_FAILURE_RATE=0.5,
+                   SERVER_BREAKER_SLOW_CALL=0.05, SERVER_BREAKER_OPEN_SECONDS=0.1)
+class CircuitBreakerTests(TestCase):
+    def setUp(self) -> None:
+        self.breaker = CircuitBreaker()
+
+    def fail(self):
+        with self.assertRaises(ConnectionError):
+            self.breaker.call(MagicMock(side_effect=ConnectionError()))
+
+    def test_stays_closed_below_min_calls(self):
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+        self.assertFalse(self.breaker.is_open())
+
+    def test_opens_at_failure_rate(self):
+        self.breaker.call(lambda: create_response())
+        self.breaker.call(lambda: create_response(500))
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertTrue(self.breaker.is_open())
+
+        send = MagicMock(return_value=create_response())
+        with self.assertRaises(ServerUnavailable):
+            self.breaker.call(send)
+        send.assert_not_called()
+        self.assertEqual(self.breaker.stats()['rejected'], 1)
+
+    def test_slow_calls_count_as_failures(self):
+        def slow():
+            time.sleep(0.06)
+            return create_response()
+        self.breaker.call(slow)
+        self.breaker.call(slow)
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+
+    def test_half_open_trial_closes(self):
+        self.fail()
+        self.fail()
+        time.sleep(0.1)
+        self.assertFalse(self.breaker.is_open())
+        self.breaker.call(lambda: create_response())
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+    def test_half_open_trial_reopens(self):
+        self.fail()
+        self.fail()
+        time.sleep(0.1)
+        self.fail()
+        self.assertEqual(self.breaker.state, CircuitBreaker.OPEN)
+        self.assertEqual(self.breaker.stats()['opened'], 2)
+
+    def test_single_trial_while_half_open(self):
+        self.fail()
+        self.fail()
+        time.sleep(0.1)
+
+        def trial():
+            # Another request arrives while the trial is running
+            self.assertTrue(self.breaker.is_open())
+            with self.assertRaises(ServerUnavailable):
+                self.breaker.call(lambda: create_response())
+            return create_response()
+        self.breaker.call(trial)
+        self.assertEqual(self.breaker.state, CircuitBreaker.CLOSED)
+
+
+class SyncTests(TestCase):
+    def setUp(self) -> None:
+        self.server = Server.objects.create(
+            service_address='https://cmput-404-w22-project-group09.herokuapp.com/service',
+            username='hello',
+            password='no')
+
+    def mock_get(self, posts_status_code: int = 200):
+        authors = json.loads(SAMPLE_REMOTE_AUTHORS)
+        posts = json.loads(SAMPLE_REMOTE_POSTS)
+
+        def get(endpoint, *args, **kwargs):
+            response = Response()
+            response.url = self.server.service_address + endpoint
+            if endpoint == '/authors':
+                response.status_code = 200
+                response.json = MagicMock(return_value=authors)
+            else:
+                response.status_code = posts_status_code
+                response.json = MagicMock(return_value=posts)
+            return response
+        return get
+
+    def test_sync_stores_posts(self):
+        with patch.object(Server, 'get', side_effect=self.mock_get()):
+            sync_server(self.server)
+
+        post = json.loads(SAMPLE_REMOTE_POSTS)[0]
+        remote_post = RemotePost.objects.get()
+        self.assertEqual(remote_post.url, post['id'])
+        self.assertEqual(remote_post.title, post['title'])
+        self.assertEqual(remote_post.author_name, post['author']['display_name'])
+        self.assertEqual(remote_post.date_published.isoformat(), '2022-03-23T00:01:32+00:00')
+
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.last_sync_status, Server.SyncStatus.OK)
+        self.assertIsNotNone(self.server.last_sync_started)
+        self.assertIsNotNone(self.server.last_sync_finished)
+
+    def test_sync_is_idempotent(self):
+        with patch.object(Server, 'get', side_effect=self.mock_get()):
+            sync_server(self.server)
+            sync_server(self.server)
+        self.assertEqual(RemotePost.objects.count(), 1)
+
+    def test_sync_records_failures(self):
+        with patch.object(Server, 'get', side_effect=ConnectionError('unreachable')):
+            sync_server(self.server)
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.last_sync_status, Server.SyncStatus.FAILED)
+        self.assertIn('unreachable', self.server.last_sync_error)
+
+    def test_sync_command(self):
+        with patch.object(Server, 'get', side_effect=self.mock_get()):
+            call_command('sync_remote_posts', stdout=StringIO())
+        self.assertEqual(RemotePost.objects.count(), 1)
+
+
+@override_settings(REMOTE_SYNC_PAGE_SIZE=2, REMOTE_SYNC_MAX_PAGES=10)
+class IncrementalSyncTests(TestCase):
+    def setUp(self) -> None:
+        self.server = Server.objects.create(service_address='http://remote/api', username='hello', password='no')
+        self.posts = [self.create_post_representation(day) for day in range(1, 6)]
+        self.requested = []
+        self.oldest_first = False
+        self.ignore_paging = False
+
+    def create_post_representation(self, day: int) -> dict:
+        return {
+            'id': f'http://remote/api/authors/1/posts/{day}',
+            'title': f'Post {day}',
+            'author': {'url': 'http://remote/api/authors/1', 'displayName': 'Remote'},
+            'published': f'2022-03-{day:02}T00:00:00Z',
+            'visibility': 'PUBLIC',
+            'unlisted': False,
+        }
+
+    def get(self, endpoint, *args, **kwargs):
+        self.requested.append(endpoint)
+        response = Response()
+        response.status_code = 200
+        response.url = self.server.service_address + endpoint
+        if endpoint == '/authors':
+            response.json = MagicMock(return_value={'items': [{'id': 1}]})
+            return response
+        query = dict(param.split('=') for param in endpoint.split('?')[1].split('&'))
+        page, size = int(query['page']), int(query['size'])
+        posts = sorted(self.posts, key=lambda post: post['published'], reverse=not self.oldest_first)
+        if not self.ignore_paging:
+            posts = posts[(page - 1) * size:page * size]
+        response.json = MagicMock(return_value={'items': posts})
+        return response
+
+    def sync(self) -> int:
+        self.requested = []
+        with patch.object(Server, 'get', side_effect=self.get):
+            return sync_server(self.server)
+
+    def test_first_sync_reads_every_page(self):
+        self.assertEqual(self.sync(), 5)
+        self.assertEqual(RemotePost.objects.count(), 5)
+        self.assertEqual(len([endpoint for endpoint in self.requested if 'posts' in endpoint]), 3)
+        self.assertEqual(RemoteAuthorSync.objects.get().latest_published.day, 5)
+
+    def test_next_sync_stops_at_known_posts(self):
+        self.sync()
+        self.posts.append(self.create_post_representation(6))
+
+        self.assertEqual(self.sync(), 1)
+        self.assertEqual(RemotePost.objects.count(), 6)
+        # The first page still holds a new post, so paging stops on the second one
+        self.assertEqual(self.requested,
+                         ['/authors', '/authors/1/posts?page=1&size=2', '/authors/1/posts?page=2&size=2'])
+        self.assertEqual(RemoteAuthorSync.objects.get().latest_published.day, 6)
+
+    def test_oldest_first_pages(self):
+        self.oldest_first = True
+        self.sync()
+        self.posts.append(self.create_post_representation(6))
+        self.posts.append(self.create_post_representation(7))
+
+        # The new posts are on the last page, after pages of known posts
+        self.assertEqual(self.sync(), 2)
+        self.assertEqual(RemotePost.objects.count(), 7)
+        self.assertEqual(RemoteAuthorSync.objects.get().latest_published.day, 7)
+
+    def test_page_in_any_order(self):
+        response = Response()
+        response.url = 'http://remote/api/authors/1/posts?page=1&size=3'
+        state = RemoteAuthorSync.objects.create(server=self.server, posts_endpoint='/authors/1/posts')
+        mark = parse_published(self.posts[2])
+        page = [self.posts[1], self.posts[4], self.posts[3]]
+        stored, newest, all_known = store_posts_page(state, response, page, mark)
+        self.assertEqual((stored, newest.day, all_known), (2, 5, False))
+        stored, newest, all_known = store_posts_page(state, response, [self.posts[2], self.posts[0]], mark)
+        self.assertEqual((stored, all_known), (0, True))
+
+    def test_stops_when_paging_is_ignored(self):
+        self.ignore_paging = True
+        self.assertEqual(self.sync(), 5)
+        self.assertEqual(RemotePost.objects.count(), 5)
+        self.assertEqual(len([endpoint for endpoint in self.requested if 'posts' in endpoint]), 2)
+
+    def test_unchanged_author_stores_nothing(self):
+        self.sync()
+        self.assertEqual(self.sync(), 0)
+
+    def test_page_limit_keeps_high_water_mark(self):
+        self.sync()
+        self.posts += [self.create_post_representation(day) for day in range(6, 11)]
+        with override_settings(REMOTE_SYNC_MAX_PAGES=2):
+            self.sync()
+        self.assertEqual(RemoteAuthorSync.objects.get().latest_published.day, 5)
+
+        # The posts past the limit are stored by the next sync
+        self.sync()
+        self.assertEqual(RemotePost.objects.count(), 10)
+        self.assertEqual(RemoteAuthorSync.objects.get().latest_published.day, 10)
+
+    @override_settings(REMOTE_SYNC_BUDGET=0.5, SERVER_FETCH_TIMEOUT=5)
+    def test_budget_covers_every_page(self):
+        def get(endpoint, *args, **kwargs):
+            if 'posts' in endpoint:
+                time.sleep(0.2)
+            return self.get(endpoint)
+
+        with patch.object(Server, 'get', side_effect=get):
+            sync_server(self.server)
+        # The third page starts with less time left than it takes
+        self.server.refresh_from_db()
+        self.assertEqual(self.server.last_sync_status, Server.SyncStatus.PARTIAL)
+        self.assertEqual(RemotePost.objects.count(), 4)
+        self.assertIsNone(RemoteAuthorSync.objects.get().latest_published)
+
+    def test_full_sync_removes_posts_changed_upstream(self):
+        self.sync()
+        deleted = self.posts.pop(2)
+        self.posts[0]['visibility'] = 'FRIENDS'
+        self.posts[1]['unlisted'] = True
+        self.posts[2]['title'] = 'Edited'
+
+        # Within the interval, only the posts after the high-water mark are read
+        self.sync()
+        self.assertEqual(RemotePost.objects.count(), 5)
+
+        with override_settings(REMOTE_SYNC_FULL_INTERVAL=0):
+            self.sync()
+        self.assertEqual(set(RemotePost.objects.values_list('url', flat=True)),
+                         {self.posts[2]['id'], self.posts[3]['id']})
+        self.assertFalse(RemotePost.objects.filter(url=deleted['id']).exists())
+        self.assertEqual(RemotePost.objects.get(url=self.posts[2]['id']).title, 'Edited')
+
+    def test_incomplete_full_sync_removes_nothing(self):
+        self.sync()
+        with override_settings(REMOTE_SYNC_FULL_INTERVAL=0, REMOTE_SYNC_MAX_PAGES=2):
+            self.sync()
+        self.assertEqual(RemotePost.objects.count(), 5)
+
+    def test_failed_page_keeps_high_water_mark(self):
+        def get(endpoint, *args, **kwargs):
+            if 'page=2' in endpoint:
+                raise ConnectionError()
+            return self.get(endpoint)
+
+        with patch.object(Server, 'get', side_effect=get):
+            sync_server(self.server)
+        self.assertIsNone(RemoteAuthorSync.objects.filter(latest_published__isnull=False).first())
+
+        # The next sync resumes from the top and picks up the posts that were missed
+        self.assertEqual(self.sync(), 5)
+
+
+@override_settings(REMOTE_AUTHOR_CACHE_MAX_ENTRIES=10, REMOTE_AUTHOR_CACHE_TTL=60, REMOTE_AUTHOR_NEGATIVE_TTL=60)
+class RemoteAuthorTests(TestCase):
+    def setUp(self) -> None:
+        remote_author_cache.clear()
+        self.server = create_mock_server('https://remote.example.com/service')
+        self.server.get.side_effect = self.get_author
+        self.servers = patch('servers.models.Server.objects')
+        self.servers.start().all.return_value = [self.server]
+
+    def tearDown(self) -> None:
+        self.servers.stop()
+        remote_author_cache.clear()
+
+    def get_author(self, endpoint, *args, **kwargs):
+        response = Response()
+        if endpoint == '/authors/missing':
+            response.status_code = 404
+            return response
+        response.status_code = 200
+        response._content = json.dumps({'type': 'author', 'id': endpoint}).encode()
+        return response
+
+    def test_resolves_authors_once(self):
+        urls = ['https://remote.example.com/service/authors/1', 'https://remote.example.com/service/authors/2']
+        authors = resolve_authors(urls + urls)
+        self.assertEqual(authors[urls[0]]['id'], '/authors/1')
+        self.assertEqual(authors[urls[1]]['id'], '/authors/2')
+        self.assertEqual(self.server.get.call_count, 2)
+
+        self.assertEqual(resolve_author(urls[0])['id'], '/authors/1')
+        self.assertEqual(self.server.get.call_count, 2)
+        self.assertEqual(remote_author_cache.stats()['hits'], 1)
+
+    def test_caches_failures(self):
+        url = 'https://remote.example.com/service/authors/missing'
+        self.assertIsNone(resolve_author(url))
+        self.assertIsNone(resolve_author(url))
+        self.assertEqual(self.server.get.call_count, 1)
+        self.assertEqual(remote_author_cache.stats()['negative_hits'], 1)
+
+    def test_unknown_server(self):
+        self.assertIsNone(resolve_author('https://unknown.example.com/authors/1'))
+        self.server.get.assert_not_called()
+
+    @override_settings(REMOTE_AUTHOR_CACHE_TTL=0)
+    def test_expired_authors_are_fetched_again(self):
+        url = 'https://remote.example.com/service/authors/1'
+        resolve_author(url)
+        resolve_author(url)
+        self.assertEqual(self.server.get.call_count, 2)
+
+    def test_endpoint_is_relative_to_service_address(self):
+        self.assertEqual(get_endpoint(self.server, 'https://remote.example.com/service/authors/1'), '/authors/1')
+        self.assertEqual(get_endpoint(self.server, 'http://remote.example.com/service/authors/1'), '/authors/1')
+
+
+class ServerIndexTests(TestCase):
+    def setUp(self) -> None:
+        self.api = Server(service_address='https://remote.example.com/api')
+        self.v2 = Server(service_address='https://remote.example.com/api/v2/')
+        self.index = ServerIndex([self.api, self.v2])
+
+    def test_longest_prefix(self):
+        self.assertIs(self.index.by_prefix('https://remote.example.com/api/v2/authors/1'), self.v2)
+        self.assertIs(self.index.by_prefix('https://remote.example.com/api/authors/1'), self.api)
+        self.assertIs(self.index.by_prefix('https://remote.example.com/api'), self.api)
+        self.assertIsNone(self.index.by_prefix('https://remote.example.com/apiv2/authors/1'))
+        self.assertIsNone(self.index.by_prefix('https://other.example.com/api/authors/1'))
+
+    def test_by_url_falls_back_to_hostname(self):
+        self.assertIs(self.index.by_url('http://remote.example.com/authors/1'), self.api)
+        self.assertIsNone(self.index.by_url('https://other.example.com/api/authors/1'))
+
+    def test_by_address(self):
+        self.assertIs(self.index.by_address('https://remote.example.com/api/v2'), self.v2)
+
+
+@override_settings(SERVER_REGISTRY_TTL=60)
+class ServerRegistryTests(TestCase):
+    def setUp(self) -> None:
+        cache.delete(VERSION_CACHE_KEY)
+        self.registry = ServerRegistry()
+        self.server = Server.objects.create(service_address='https://remote.example.com/api')
+
+    def test_lookups_need_no_queries(self):
+        self.registry.get_index()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.registry.get_index().by_url('https://remote.example.com/api/authors/1'), self.server)
+
+    def test_changes_reload_every_registry(self):
+        self.registry.get_index()
+        other = Server.objects.create(service_address='https://other.example.com')
+        self.assertEqual(self.registry.get_index().by_url('https://other.example.com/authors/1'), other)
+        self.assertEqual(self.registry.reloads, 2)
+
+        other.delete()
+        self.assertIsNone(self.registry.get_index().by_url('https://other.example.com/authors/1'))
+
+    @override_settings(SERVER_REGISTRY_TTL=60)
+    def test_unavailable_servers_need_no_queries(self):
+        self.server.last_sync_status = Server.SyncStatus.FAILED
+        self.server.save()
+        get_unavailable_servers()
+        with self.assertNumQueries(0):
+            self.assertEqual(get_unavailable_servers(), [self.server])
+
+    def test_syncs_do_not_reload(self):
+        self.registry.get_index()
+        self.server.last_sync_status = Server.SyncStatus.OK
+        self.server.save(update_fields=['last_sync_status'])
+        self.registry.get_index()
+        self.assertEqual(self.registry.reloads, 1)
+
+    @override_settings(SERVER_REGISTRY_TTL=0)
+    def test_expires(self):
+        self.registry.get_index()
+        self.registry.get_index()
+        self.assertEqual(self.registry.reloads, 2)
+
+
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    statuses = []
+    paths = []
+    # Seconds waited before sending each byte of the body
+    drip = 0
+
+    def do_GET(self):
+        self.paths.append(self.path)
+        status = self.statuses.pop(0) if self.statuses else 200
+        body = json.dumps({'path': self.path, 'authorization': self.headers.get('Authorization')}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if not self.drip:
+            self.wfile.write(body)
+            return
+        try:
+            for i in range(len(body)):
+                time.sleep(self.drip)
+                self.wfile.write(body[i:i + 1])
+                self.wfile.flush()
+        except OSError:
+            pass
+
+    def log_message(self, *args):
+        pass
+
+
+class LocalServerTestCase(TestCase):
+    """Runs a keep-alive HTTP server on localhost, and the `Server` pointing at it."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.httpd = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+        threading.Thread(target=cls.httpd.serve_forever, daemon=True).start()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.httpd.shutdown()
+        cls.httpd.server_close()
+        super().tearDownClass()
+
+    def setUp(self) -> None:
+        session_pool.clear()
+        federation_cache.clear()
+        breakers.clear()
+        KeepAliveHandler.statuses = []
+        KeepAliveHandler.paths = []
+        KeepAliveHandler.drip = 0
+        self.server = Server.objects.create(
+            service_address=f'http://127.0.0.1:{self.httpd.server_port}/service', username='hello', password='no')
+
+    def tearDown(self) -> None:
+        session_pool.clear()
+        federation_cache.clear()
+        breakers.clear()
+
+
+@override_settings(SERVER_SESSION_RETRY_BACKOFF=0)
+class ServerSessionTests(LocalServerTestCase):
+    def test_reuses_connections(self):
+        # Distinct endpoints, so none of the responses come from the federation cache
+        for i in range(3):
+            res = self.server.get(f'/authors/{uuid4()}')
+            self.assertEqual(res.json()['authorization'], 'Basic aGVsbG86bm8=')
+
+        stats = session_pool.stats()
+        self.assertEqual(stats['sessions'], 1)
+        self.assertEqual(stats['servers'][self.server.service_address],
+                         {'requests': 3, 'connections': 1, 'reused': 2})
+
+    def test_rebuilds_session_when_credentials_change(self):
+        session = session_pool.get(self.server)
+        self.assertIs(session_pool.get(self.server), session)
+
+        self.server.password = 'changed'
+        self.assertIsNot(session_pool.get(self.server), session)
+        self.assertEqual(session_pool.stats()['rebuilds'], 1)
+
+    def test_retries_unavailable_server(self):
+        KeepAliveHandler.statuses = [503]
+        res = self.server.get(f'/authors/{uuid4()}')
+        self.assertEqual(res.status_code, 200)
+
+    @override_settings(SERVER_SESSION_RETRIES=0)
+    def test_no_retries(self):
+        KeepAliveHandler.statuses = [503]
+        res = self.server.get(f'/authors/{uuid4()}')
+        self.assertEqual(res.status_code, 503)
+
+    def test_spent_deadline_fails_fast(self):
+        self.server.get('/authors/1')
+        with deadline(0):
+            # Cached responses are still served
+            self.assertEqual(self.server.get('/authors/1').status_code, 200)
+            with self.assertRaises(DeadlineExceeded):
+                self.server.get(f'/authors/{uuid4()}')
+        self.assertEqual(KeepAliveHandler.paths, ['/service/authors/1'])
+        self.assertEqual(breakers.stats()[self.server.service_address]['failure_rate'], 0.0)
+
+    @override_settings(SERVER_SESSION_RETRY_BACKOFF=0.5)
+    def test_no_retry_past_deadline(self):
+        KeepAliveHandler.statuses = [503]
+        with deadline(0.3):
+            res = self.server.get(f'/authors/{uuid4()}')
+        self.assertEqual(res.status_code, 503)
+        self.assertEqual(len(KeepAliveHandler.paths), 1)
+
+    @override_settings(SERVER_SESSION_RETRIES=0)
+    def test_slow_body_times_out(self):
+        # Every read gets a byte in time, but the whole body takes longer than the timeout
+        KeepAliveHandler.drip = 0.02
+        start = time.monotonic()
+        with self.assertRaises(ReadTimeout):
+            self.server.get(f'/authors/{uuid4()}', timeout=0.2)
+        self.assertLess(time.monotonic() - start, 0.4)
+
+    def test_retries_stay_within_deadline(self):
+        KeepAliveHandler.drip = 0.02
+        start = time.monotonic()
+        with deadline(0.3), self.assertRaises(ReadTimeout):
+            self.server.get(f'/authors/{uuid4()}')
+        self.assertLess(time.monotonic() - start, 0.5)
+
+    @override_settings(SERVER_SESSION_RETRIES=0, SERVER_BREAKER_MIN_CALLS=2, SERVER_BREAKER_OPEN_SECONDS=60)
+    def test_breaker_stops_requests(self):
+        KeepAliveHandler.statuses = [503, 503]
+        for i in range(2):
+            self.server.get(f'/authors/{uuid4()}')
+        with self.assertRaises(ServerUnavailable):
+            self.server.get(f'/authors/{uuid4()}')
+        self.assertEqual(len(KeepAliveHandler.paths), 2)
+        self.assertEqual(breakers.stats()[self.server.service_address]['state'], CircuitBreaker.OPEN)
+
+
+@override_settings(FEDERATION_CACHE_TTLS=[(r'/posts', 0), (r'/authors', 60)],
+                   FEDERATION_CACHE_STALE_WHILE_REVALIDATE=60)
+class FederationCacheTests(LocalServerTestCase):
+    def test_caches_responses(self):
+        first = self.server.get('/authors/1')
+        second = self.server.get('/authors/1')
+        self.assertEqual(second.json(), first.json())
+        self.assertTrue(second.from_cache)
+        self.assertEqual(KeepAliveHandler.paths, ['/service/authors/1'])
+        self.assertEqual(federation_cache.stats()['hits'], 1)
+
+    def test_params_are_part_of_the_key(self):
+        self.server.get('/authors', {'page': 1})
+        self.server.get('/authors', {'page': 2})
+        self.assertEqual(KeepAliveHandler.paths, ['/service/authors?page=1', '/service/authors?page=2'])
+
+    def test_ttl_per_endpoint(self):
+        self.server.get('/authors/1/posts')
+        self.server.get('/authors/1/posts')
+        self.assertEqual(len(KeepAliveHandler.paths), 2)
+
+    def test_errors_are_not_cached(self):
+        KeepAliveHandler.statuses = [404]
+        self.assertEqual(self.server.get('/authors/1').status_code, 404)
+        self.assertEqual(self.server.get('/authors/1').status_code, 200)
+
+    @override_settings(FEDERATION_CACHE_TTLS=[(r'/authors', 0.05)])
+    def test_stale_while_revalidate(self):
+        self.server.get('/authors/1')
+        time.sleep(0.1)
+        stale = self.server.get('/authors/1')
+        self.assertTrue(stale.from_cache)
+        for _ in range(50):
+            if federation_cache.revalidations:
+                break
+            time.sleep(0.01)
+        self.assertEqual(len(KeepAliveHandler.paths), 2)
+        self.assertEqual(federation_cache.stats()['stale_hits'], 1)
+
+    @override_settings(FEDERATION_CACHE_MAX_ENTRIES=2)
+    def test_evicts_least_recently_used(self):
+        self.server.get('/authors/1')
+        self.server.get('/authors/2')
+        self.server.get('/authors/1')
+        self.server.get('/authors/3')
+        self.server.get('/authors/1')
+        self.server.get('/authors/2')
+        self.assertEqual(KeepAliveHandler.paths, [f'/service/authors/{i}' for i in (1, 2, 3, 2)])
+        self.assertEqual(federation_cache.stats()['entries'], 2)
+
+    def test_sqlite_backend(self):
+        with tempfile.TemporaryDirectory() as directory, \
+                override_settings(FEDERATION_CACHE_BACKEND='sqlite', FEDERATION_CACHE_NAME=f'{directory}/cache'):
+            self.server.get('/authors/1')
+            self.assertTrue(self.server.get('/authors/1').from_cache)
+            federation_cache.clear()
+        self.assertEqual(len(KeepAliveHandler.paths), 1)
+
+
+class FederationCacheTtlTests(TestCase):
+    def test_default_ttls(self):
+        self.assertEqual(get_ttl('http://remote/service/authors/1/posts/2/image'), 3600)
+        self.assertEqual(get_ttl('http://remote/service/authors/1/posts?page=2'), 60)
+        self.assertEqual(get_ttl('http://remote/service/authors/1'), 300)
+        self.assertEqual(get_ttl('http://remote/service/inbox'), 180)
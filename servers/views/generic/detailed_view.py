@@ -3,9 +3,9 @@ from typing import Any, Callable, Optional
 from django.views.generic import DetailView
 from django.http import Http404
 from django.db import models
-from requests import get, Response
+from requests import get, RequestException, Response
 
-from servers.models import Server
+from servers.registry import server_registry
 
 from posts.models import Post
 
@@ -15,16 +15,17 @@ class ServerDetailView(DetailView):
     to_internal: Callable[[Response], Any] = None
 
     def get_object(self, queryset: Optional[models.query.QuerySet] = None) -> Post:
-        servers = Server.objects.all()
         url = self.kwargs['url']
-        for server in servers:
-            if not url.startswith(server.service_address):
-                continue
+        server = server_registry.get_index().by_prefix(url)
+        if server is None:
+            raise Http404
+
+        try:
             # Trim prefix
             resp = server.get(url[len(server.service_address):])
-            try:
-                return self.to_internal(resp)
-            except Exception as err:
-                print(f'Failed to internalize {url}, err: {err.with_traceback(None)}', file=stderr)
-
+            return self.to_internal(resp)
+        except RequestException as err:
+            print(f'Could not fetch {url}, err: {err}', file=stderr)
+        except Exception as err:
+            print(f'Failed to internalize {url}, err: {err.with_traceback(None)}', file=stderr)
         raise Http404
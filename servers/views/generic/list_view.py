@@ -5,6 +5,8 @@ from django.views.generic import ListView
 from django.core.exceptions import ImproperlyConfigured
 
 from servers.models import Server
+from servers.fanout import fetch_all
+from servers.registry import server_registry
 
 
 class ServerListView(ListView):
@@ -23,13 +25,17 @@ class ServerListView(ListView):
         context = super().get_context_data(**kwargs)
         context['object_list'] = [obj for obj in context['object_list']]
 
-        for (server, endpoints) in self.get_server_to_endpoints_mapping():
-            for endpoint in endpoints:
-                try:
-                    resp = server.get(endpoint)
-                    context['object_list'] += self.serialize(resp)
-                except Exception as err:
-                    print(f'Could not serialize {endpoint}, err: {err.with_traceback(None)}', file=stderr)
+        jobs = [(server, endpoint)
+                for (server, endpoints) in self.get_server_to_endpoints_mapping()
+                for endpoint in endpoints]
+        results = fetch_all(jobs)
+        for (server, endpoint, resp) in results:
+            try:
+                context['object_list'] += self.serialize(resp)
+            except Exception as err:
+                print(f'Could not serialize {endpoint}, err: {err.with_traceback(None)}', file=stderr)
+        # Servers that are down or too slow are left out, and the page says so
+        context['unavailable_servers'] = results.unavailable
         return context
 
     # Override this method if there are multiple endpoints to fetch
@@ -38,4 +44,4 @@ class ServerListView(ListView):
             raise ImproperlyConfigured(
                 "No endpoint configured for multi resource list"
             )
-        return [(server, [self.endpoint]) for server in Server.objects.all()]
+        return [(server, [self.endpoint]) for server in server_registry.get_index().servers]
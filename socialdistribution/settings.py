@@ -46,6 +46,7 @@ INSTALLED_APPS = [
     'auth_provider.apps.AuthProviderConfig',
     'follow.apps.FollowConfig',
     'servers.apps.ServersConfig',
+    'stream.apps.StreamConfig',
     'storages'
 ]
 
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'servers.middleware.RequestDeadlineMiddleware',
 ]
 
 ROOT_URLCONF = 'socialdistribution.urls'
@@ -157,6 +159,127 @@ REST_FRAMEWORK = {
     ]
 }
 
+# Cache backend shared by every process for stream pages, e.g. 'django.core.cache.backends.redis.RedisCache' with
+# STREAM_CACHE_LOCATION='redis://localhost:6379'. The stream cache is off without one, see STREAM_CACHE_MAX_ENTRIES
+STREAM_CACHE_BACKEND = os.environ.get('STREAM_CACHE_BACKEND', '')
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'fragments': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'fragments',
+        'OPTIONS': {
+            'MAX_ENTRIES': int(os.environ.get('FRAGMENT_CACHE_MAX_ENTRIES', 5000)),
+        },
+    },
+    # Stream pages and the version stamps that invalidate them, see `stream.cache`. Processes only see each other's
+    # invalidations through this cache, so it is only in memory when nothing else is configured
+    'streams': {
+        'BACKEND': STREAM_CACHE_BACKEND or 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': os.environ.get('STREAM_CACHE_LOCATION', 'streams'),
+        'OPTIONS': {} if STREAM_CACHE_BACKEND else {
+            'MAX_ENTRIES': int(os.environ.get('STREAM_CACHE_MAX_ENTRIES', 1000)),
+        },
+    },
+}
+
+# Cache rendered post cards and comments, see the `cachedfragment` template tag
+FRAGMENT_CACHE_ENABLED = os.environ.get('FRAGMENT_CACHE_ENABLED', 'true').lower() == 'true'
+FRAGMENT_CACHE_ALIAS = 'fragments'
+FRAGMENT_CACHE_TTL = int(os.environ.get('FRAGMENT_CACHE_TTL', 3600))
+
+# Cache stream pages for STREAM_CACHE_TTL seconds, unless STREAM_CACHE_MAX_ENTRIES is 0. It is 0 by default without
+# STREAM_CACHE_BACKEND: with a cache in the memory of each process, the other gunicorn workers and the worker process
+# would keep serving a stream without a new post until it expires. Set it for a single process to cache in memory
+STREAM_CACHE_ALIAS = 'streams'
+STREAM_CACHE_MAX_ENTRIES = int(os.environ.get('STREAM_CACHE_MAX_ENTRIES', 1000 if STREAM_CACHE_BACKEND else 0))
+STREAM_CACHE_TTL = float(os.environ.get('STREAM_CACHE_TTL', 60))
+
+# Base64 encoded images of the image endpoint, stored once per image, and the seconds clients may reuse them for
+# before revalidating
+IMAGE_CACHE_STORAGE = {
+    'BACKEND': 'django.core.files.storage.FileSystemStorage',
+    'OPTIONS': {'location': os.environ.get('IMAGE_CACHE_DIR', BASE_DIR / 'image_cache')},
+}
+IMAGE_CACHE_MAX_AGE = int(os.environ.get('IMAGE_CACHE_MAX_AGE', 3600))
+# Seconds to wait on image URLs linked by posts when checking them, and the seconds the result is cached for when
+# the URL is an image, or when it isn't or could not be reached
+IMAGE_URL_VALIDATION_TIMEOUT = float(os.environ.get('IMAGE_URL_VALIDATION_TIMEOUT', 5))
+IMAGE_URL_CACHE_TTL = int(os.environ.get('IMAGE_URL_CACHE_TTL', 3600))
+IMAGE_URL_NEGATIVE_TTL = int(os.environ.get('IMAGE_URL_NEGATIVE_TTL', 60))
+# Save image posts linking to URLs that were not checked recently as pending, and check them in the background
+IMAGE_URL_VALIDATION_ASYNC = os.environ.get('IMAGE_URL_VALIDATION_ASYNC', 'false').lower() == 'true'
+
+# GitHub activity shown on profiles is read from the database, and refreshed in the background once older than
+# GITHUB_ACTIVITY_REFRESH_INTERVAL seconds
+GITHUB_ACTIVITY_BACKGROUND_REFRESH = os.environ.get('GITHUB_ACTIVITY_BACKGROUND_REFRESH', 'true').lower() == 'true'
+GITHUB_ACTIVITY_REFRESH_INTERVAL = int(os.environ.get('GITHUB_ACTIVITY_REFRESH_INTERVAL', 900))
+GITHUB_REQUEST_TIMEOUT = float(os.environ.get('GITHUB_REQUEST_TIMEOUT', 10))
+
+# Comments embedded in each post of the API, the rest are read from the comments endpoint
+EMBEDDED_COMMENTS_PAGE_SIZE = int(os.environ.get('EMBEDDED_COMMENTS_PAGE_SIZE', 5))
+
+# Federation with other servers
+# Seconds a request may spend waiting on other servers in total, below the 30 second timeout of gunicorn workers
+REQUEST_DEADLINE = float(os.environ.get('REQUEST_DEADLINE', 20))
+# Number of threads used to fetch resources from other servers
+SERVER_FETCH_WORKERS = int(os.environ.get('SERVER_FETCH_WORKERS', 16))
+# Seconds a page may spend waiting on other servers in total
+SERVER_FETCH_PAGE_BUDGET = float(os.environ.get('SERVER_FETCH_PAGE_BUDGET', 5))
+# Seconds each server has to answer before its responses are dropped
+SERVER_FETCH_TIMEOUT = float(os.environ.get('SERVER_FETCH_TIMEOUT', 3))
+# Keep-alive connections kept open to each server, and the seconds a request may take when the caller sets no timeout
+SERVER_SESSION_POOL_SIZE = int(os.environ.get('SERVER_SESSION_POOL_SIZE', 16))
+SERVER_REQUEST_TIMEOUT = float(os.environ.get('SERVER_REQUEST_TIMEOUT', 10))
+# Retries of GET requests that could not connect, timed out or got a 502, 503 or 504, waiting longer after each
+# attempt. Requests made while answering a request are only retried if its deadline leaves time for it
+SERVER_SESSION_RETRIES = int(os.environ.get('SERVER_SESSION_RETRIES', 2))
+SERVER_SESSION_RETRY_BACKOFF = float(os.environ.get('SERVER_SESSION_RETRY_BACKOFF', 0.2))
+# Circuit breaker of each server: out of its last SERVER_BREAKER_WINDOW requests, once at least
+# SERVER_BREAKER_MIN_CALLS were made and SERVER_BREAKER_FAILURE_RATE of them failed (raised, got a 5xx answer or took
+# SERVER_BREAKER_SLOW_CALL seconds or more), the server is skipped for SERVER_BREAKER_OPEN_SECONDS
+SERVER_BREAKER_WINDOW = int(os.environ.get('SERVER_BREAKER_WINDOW', 20))
+SERVER_BREAKER_MIN_CALLS = int(os.environ.get('SERVER_BREAKER_MIN_CALLS', 5))
+SERVER_BREAKER_FAILURE_RATE = float(os.environ.get('SERVER_BREAKER_FAILURE_RATE', 0.5))
+SERVER_BREAKER_SLOW_CALL = float(os.environ.get('SERVER_BREAKER_SLOW_CALL', 2))
+SERVER_BREAKER_OPEN_SECONDS = float(os.environ.get('SERVER_BREAKER_OPEN_SECONDS', 30))
+
+# Cache of the GET responses of other servers, stored in a requests-cache backend: 'memory', 'sqlite' or 'filesystem'
+FEDERATION_CACHE_BACKEND = os.environ.get('FEDERATION_CACHE_BACKEND', 'memory')
+# Path of the sqlite database or of the directory of the filesystem backend
+FEDERATION_CACHE_NAME = os.environ.get('FEDERATION_CACHE_NAME', BASE_DIR / 'federation_cache')
+# Most responses kept by each process, the least recently used are evicted first
+FEDERATION_CACHE_MAX_ENTRIES = int(os.environ.get('FEDERATION_CACHE_MAX_ENTRIES', 2000))
+# Seconds responses stay fresh, from the first pattern matching their URL. Responses are not cached for 0 seconds
+FEDERATION_CACHE_TTLS = [
+    (r'/image/?(\?|$)', int(os.environ.get('FEDERATION_CACHE_IMAGE_TTL', 3600))),
+    (r'/posts', int(os.environ.get('FEDERATION_CACHE_POSTS_TTL', 60))),
+    (r'/authors', int(os.environ.get('FEDERATION_CACHE_AUTHORS_TTL', 300))),
+]
+FEDERATION_CACHE_DEFAULT_TTL = int(os.environ.get('FEDERATION_CACHE_DEFAULT_TTL', 180))
+# Seconds after going stale that a response is still returned, while it is fetched again in the background
+FEDERATION_CACHE_STALE_WHILE_REVALIDATE = int(os.environ.get('FEDERATION_CACHE_STALE_WHILE_REVALIDATE', 60))
+# Seconds each process may route URLs with its copy of the servers before reading them again. Changes made in the
+# same process, or in any process when the default cache is shared, are seen immediately
+SERVER_REGISTRY_TTL = float(os.environ.get('SERVER_REGISTRY_TTL', 60))
+# Profiles of authors on other servers kept in memory by each process, the seconds they stay valid for, and the
+# seconds before an author that could not be loaded is requested again
+REMOTE_AUTHOR_CACHE_MAX_ENTRIES = int(os.environ.get('REMOTE_AUTHOR_CACHE_MAX_ENTRIES', 5000))
+REMOTE_AUTHOR_CACHE_TTL = float(os.environ.get('REMOTE_AUTHOR_CACHE_TTL', 300))
+REMOTE_AUTHOR_NEGATIVE_TTL = float(os.environ.get('REMOTE_AUTHOR_NEGATIVE_TTL', 30))
+# Seconds between two runs of `sync_remote_posts --loop`
+REMOTE_SYNC_INTERVAL = float(os.environ.get('REMOTE_SYNC_INTERVAL', 300))
+# Seconds a single server sync may spend fetching posts, shared by all the pages it reads
+REMOTE_SYNC_BUDGET = float(os.environ.get('REMOTE_SYNC_BUDGET', 120))
+# Posts requested per page, and the most pages read per author in a single sync
+REMOTE_SYNC_PAGE_SIZE = int(os.environ.get('REMOTE_SYNC_PAGE_SIZE', 50))
+REMOTE_SYNC_MAX_PAGES = int(os.environ.get('REMOTE_SYNC_MAX_PAGES', 20))
+# Seconds between two syncs of an author that read every post instead of stopping at the posts already stored, to
+# pick up the posts edited, hidden or deleted since
+REMOTE_SYNC_FULL_INTERVAL = float(os.environ.get('REMOTE_SYNC_FULL_INTERVAL', 3600))
+
 if os.environ.get('DATABASE_URL'):
     # Heroku environment
     import django_heroku  # noqa
@@ -10,6 +10,31 @@ class FastTestRunner(DiscoverRunner):
         # Don't write files
         settings.DEFAULT_FILE_STORAGE = 'inmemorystorage.InMemoryStorage'
 
+        # Always render templates, the ids of objects get reused between tests
+        settings.FRAGMENT_CACHE_ENABLED = False
+
+        # Nor stream pages, for the same reason
+        settings.STREAM_CACHE_MAX_ENTRIES = 0
+
+        # Nor remote authors, the responses of other servers are mocked differently by each test
+        settings.REMOTE_AUTHOR_CACHE_MAX_ENTRIES = 0
+
+        # Nor checks of linked images, tests mock them differently
+        settings.IMAGE_URL_CACHE_TTL = 0
+        settings.IMAGE_URL_NEGATIVE_TTL = 0
+
+        # Don't call GitHub from background threads, tests refresh the activity themselves
+        settings.GITHUB_ACTIVITY_BACKGROUND_REFRESH = False
+
+        # Read the servers on every lookup, tests patch `Server.objects`
+        settings.SERVER_REGISTRY_TTL = 0
+
+        # Don't write the responses of other servers to disk either
+        settings.FEDERATION_CACHE_BACKEND = 'memory'
+
+        # Nor encoded images
+        settings.IMAGE_CACHE_STORAGE = {'BACKEND': 'inmemorystorage.InMemoryStorage', 'OPTIONS': {}}
+
         # Bonus: Use a faster password hasher for creating users fast
         settings.PASSWORD_HASHERS = (
             'django.contrib.auth.hashers.MD5PasswordHasher',
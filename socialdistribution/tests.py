@@ -1,7 +1,7 @@
 import json
-from unittest.mock import MagicMock, patch
-from requests import Response
+from unittest.mock import patch
 from django.test import TestCase, Client
+from django.utils import timezone
 from django.urls import reverse_lazy
 from django.contrib.auth import get_user_model
 from api.tests.constants import SAMPLE_REMOTE_POSTS
@@ -9,8 +9,7 @@ from api.tests.test_api import TEST_PASSWORD, TEST_USERNAME
 
 from posts.models import Post
 from posts.tests.constants import POST_DATA
-from servers.models import Server
-from socialdistribution.views import StreamView
+from servers.models import Server, RemotePost
 from follow.models import Follow
 
 
@@ -58,29 +57,44 @@ class StreamViewTests(TestCase):
         self.assertContains(res, self.user.get_full_name())
 
     def test_displays_remote_posts(self):
-        mock_json_response = json.loads(SAMPLE_REMOTE_POSTS)
-        mock_response = Response()
-        mock_response.url = 'http://localhost:5555/api/v2/authors/1/posts'
-        mock_response.json = MagicMock(return_value=mock_json_response)
-
-        mock_server = Server(
+        server = Server.objects.create(
             service_address="http://localhost:5555/api/v2",
             username="hello",
             password="no",
         )
-        mock_server.get = MagicMock(return_value=mock_response)
-
-        with patch.object(StreamView, 'get_server_to_endpoints_mapping') as mock_get_server_to_endpoints_mapping:
-            mock_server_to_endpoints_mapping = [(mock_server, ['/authors/1/posts'])]
-            mock_get_server_to_endpoints_mapping.return_value = mock_server_to_endpoints_mapping
-            with patch('servers.models.Server.objects') as MockServerObjects:
-                MockServerObjects.all.return_value = [mock_server]
-
-                self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
-                res = self.client.get(reverse_lazy('stream'))
-                self.assertEqual(res.status_code, 200)
-
-                self.assertContains(res, mock_json_response[0]['title'])
+        remote_post = json.loads(SAMPLE_REMOTE_POSTS)[0]
+        RemotePost.objects.create(
+            server=server,
+            url=remote_post['id'],
+            author_url=remote_post['author']['url'],
+            author_name=remote_post['author']['display_name'],
+            title=remote_post['title'],
+            content_type=remote_post['content_type'],
+            content=remote_post['content'],
+            date_published=timezone.now())
+
+        with patch.object(Server, 'get') as mock_get:
+            self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+            res = self.client.get(reverse_lazy('stream'))
+            self.assertEqual(res.status_code, 200)
+            mock_get.assert_not_called()
+
+        self.assertContains(res, remote_post['title'])
+        self.assertContains(res, remote_post['author']['display_name'])
+        self.assertNotContains(res, 'Some servers are unavailable')
+
+    def test_marks_servers_that_failed_to_sync(self):
+        server = Server.objects.create(
+            service_address="http://localhost:5555/api/v2",
+            username="hello",
+            password="no",
+            last_sync_status=Server.SyncStatus.FAILED,
+        )
+        self.client.login(username=TEST_USERNAME, password=TEST_PASSWORD)
+        res = self.client.get(reverse_lazy('stream'))
+        self.assertEqual(res.context['unavailable_servers'], [server])
+        self.assertContains(res, 'Some servers are unavailable')
+        self.assertContains(res, server.service_address)
 
     def test_includes_friends_only_posts(self):
         public_post_count = len(Post.objects.filter(visibility=Post.Visibility.PUBLIC, unlisted=False))
@@ -25,6 +25,7 @@ from . import views
 urlpatterns = [
     path('', views.root),
     path('stream/', views.StreamView.as_view(), name='stream'),
+    path('metrics/', views.metrics, name='metrics'),
     path('posts/', include('posts.urls')),
     path('follow/', include('follow.urls')),
     path('admin/', admin.site.urls),
@@ -1,18 +1,18 @@
-from sys import stderr
-from typing import Any
+from typing import Any, Optional
 from django.urls import reverse_lazy, reverse
-from django.http import HttpRequest, HttpResponse
+from django.http import Http404, HttpRequest, HttpResponse, JsonResponse
 from django.shortcuts import redirect
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import QuerySet
-from requests import Response
-import urllib.parse
-from dateutil import parser
+from django.views.generic import ListView
 
+from lib.metrics import get_metrics
 from posts.models import Post
-from servers.views.generic.list_view import ServerListView
-from servers.models import Server
-from follow.models import Follow
+from servers.fanout import get_unavailable_servers
+from servers.models import RemotePost
+from stream.cache import CachedPage, stream_cache
+from stream.pagination import LOCAL, REMOTE, Cursor, StreamSource, paginate_stream
+from stream.timeline import get_timeline_sources
 
 
 def root(request: HttpRequest) -> HttpResponse:
@@ -21,76 +21,61 @@ def root(request: HttpRequest) -> HttpResponse:
     return redirect(reverse('stream'))
 
 
-class StreamView(LoginRequiredMixin, ServerListView):
+@staff_member_required
+def metrics(request: HttpRequest) -> HttpResponse:
+    return JsonResponse(get_metrics())
+
+
+class StreamView(LoginRequiredMixin, ListView):
     model = Post
-    paginate_by = 10
+    page_size = 10
     template_name = 'stream.html'
 
-    def get_queryset(self) -> QuerySet[Post]:
-        public_posts = Post.objects.filter(visibility=Post.Visibility.PUBLIC, unlisted=False)
-        query_set = public_posts
-        for friend in Follow.objects.followers(self.request.user):
-            query_set = query_set.union(friend.post_set.filter(visibility=Post.Visibility.FRIENDS, unlisted=False))
-        return query_set.order_by('-date_published')
-
-    def get_server_to_endpoints_mapping(self) -> list[tuple[Server, list[str]]]:
-        server_endpoints_tuples = []
-        for server in Server.objects.all():
-            resp = server.get('/authors')
-            if resp.status_code != 200:
-                print(
-                    f'Request to {server.service_address}/authors failed with status code {resp.status_code}',
-                    file=stderr)
-                continue
-            authors_endpoint = server.service_address + '/authors/'
-            try:
-                authors = resp.json()['items']
-            except Exception as e:
-                print(e, file=stderr)
-                continue
-            endpoints = []
-            for author in authors:
-                # TODO: Update this to author_url once our groupmates are ready (have the URL field)
-                author_id = author['id']
-                if isinstance(author_id, str) and author_id.startswith(authors_endpoint):
-                    author_id = author_id[len(authors_endpoint):]
-                authors_posts = f'/authors/{author_id}/posts'
-                endpoints.append(authors_posts)
-            server_endpoints_tuples.append((server, endpoints))
-        return server_endpoints_tuples
+    def get_sources(self) -> list[StreamSource]:
+        return get_timeline_sources(self.request.user) + [
+            # Remote posts are synced in the background by the `sync_remote_posts` command
+            StreamSource(REMOTE, RemotePost.objects.order_by('-date_published', '-id')),
+        ]
 
-    def serialize(self, response: Response) -> list:
-        json_response = response.json()
+    def get_cursor(self):
+        cursor = self.request.GET.get('cursor')
+        if not cursor:
+            return None
+        try:
+            return Cursor.decode(cursor)
+        except ValueError:
+            raise Http404('Invalid cursor')
 
-        def to_internal(representation: dict[str, Any]):
-            request_url = response.url
-            if not request_url.endswith('/'):
-                request_url += '/'
-            # TODO: Update this to source or origin
-            post_url = urllib.parse.urljoin(request_url, str(representation['id']))
-            absolute_url = reverse('posts:remote-detail', kwargs={'url': post_url})
-            return {
-                'title': representation.get('title'),
-                'description': representation.get('description'),
-                'content_type': representation.get('contentType') or representation.get('content_type'),
-                'content': representation.get('content'),
-                'date_published': representation.get('published'),
-                'get_absolute_url': absolute_url,
-                'author': {
-                    'get_full_name': '' if isinstance(
-                        representation.get('author'),
-                        str) else representation.get('author').get('displayName') or representation.get('author').get('display_name')}}
+    def get_cached_posts(self, page: CachedPage) -> Optional[list]:
+        ids = {LOCAL: [], REMOTE: []}
+        for (origin, id) in page.items:
+            ids[origin].append(id)
+        objects = {
+            LOCAL: Post.objects.select_related('author', 'original_author').in_bulk(ids[LOCAL]),
+            REMOTE: RemotePost.objects.in_bulk(ids[REMOTE]),
+        }
+        try:
+            return [objects[origin][id] for (origin, id) in page.items]
+        except KeyError:
+            return None
 
-        # TODO: Remove this if group 13 implements placing posts under items
-        if isinstance(json_response, list):
-            return [to_internal(post) for post in json_response]
+    def get_queryset(self) -> list:
+        cursor = self.get_cursor()
+        cache_key = stream_cache.get_key(self.request.user.id, cursor.encode() if cursor else None)
+        page = stream_cache.get(cache_key)
+        posts = self.get_cached_posts(page) if page is not None else None
+        if posts is not None:
+            self.next_cursor = page.next_cursor
+            return posts
 
-        return [to_internal(post) for post in json_response['items']]
+        posts, self.next_cursor = paginate_stream(self.get_sources(), cursor, self.page_size)
+        items = [(REMOTE if isinstance(post, RemotePost) else LOCAL, post.id) for post in posts]
+        stream_cache.set(cache_key, CachedPage(items, self.next_cursor))
+        return posts
 
     def get_context_data(self, **kwargs: Any) -> dict[str, Any]:
         context = super().get_context_data(**kwargs)
-        context['object_list'] = sorted(
-            context['object_list'], key=lambda x:
-                x.date_published if isinstance(
-                x, Post) else parser.parse(x['date_published']), reverse=True)
+        context['next_cursor'] = self.next_cursor.encode() if self.next_cursor else None
+        # Remote posts come from the last sync, so a server that is down shows up as out of date
+        context['unavailable_servers'] = get_unavailable_servers()
         return context
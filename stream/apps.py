@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class StreamConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'stream'
+
+    def ready(self):
+        # Connect the timeline fan-out receivers
+        from stream import signals  # noqa
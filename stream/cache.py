@@ -0,0 +1,80 @@
+from typing import Iterable, NamedTuple, Optional
+from uuid import uuid4
+from django.conf import settings
+from django.core.cache import caches
+
+from lib import metrics
+from stream.pagination import Cursor
+
+# Version stamp shared by every stream, and the one of each user's stream
+VERSION_KEY = 'stream:version'
+USER_VERSION_KEY = 'stream:version:{}'
+
+
+class CachedPage(NamedTuple):
+    # (origin, id) of each item on the page
+    items: list[tuple[str, int]]
+    next_cursor: Optional[Cursor]
+
+
+class StreamCache:
+    """
+    Cache of stream pages, keyed by user and cursor, in the `STREAM_CACHE_ALIAS` cache.
+
+    Page keys contain a version stamp shared by every stream and one of the user's stream. The signal receivers in
+    `stream.signals` replace these stamps when pages may have changed, so every process using the same cache stops
+    reading the old pages. Pages also expire after `STREAM_CACHE_TTL` seconds.
+    """
+
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+
+    @property
+    def cache(self):
+        return caches[settings.STREAM_CACHE_ALIAS]
+
+    def get_key(self, user_id: int, cursor: Optional[str]) -> str:
+        """
+        Returns the key of the page of `user_id` at `cursor`. Take it before reading the stream, so a page read before
+        an invalidation isn't stored under the new version.
+        """
+        user_key = USER_VERSION_KEY.format(user_id)
+        versions = self.cache.get_many([VERSION_KEY, user_key])
+        # A missing stamp (never set, or evicted) gets a new value, so pages stored before can't come back
+        missing = {key: uuid4().hex for key in (VERSION_KEY, user_key) if key not in versions}
+        if missing:
+            self.cache.set_many(missing, None)
+            versions.update(missing)
+        return f'stream:page:{versions[VERSION_KEY]}:{versions[user_key]}:{user_id}:{cursor or ""}'
+
+    def get(self, key: str) -> Optional[CachedPage]:
+        page = self.cache.get(key)
+        if page is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return page
+
+    def set(self, key: str, page: CachedPage):
+        if settings.STREAM_CACHE_MAX_ENTRIES <= 0:
+            return
+        self.cache.set(key, page, settings.STREAM_CACHE_TTL)
+
+    def invalidate_users(self, user_ids: Iterable[int]):
+        self.cache.set_many({USER_VERSION_KEY.format(user_id): uuid4().hex for user_id in user_ids}, None)
+
+    def clear(self):
+        self.cache.set(VERSION_KEY, uuid4().hex, None)
+
+    def stats(self) -> dict:
+        return {
+            'backend': settings.CACHES[settings.STREAM_CACHE_ALIAS]['BACKEND'],
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': metrics.hit_rate(self.hits, self.misses),
+        }
+
+
+stream_cache = StreamCache()
+metrics.register('stream_cache', stream_cache.stats)
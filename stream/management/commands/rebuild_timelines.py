@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.contrib.auth import get_user_model
+
+from stream.timeline import rebuild_public_timeline, rebuild_timeline
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds the materialized stream timelines from the existing posts and follows'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', action='append', default=[], help='Only rebuild the timeline of this username')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        users = get_user_model().objects.all()
+        if options['user']:
+            users = users.filter(username__in=options['user'])
+        else:
+            rebuild_public_timeline(batch_size=options['batch_size'])
+            self.stdout.write('Rebuilt public timeline')
+
+        for user in users.iterator():
+            rebuild_timeline(user)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {users.count()} timeline(s)'))
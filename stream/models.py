@@ -0,0 +1,35 @@
+from django.db import models
+from django.contrib.auth import get_user_model
+
+from posts.models import Post
+
+
+class TimelineEntryManager(models.Manager):
+    def ordered(self):
+        return self.select_related('post', 'post__author', 'post__original_author') \
+            .order_by('-date_published', '-post_id')
+
+    def shared(self):
+        # Entries without a user are shared by every timeline (e.g. public posts)
+        return self.ordered().filter(user__isnull=True)
+
+    def of_user(self, user):
+        # Each of these is read in order from `timeline_user_published_idx`, an OR of both would be sorted in full
+        return self.ordered().filter(user=user)
+
+
+class TimelineEntry(models.Model):
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, null=True, blank=True)
+    post = models.ForeignKey(Post, on_delete=models.CASCADE)
+    # Copied from the post so the timeline can be read in index order without a join
+    date_published = models.DateTimeField()
+    objects = TimelineEntryManager()
+
+    class Meta:
+        unique_together = ('user', 'post')
+        indexes = [
+            models.Index(fields=['user', '-date_published', '-post'], name='timeline_user_published_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.post} on the timeline of {self.user or "everyone"}'
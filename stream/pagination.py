@@ -0,0 +1,113 @@
+import json
+import heapq
+import base64
+import binascii
+from datetime import datetime
+from itertools import islice
+from operator import attrgetter
+from typing import Any, Callable, Iterator, NamedTuple, Optional
+from django.db.models import Model, Q, QuerySet
+
+LOCAL = 'local'
+REMOTE = 'remote'
+
+# Position of each origin among items published at the same time, in stream order
+ORIGIN_RANKS = {REMOTE: 0, LOCAL: 1}
+
+
+class Cursor(NamedTuple):
+    """
+    Position of an item in the stream. The stream is ordered by `published`, then `origin`, then `id`, newest first.
+    """
+    published: datetime
+    origin: str
+    id: int
+
+    def sort_key(self) -> tuple:
+        return (self.published, -ORIGIN_RANKS[self.origin], self.id)
+
+    def encode(self) -> str:
+        value = json.dumps([self.published.isoformat(), self.origin, self.id])
+        return base64.urlsafe_b64encode(value.encode('utf-8')).decode('ascii')
+
+    @staticmethod
+    def decode(value: str) -> 'Cursor':
+        """
+        Raises `ValueError` if `value` is not a cursor
+        """
+        try:
+            published, origin, id = json.loads(base64.urlsafe_b64decode(value.encode('ascii')))
+            cursor = Cursor(datetime.fromisoformat(published), origin, int(id))
+        except (binascii.Error, UnicodeError, TypeError, ValueError) as e:
+            raise ValueError(f'Invalid cursor {value}') from e
+        if cursor.origin not in ORIGIN_RANKS:
+            raise ValueError(f'Invalid cursor {value}')
+        return cursor
+
+
+class StreamItem:
+    """
+    An object shown in the stream, with its position computed once
+    """
+    __slots__ = ('key', 'cursor', 'obj')
+
+    def __init__(self, cursor: Cursor, obj: Any):
+        self.key = cursor.sort_key()
+        self.cursor = cursor
+        self.obj = obj
+
+
+class StreamSource:
+    """
+    An ordered source of stream items.
+
+    `queryset` must be ordered by `published_field` then `id_field`, newest first. `to_item` maps a row of `queryset`
+    to the object shown in the stream.
+    """
+
+    def __init__(self, origin: str, queryset: QuerySet, published_field: str = 'date_published',
+                 id_field: str = 'id', to_item: Callable[[Model], Any] = lambda row: row):
+        self.origin = origin
+        self.queryset = queryset
+        self.published_field = published_field
+        self.id_field = id_field
+        self.to_item = to_item
+
+    def after(self, cursor: Optional[Cursor]) -> QuerySet:
+        """
+        Returns the rows that come after `cursor` in the stream
+        """
+        if cursor is None:
+            return self.queryset
+        published_before = Q(**{f'{self.published_field}__lt': cursor.published})
+        published_at_or_before = Q(**{f'{self.published_field}__lte': cursor.published})
+        if self.origin == cursor.origin:
+            # The redundant bound lets the database seek its index to the cursor instead of skipping newer rows
+            return self.queryset.filter(published_at_or_before).filter(
+                published_before | Q(**{f'{self.id_field}__lt': cursor.id}))
+        if ORIGIN_RANKS[self.origin] > ORIGIN_RANKS[cursor.origin]:
+            return self.queryset.filter(published_at_or_before)
+        return self.queryset.filter(published_before)
+
+    def items_after(self, cursor: Optional[Cursor], limit: int) -> Iterator[StreamItem]:
+        for row in self.after(cursor)[:limit]:
+            yield StreamItem(
+                Cursor(getattr(row, self.published_field), self.origin, getattr(row, self.id_field)),
+                self.to_item(row))
+
+
+def paginate_stream(sources: list[StreamSource], cursor: Optional[Cursor],
+                    page_size: int) -> tuple[list[Any], Optional[Cursor]]:
+    """
+    Returns the `page_size` items that come after `cursor` across all `sources`, and the cursor of the next page if
+    there is one.
+
+    Every source is already in stream order, so they are merged lazily and at most `page_size + 1` rows are read
+    from each of them.
+    """
+    streams = [source.items_after(cursor, page_size + 1) for source in sources]
+    merged = heapq.merge(*streams, key=attrgetter('key'), reverse=True)
+    page = list(islice(merged, page_size + 1))
+
+    next_cursor = page[page_size - 1].cursor if len(page) > page_size else None
+    return [item.obj for item in page[:page_size]], next_cursor
@@ -0,0 +1,47 @@
+from typing import Iterable, Optional
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from follow.models import Follow
+from posts.models import Post
+from servers.models import RemotePost
+from stream import timeline
+from stream.cache import stream_cache
+
+
+def invalidate_streams(user_ids: Iterable[Optional[int]]):
+    user_ids = set(user_ids)
+    if None in user_ids:
+        stream_cache.clear()
+        return
+    stream_cache.invalidate_users(user_ids)
+
+
+@receiver(post_save, sender=Post)
+def on_post_save(sender, instance: Post, **kwargs):
+    invalidate_streams(timeline.fan_out_post(instance))
+
+
+# Deleting a post removes its timeline entries through the foreign key cascade
+@receiver(post_delete, sender=Post)
+def on_post_delete(sender, instance: Post, **kwargs):
+    invalidate_streams(timeline.get_post_audience(instance))
+
+
+@receiver(post_save, sender=Follow)
+def on_follow_save(sender, instance: Follow, created: bool, **kwargs):
+    if created:
+        timeline.add_follow(follower_id=instance.follower_id, followee_id=instance.followee_id)
+    invalidate_streams([instance.follower_id, instance.followee_id])
+
+
+@receiver(post_delete, sender=Follow)
+def on_follow_delete(sender, instance: Follow, **kwargs):
+    timeline.remove_follow(follower_id=instance.follower_id, followee_id=instance.followee_id)
+    invalidate_streams([instance.follower_id, instance.followee_id])
+
+
+@receiver(post_save, sender=RemotePost)
+@receiver(post_delete, sender=RemotePost)
+def on_remote_post_change(sender, instance: RemotePost, **kwargs):
+    stream_cache.clear()
@@ -0,0 +1,338 @@
+from io import StringIO
+from datetime import timedelta
+from unittest import skipUnless
+from unittest.mock import MagicMock
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.contrib.auth import get_user_model
+from django.urls import reverse
+from django.utils import timezone
+
+from follow.models import Follow
+from posts.models import Post
+from posts.tests.constants import POST_DATA
+from servers.models import RemotePost, Server
+from socialdistribution.views import StreamView
+from stream import timeline
+from stream.cache import USER_VERSION_KEY, CachedPage, StreamCache, stream_cache
+from stream.models import TimelineEntry
+from stream.pagination import LOCAL, REMOTE, Cursor, StreamSource, paginate_stream
+
+
+def create_post(author, visibility=Post.Visibility.PUBLIC, unlisted=False) -> Post:
+    return Post.objects.create(
+        title=POST_DATA['title'],
+        description=POST_DATA['description'],
+        content_type=POST_DATA['content_type'],
+        content=POST_DATA['content'],
+        author_id=author.id,
+        visibility=visibility,
+        unlisted=unlisted)
+
+
+class TimelineFanOutTests(TestCase):
+    def setUp(self) -> None:
+        self.bob = get_user_model().objects.create_user(username='bob', password='password')
+        self.alice = get_user_model().objects.create_user(username='alice', password='password')
+
+    def timeline(self, user) -> list[Post]:
+        posts, _ = paginate_stream(timeline.get_timeline_sources(user), None, 100)
+        return posts
+
+    def test_public_post_is_shared(self):
+        post = create_post(self.alice)
+        self.assertEqual(self.timeline(self.bob), [post])
+        self.assertEqual(self.timeline(self.alice), [post])
+        self.assertEqual(TimelineEntry.objects.filter(post=post).count(), 1)
+
+    def test_unlisted_post_is_not_shared(self):
+        create_post(self.alice, unlisted=True)
+        self.assertEqual(self.timeline(self.bob), [])
+
+    def test_friends_post_follows_the_graph(self):
+        post = create_post(self.alice, visibility=Post.Visibility.FRIENDS)
+        self.assertEqual(self.timeline(self.bob), [])
+
+        follow = Follow.objects.create(follower=self.alice, followee=self.bob)
+        self.assertEqual(self.timeline(self.bob), [post])
+
+        follow.delete()
+        self.assertEqual(self.timeline(self.bob), [])
+
+    def test_visibility_change_updates_entries(self):
+        post = create_post(self.alice)
+        post.unlisted = True
+        post.save()
+        self.assertEqual(self.timeline(self.bob), [])
+
+    def test_delete_post_removes_entries(self):
+        create_post(self.alice).delete()
+        self.assertEqual(TimelineEntry.objects.count(), 0)
+
+    def test_ordered_newest_first(self):
+        posts = [create_post(self.alice) for _ in range(3)]
+        self.assertEqual(self.timeline(self.bob), list(reversed(posts)))
+
+    def test_rebuild_command(self):
+        public_post = create_post(self.alice)
+        friends_post = create_post(self.alice, visibility=Post.Visibility.FRIENDS)
+        Follow.objects.create(follower=self.alice, followee=self.bob)
+        TimelineEntry.objects.all().delete()
+
+        call_command('rebuild_timelines', stdout=StringIO())
+        self.assertEqual(set(self.timeline(self.bob)), {public_post, friends_post})
+        self.assertEqual(self.timeline(self.alice), [public_post])
+
+
+class VisiblePostsTests(TestCase):
+    def setUp(self) -> None:
+        self.bob = get_user_model().objects.create_user(username='bob', password='password')
+
+    def add_followers(self, count: int) -> list[Post]:
+        """Adds `count` followers of bob, each with a friends-only post."""
+        first = Follow.objects.filter(followee=self.bob).count()
+        posts = []
+        for i in range(first, first + count):
+            follower = get_user_model().objects.create_user(username=f'follower_{i}', password='password')
+            Follow.objects.create(follower=follower, followee=self.bob)
+            posts.append(create_post(follower, visibility=Post.Visibility.FRIENDS))
+        return posts
+
+    def test_visible_posts(self):
+        alice = get_user_model().objects.create_user(username='alice', password='password')
+        public_post = create_post(alice)
+        create_post(alice, unlisted=True)
+        create_post(alice, visibility=Post.Visibility.FRIENDS)
+        friends_posts = self.add_followers(2)
+        create_post(self.bob, visibility=Post.Visibility.FRIENDS, unlisted=True)
+
+        expected = {public_post, *friends_posts}
+        self.assertEqual(set(Post.objects.visible_to(self.bob)), expected)
+        self.assertEqual({entry.post for entry in TimelineEntry.objects.of_user(self.bob)}, {*friends_posts})
+        self.assertEqual({entry.post for entry in TimelineEntry.objects.shared()}, {public_post})
+
+    def test_sql_does_not_grow_with_followers(self):
+        def rebuild_queries() -> list[str]:
+            with CaptureQueriesContext(connection) as context:
+                timeline.rebuild_timeline(self.bob)
+            return [query['sql'] for query in context.captured_queries if query['sql'].startswith('SELECT')]
+
+        self.add_followers(1)
+        few_sql = str(Post.objects.visible_to(self.bob).query)
+        few_queries = rebuild_queries()
+
+        posts = self.add_followers(30)
+        self.assertEqual(len(str(Post.objects.visible_to(self.bob).query)), len(few_sql))
+        many_queries = rebuild_queries()
+        self.assertEqual([len(sql) for sql in many_queries], [len(sql) for sql in few_queries])
+        self.assertEqual(TimelineEntry.objects.filter(user=self.bob).count(), len(posts) + 1)
+
+
+class StreamPaginationTests(TestCase):
+    def setUp(self) -> None:
+        self.bob = get_user_model().objects.create_user(username='bob', password='password')
+        self.server = Server.objects.create(service_address='http://remote/api', username='hello', password='no')
+        self.client.login(username='bob', password='password')
+
+    def create_remote_post(self, date_published) -> RemotePost:
+        return RemotePost.objects.create(
+            server=self.server,
+            url=f'http://remote/api/authors/1/posts/{RemotePost.objects.count()}',
+            title='Remote post',
+            date_published=date_published)
+
+    def read_stream(self) -> list:
+        items = []
+        cursor = None
+        while True:
+            res = self.client.get(reverse('stream'), {'cursor': cursor} if cursor else {})
+            self.assertEqual(res.status_code, 200)
+            self.assertLessEqual(len(res.context['object_list']), StreamView.page_size)
+            items += res.context['object_list']
+            cursor = res.context['next_cursor']
+            if cursor is None:
+                return items
+
+    def test_pages_cover_the_stream_once(self):
+        local_posts = [create_post(self.bob) for _ in range(15)]
+        remote_posts = [self.create_remote_post(timezone.now() - timedelta(minutes=i)) for i in range(8)]
+
+        items = self.read_stream()
+        self.assertEqual(len(items), len(local_posts) + len(remote_posts))
+        self.assertEqual(set(items), set(local_posts) | set(remote_posts))
+        self.assertEqual(items, sorted(items, key=lambda item: item.date_published, reverse=True))
+
+    def test_ties_are_broken_by_origin_and_id(self):
+        published = timezone.now()
+        remote_posts = [self.create_remote_post(published) for _ in range(12)]
+        local_posts = [create_post(self.bob) for _ in range(12)]
+        TimelineEntry.objects.update(date_published=published)
+
+        items = self.read_stream()
+        self.assertEqual(items, list(reversed(remote_posts)) + list(reversed(local_posts)))
+
+    def test_cursor_is_stable_when_new_posts_arrive(self):
+        for _ in range(15):
+            create_post(self.bob)
+        first_page = self.client.get(reverse('stream'))
+        cursor = first_page.context['next_cursor']
+        second_page = list(self.client.get(reverse('stream'), {'cursor': cursor}).context['object_list'])
+
+        create_post(self.bob)
+        self.assertEqual(list(self.client.get(reverse('stream'), {'cursor': cursor}).context['object_list']),
+                         second_page)
+
+    def test_reads_one_page_from_each_source(self):
+        for _ in range(30):
+            create_post(self.bob)
+            self.create_remote_post(timezone.now())
+        with CaptureQueriesContext(connection) as queries:
+            posts, _ = paginate_stream(StreamView(request=MagicMock(user=self.bob)).get_sources(), None, 10)
+        self.assertEqual(len(posts), 10)
+        stream_queries = [query['sql'] for query in queries if 'LIMIT 11' in query['sql']]
+        self.assertEqual(len(stream_queries), 3)
+
+    @skipUnless(connection.vendor == 'sqlite', 'Query plans depend on the database')
+    def test_pages_seek_each_source(self):
+        posts = [create_post(self.bob) for _ in range(3)]
+        cursor = Cursor(posts[1].date_published, LOCAL, posts[1].id)
+        for source in StreamView(request=MagicMock(user=self.bob)).get_sources():
+            plan = source.after(cursor)[:StreamView.page_size + 1].explain()
+            self.assertIn('date_published<?', plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+            if source.origin == LOCAL:
+                self.assertIn('timeline_user_published_idx', plan)
+
+    def test_invalid_cursor(self):
+        res = self.client.get(reverse('stream'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(res.status_code, 404)
+
+    def test_merges_many_sources(self):
+        other_server = Server.objects.create(service_address='http://other/api', username='hello', password='no')
+        posts = [create_post(self.bob) for _ in range(5)]
+        for i in range(10):
+            post = self.create_remote_post(timezone.now() - timedelta(minutes=i))
+            post.server = other_server if i % 2 else self.server
+            post.save()
+            posts.append(post)
+
+        sources = timeline.get_timeline_sources(self.bob)
+        sources += [StreamSource(REMOTE, RemotePost.objects.filter(server=server).order_by('-date_published', '-id'))
+                    for server in [self.server, other_server]]
+
+        items = []
+        cursor = None
+        while True:
+            page, cursor = paginate_stream(sources, cursor, 4)
+            items += page
+            if cursor is None:
+                break
+        self.assertEqual(set(items), set(posts))
+        self.assertEqual(len(items), len(posts))
+        self.assertEqual(items, sorted(items, key=lambda item: item.date_published, reverse=True))
+
+
+@override_settings(STREAM_CACHE_MAX_ENTRIES=100, STREAM_CACHE_TTL=60)
+class StreamCacheTests(TestCase):
+    def setUp(self) -> None:
+        caches[settings.STREAM_CACHE_ALIAS].clear()
+        self.cache = StreamCache()
+
+    def test_hits_and_misses(self):
+        key = self.cache.get_key(1, None)
+        self.assertIsNone(self.cache.get(key))
+        self.cache.set(key, CachedPage([(LOCAL, 1)], None))
+        self.assertEqual(self.cache.get(self.cache.get_key(1, None)).items, [(LOCAL, 1)])
+        self.assertEqual(self.cache.stats()['hits'], 1)
+        self.assertEqual(self.cache.stats()['misses'], 1)
+        self.assertEqual(self.cache.stats()['hit_rate'], 0.5)
+
+    def test_invalidate_users(self):
+        self.cache.set(self.cache.get_key(1, None), CachedPage([], None))
+        self.cache.set(self.cache.get_key(1, 'cursor'), CachedPage([], None))
+        self.cache.set(self.cache.get_key(2, None), CachedPage([], None))
+        self.cache.invalidate_users([1])
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, None)))
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, 'cursor')))
+        self.assertIsNotNone(self.cache.get(self.cache.get_key(2, None)))
+
+    def test_clear(self):
+        self.cache.set(self.cache.get_key(1, None), CachedPage([], None))
+        self.cache.clear()
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, None)))
+
+    def test_invalidation_reaches_other_processes(self):
+        # Each process has its own `StreamCache`, sharing the configured cache
+        other = StreamCache()
+        other.set(other.get_key(1, None), CachedPage([], None))
+        self.cache.invalidate_users([1])
+        self.assertIsNone(other.get(other.get_key(1, None)))
+
+    def test_page_read_before_invalidation_is_not_stored(self):
+        key = self.cache.get_key(1, None)
+        self.cache.invalidate_users([1])
+        self.cache.set(key, CachedPage([], None))
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, None)))
+
+    def test_evicted_version_does_not_bring_back_pages(self):
+        self.cache.set(self.cache.get_key(1, None), CachedPage([], None))
+        caches[settings.STREAM_CACHE_ALIAS].delete(USER_VERSION_KEY.format(1))
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, None)))
+
+    @override_settings(STREAM_CACHE_TTL=0)
+    def test_expires(self):
+        self.cache.set(self.cache.get_key(1, None), CachedPage([], None))
+        self.assertIsNone(self.cache.get(self.cache.get_key(1, None)))
+
+
+@override_settings(STREAM_CACHE_MAX_ENTRIES=100)
+class StreamViewCacheTests(TestCase):
+    def setUp(self) -> None:
+        stream_cache.clear()
+        self.bob = get_user_model().objects.create_user(username='bob', password='password')
+        self.alice = get_user_model().objects.create_user(username='alice', password='password')
+        self.client.login(username='bob', password='password')
+
+    def get_stream(self) -> list:
+        return list(self.client.get(reverse('stream')).context['object_list'])
+
+    def test_serves_cached_page(self):
+        post = create_post(self.alice)
+        self.get_stream()
+        hits = stream_cache.hits
+        self.assertEqual(self.get_stream(), [post])
+        self.assertEqual(stream_cache.hits, hits + 1)
+
+    def test_new_post_invalidates(self):
+        self.get_stream()
+        post = create_post(self.alice)
+        self.assertEqual(self.get_stream(), [post])
+
+    def test_deleted_post_invalidates(self):
+        post = create_post(self.alice, visibility=Post.Visibility.FRIENDS)
+        Follow.objects.create(follower=self.alice, followee=self.bob)
+        self.assertEqual(self.get_stream(), [post])
+        post.delete()
+        self.assertEqual(self.get_stream(), [])
+
+    def test_follow_invalidates(self):
+        post = create_post(self.alice, visibility=Post.Visibility.FRIENDS)
+        self.assertEqual(self.get_stream(), [])
+        follow = Follow.objects.create(follower=self.alice, followee=self.bob)
+        self.assertEqual(self.get_stream(), [post])
+        follow.delete()
+        self.assertEqual(self.get_stream(), [])
+
+    def test_metrics_require_staff(self):
+        res = self.client.get(reverse('metrics'))
+        self.assertEqual(res.status_code, 302)
+
+        self.bob.is_staff = True
+        self.bob.save()
+        res = self.client.get(reverse('metrics'))
+        self.assertEqual(res.status_code, 200)
+        self.assertIn('hit_rate', res.json()['stream_cache'])
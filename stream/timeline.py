@@ -0,0 +1,83 @@
+from typing import Optional
+from django.db import transaction
+from django.contrib.auth import get_user_model
+
+from follow.models import Follow
+from posts.models import Post
+from stream.models import TimelineEntry
+from stream.pagination import LOCAL, StreamSource
+
+
+def get_post_audience(post: Post) -> list[Optional[int]]:
+    """
+    Returns the ids of the users whose timeline should contain `post`. `None` stands for every user.
+    """
+    if post.unlisted:
+        return []
+    if post.visibility == Post.Visibility.PUBLIC:
+        return [None]
+    if post.visibility == Post.Visibility.FRIENDS:
+        # Friends-only posts go to the users the author follows, i.e. the users the author is a follower of
+        return list(Follow.objects.filter(follower_id=post.author_id).values_list('followee_id', flat=True))
+    return []
+
+
+def fan_out_post(post: Post) -> set[Optional[int]]:
+    """
+    Replaces the timeline entries of `post`. Returns the ids of the users whose timeline changed.
+    """
+    with transaction.atomic():
+        previous_audience = set(TimelineEntry.objects.filter(post=post).values_list('user_id', flat=True))
+        TimelineEntry.objects.filter(post=post).delete()
+        audience = get_post_audience(post)
+        TimelineEntry.objects.bulk_create([
+            TimelineEntry(user_id=user_id, post=post, date_published=post.date_published)
+            for user_id in audience
+        ])
+    return previous_audience | set(audience)
+
+
+def add_follow(follower_id: int, followee_id: int):
+    friends_posts = Post.objects.filter(author_id=follower_id, visibility=Post.Visibility.FRIENDS, unlisted=False)
+    TimelineEntry.objects.bulk_create([
+        TimelineEntry(user_id=followee_id, post=post, date_published=post.date_published)
+        for post in friends_posts
+    ], ignore_conflicts=True)
+
+
+def remove_follow(follower_id: int, followee_id: int):
+    TimelineEntry.objects.filter(
+        user_id=followee_id,
+        post__author_id=follower_id,
+        post__visibility=Post.Visibility.FRIENDS).delete()
+
+
+def rebuild_public_timeline(batch_size: int = 1000):
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user__isnull=True).delete()
+        public_posts = Post.objects.filter(visibility=Post.Visibility.PUBLIC, unlisted=False) \
+            .only('id', 'date_published').iterator(chunk_size=batch_size)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user=None, post=post, date_published=post.date_published) for post in public_posts),
+            batch_size=batch_size)
+
+
+def rebuild_timeline(user: get_user_model(), batch_size: int = 1000):
+    with transaction.atomic():
+        TimelineEntry.objects.filter(user=user).delete()
+        # Public posts are on the shared timeline
+        friends_posts = Post.objects.visible_to(user).filter(visibility=Post.Visibility.FRIENDS) \
+            .only('id', 'date_published').iterator(chunk_size=batch_size)
+        TimelineEntry.objects.bulk_create(
+            (TimelineEntry(user=user, post=post, date_published=post.date_published) for post in friends_posts),
+            batch_size=batch_size)
+
+
+def get_timeline_sources(user: get_user_model()) -> list[StreamSource]:
+    """
+    Returns the stream sources of the timeline of `user`: the shared entries and the user's own entries.
+    """
+    return [
+        StreamSource(LOCAL, entries, id_field='post_id', to_item=lambda entry: entry.post)
+        for entries in (TimelineEntry.objects.shared(), TimelineEntry.objects.of_user(user))
+    ]